@@ -0,0 +1,122 @@
+"""
+Announcement feed for students
+Each class has its own feed and announcements without a class form the
+global feed; both are read newest-first through the
+(class_id, is_active, created_at) index. A student's feed is the k-way
+merge of their class feeds and the global feed, so no query joins
+announcements to student_class_map. Unread counts are the id range
+above a read watermark per (student, feed) in announcement_reads, with
+class_id 0 for the global feed, so a newly joined class starts unread.
+"""
+import heapq
+from itertools import islice
+
+FEED_LIMIT = 50
+
+
+def _feed_query(cur, class_id, limit):
+    """Newest active announcements of one class (None for the global feed)"""
+    class_filter = 'a.class_id IS NULL' if class_id is None else 'a.class_id = ?'
+    params = [] if class_id is None else [class_id]
+    cur.execute(f'''
+        SELECT a.id, a.title, a.content, a.created_at, a.priority, u.name, a.class_id
+        FROM announcements a
+        JOIN users u ON a.teacher_id = u.id
+        WHERE {class_filter} AND a.is_active = 1
+        ORDER BY a.created_at DESC, a.id DESC
+        LIMIT ?
+    ''', params + [limit])
+    return cur.fetchall()
+
+
+def latest_for_student(cur, class_ids, limit=FEED_LIMIT):
+    """Latest announcements visible to a student in the given classes
+
+    Returns:
+        list: Announcement dicts, newest first
+    """
+    feeds = [_feed_query(cur, class_id, limit) for class_id in [None] + sorted(set(class_ids))]
+    merged = list(islice(heapq.merge(*feeds, key=lambda row: (row[3] or '', row[0]), reverse=True), limit))
+
+    class_names = {}
+    if class_ids:
+        placeholders = ','.join('?' * len(class_ids))
+        cur.execute(f'SELECT id, name FROM classes WHERE id IN ({placeholders})', list(class_ids))
+        class_names = dict(cur.fetchall())
+
+    return [{
+        'id': row[0],
+        'title': row[1],
+        'content': row[2],
+        'created_at': row[3],
+        'priority': row[4] or 'normal',
+        'teacher_name': row[5],
+        'class_id': row[6],
+        'class_name': class_names.get(row[6]) or 'All Students'
+    } for row in merged]
+
+
+def _last_read_ids(cur, student_id):
+    """Read watermark of each of a student's feeds (class id, 0 for global)"""
+    cur.execute('SELECT class_id, last_read_id FROM announcement_reads WHERE student_id = ?', (student_id,))
+    return dict(cur.fetchall())
+
+
+def _visible_filter(class_ids):
+    class_ids = sorted(set(class_ids))
+    placeholders = ','.join('?' * len(class_ids))
+    class_filter = f'class_id IS NULL OR class_id IN ({placeholders})' if class_ids else 'class_id IS NULL'
+    return f'({class_filter}) AND is_active = 1', class_ids
+
+
+def counts_for_student(cur, student_id, class_ids):
+    """Visible and unread announcement counts for a student
+
+    Counted per feed like latest_for_student: visible rows are a range of
+    the feed index and unread rows are the id > watermark range of
+    idx_announcements_class_id, so neither reads the whole table.
+
+    Returns:
+        tuple: (visible, unread)
+    """
+    last_read_ids = _last_read_ids(cur, student_id)
+
+    visible = unread = 0
+    for class_id in [None] + sorted(set(class_ids)):
+        class_filter = 'class_id IS NULL' if class_id is None else 'class_id = ?'
+        params = [] if class_id is None else [class_id]
+        cur.execute(f'SELECT COUNT(*) FROM announcements WHERE {class_filter} AND is_active = 1', params)
+        visible += cur.fetchone()[0]
+        cur.execute(f'''
+            SELECT COUNT(*) FROM announcements
+            WHERE {class_filter} AND id > ? AND is_active = 1
+        ''', params + [last_read_ids.get(class_id or 0, 0)])
+        unread += cur.fetchone()[0]
+    return visible, unread
+
+
+def mark_read(conn, student_id, class_ids):
+    """Move the student's read watermark of every visible feed past its newest announcement"""
+    where, params = _visible_filter(class_ids)
+    newest = conn.execute(f'''
+        SELECT IFNULL(class_id, 0), MAX(id) FROM announcements
+        WHERE {where}
+        GROUP BY class_id
+    ''', params).fetchall()
+    if not newest:
+        return
+    conn.executemany('''
+        INSERT INTO announcement_reads (student_id, class_id, last_read_id, read_at)
+        VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT (student_id, class_id) DO UPDATE SET
+            last_read_id = MAX(last_read_id, excluded.last_read_id),
+            read_at = excluded.read_at
+    ''', [(student_id, class_id, newest_id) for class_id, newest_id in newest])
+    conn.commit()
+
+
+def unread_ids(cur, student_id, announcements):
+    """Ids among the given announcements the student has not seen yet"""
+    last_read_ids = _last_read_ids(cur, student_id)
+    return {announcement['id'] for announcement in announcements
+            if announcement['id'] > last_read_ids.get(announcement['class_id'] or 0, 0)}
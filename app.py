@@ -1,7 +1,11 @@
-from flask import Flask, redirect, url_for, session
+from flask import Flask, redirect, url_for, session, request, flash
 import os
 import sqlite3
 import hashlib
+import schema_migrations
+
+# Requests that do not depend on a login session (static files, auth, token-based calendar feeds)
+SESSIONLESS_ENDPOINTS = {None, 'static', 'home', 'auth.login', 'auth.logout', 'calendar.feed'}
 
 def init_database():
     """Initialize database using schema.sql and populate with test data"""
@@ -15,6 +19,13 @@ def init_database():
             print(f"✗ Failed to create database from schema: {e}")
             return False
     
+    # Bring existing databases up to the current schema version
+    conn = sqlite3.connect('users.db')
+    try:
+        schema_migrations.migrate(conn)
+    finally:
+        conn.close()
+    
     # Always check and populate test data
     populate_test_data()
     return True
@@ -129,29 +140,48 @@ def populate_test_data():
         conn.commit()
         conn.close()
 
-def create_app():
-    app = Flask(__name__)
-    
-    # Simple configuration
-    app.config['SECRET_KEY'] = 'your-secret-key-here-change-in-production'
-    app.config['DATABASE'] = 'users.db'
-    
-    # Initialize database
-    print("⚙ Initializing database...")
-    try:
-        init_database()
-        print("✓ Database initialized successfully!")
-    except Exception as e:
-        print(f"✗ Database error: {e}")
-    
+def start_background_jobs():
+    """Start the reminder scheduler and the nightly at-risk job in this process"""
     # Start reminder scheduler in background (optional)
     try:
         from reminder_scheduler import start_scheduler_thread
-        scheduler_thread = start_scheduler_thread()
+        start_scheduler_thread()
         print("↗ Reminder scheduler started in background thread")
     except Exception as e:
         print(f"⚠ Reminder scheduler not started: {e}")
     
+    # Nightly at-risk student detection (optional)
+    try:
+        from at_risk import start_nightly_thread
+        start_nightly_thread()
+        print("↗ At-risk detection job scheduled in background thread")
+    except Exception as e:
+        print(f"⚠ At-risk detection job not started: {e}")
+
+def create_app():
+    """Build the Flask app (configuration and blueprints only)
+
+    Creating the schema, seeding test data and background jobs are not
+    done here so that every worker process starts fast; run them with
+    manage.py (migrate, seed, scheduler) or start the app with python app.py.
+    """
+    app = Flask(__name__)
+    
+    # Simple configuration
+    app.config['SECRET_KEY'] = 'your-secret-key-here-change-in-production'
+    app.config['DATABASE'] = 'users.db'
+
+    @app.before_request
+    def check_session():
+        # Logged-out, expired or revoked sessions go back to the login page
+        if request.endpoint in SESSIONLESS_ENDPOINTS:
+            return None
+        from session_store import sync_session
+        if not sync_session():
+            flash('Your session has expired. Please log in again.', 'error')
+            return redirect(url_for('auth.login'))
+        return None
+
     @app.route('/')
     def home():
         # Always clear session and redirect to login page
@@ -194,6 +224,12 @@ def create_app():
     except ImportError:
         pass
     
+    try:
+        from routes.calendar import calendar_bp
+        app.register_blueprint(calendar_bp)
+    except ImportError:
+        pass
+    
     try:
         from routes.main import main_bp
         app.register_blueprint(main_bp)
@@ -212,5 +248,14 @@ if __name__ == '__main__':
     print(f"\n🌐 Starting server on http://127.0.0.1:5014")
     print("⚠ Press Ctrl+C to stop\n")
     
+    print("⚙ Initializing database...")
+    try:
+        init_database()
+        print("✓ Database initialized successfully!")
+    except Exception as e:
+        print(f"✗ Database error: {e}")
+    
+    start_background_jobs()
+    
     app = create_app()
     app.run(debug=True, port=5014)
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Nightly at-risk student detection
+Attendance, submissions and marks of the last WINDOW_DAYS are bulk-loaded
+as flat arrays and reduced per student with NumPy (bincount over the
+student index), so every student is scored in one vectorized pass. The
+window is split in two halves to get trends. Students with at least
+MIN_SIGNALS warning signals are written to at_risk_students, which the
+teacher and admin dashboards read.
+
+Usage: python at_risk.py     (compute now; the app runs it nightly at RUN_HOUR)
+"""
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from scheduler_lease import Lease
+
+DATABASE = 'users.db'
+
+WINDOW_DAYS = 60
+RUN_HOUR = 2
+LEASE_TTL = 3600                # seconds one process owns the nightly run
+
+# Warning signals
+MIN_ATTENDANCE_RATE = 0.75
+ATTENDANCE_DROP = 0.15          # rate lost between the two halves of the window
+MIN_MISSED = 2
+MISSED_SHARE = 0.3              # missed / due assignments
+LOW_MARK = 50.0
+MARK_DROP = 10.0                # percentage points lost per half window
+MIN_SIGNALS = 2
+
+SIGNALS = (
+    ('low_attendance', f'Attendance below {MIN_ATTENDANCE_RATE:.0%}'),
+    ('falling_attendance', 'Attendance falling'),
+    ('missed_submissions', 'Missed submissions'),
+    ('low_marks', f'Marks below {LOW_MARK:g}%'),
+    ('falling_marks', 'Marks falling'),
+)
+
+
+def _rows(cur, sql, params, columns):
+    """Fetch a query into a float matrix (rows x columns)"""
+    cur.execute(sql, params)
+    return np.array(cur.fetchall(), dtype=float).reshape(-1, columns)
+
+
+def _positions(student_ids, ids):
+    """Index of each id in the sorted student_ids, and a mask of known ids"""
+    if not len(student_ids):
+        return np.zeros(0, dtype=np.int64), np.zeros(len(ids), dtype=bool)
+    pos = np.clip(np.searchsorted(student_ids, ids), 0, len(student_ids) - 1)
+    known = student_ids[pos] == ids
+    return pos[known], known
+
+
+def _sums(student_ids, ids, *weights):
+    """Per-student sums of each weight column"""
+    pos, known = _positions(student_ids, ids)
+    return [np.bincount(pos, weights=w[known], minlength=len(student_ids)) for w in weights]
+
+
+def compute_features(cur, today=None):
+    """Per-student features over the window
+
+    Returns:
+        tuple: (student_ids, dict of feature arrays aligned with student_ids)
+    """
+    today = today or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    half = WINDOW_DAYS / 2
+
+    cur.execute("SELECT id FROM users WHERE role = 'student' ORDER BY id")
+    student_ids = np.array([row[0] for row in cur.fetchall()], dtype=np.int64)
+
+    # Attendance: (student, age in days, attended, excused)
+    att = _rows(cur, f'''
+        SELECT student_id, julianday(:today) - julianday(attendance_date),
+               status IN ('present', 'late'), status = 'excused'
+        FROM attendance
+        WHERE attendance_date >= date(:today, '-{WINDOW_DAYS} days') AND attendance_date <= :today
+    ''', {'today': today}, 4)
+    recent = att[:, 1] < half
+    counted = 1.0 - att[:, 3]
+    attended = att[:, 2] * counted
+    counted_recent, attended_recent, counted_all, attended_all = _sums(
+        student_ids, att[:, 0].astype(np.int64),
+        counted * recent, attended * recent, counted, attended)
+    counted_prior = counted_all - counted_recent
+    attended_prior = attended_all - attended_recent
+
+    # Assignments that fell due in the window: (student, handed in or marked)
+    due = _rows(cur, f'''
+        SELECT scm.student_id,
+               EXISTS (SELECT 1 FROM submissions s WHERE s.assignment_id = a.id AND s.student_id = scm.student_id)
+               OR EXISTS (SELECT 1 FROM student_marks sm WHERE sm.assignment_id = a.id AND sm.student_id = scm.student_id)
+        FROM student_class_map scm
+        JOIN assignments a ON a.class_id = scm.class_id
+        WHERE scm.status = 'active'
+          AND julianday(a.due_date) < julianday(:today)
+          AND julianday(a.due_date) >= julianday(:today, '-{WINDOW_DAYS} days')
+    ''', {'today': today}, 2)
+    due_count, missed = _sums(student_ids, due[:, 0].astype(np.int64), np.ones(len(due)), 1.0 - due[:, 1])
+
+    # Marks on assignments and assessments: (student, day offset, percentage)
+    marks = _rows(cur, f'''
+        SELECT sm.student_id, julianday(COALESCE(a.due_date, sm.marked_at)) - julianday(:today),
+               sm.marks_obtained * 100.0 / COALESCE(NULLIF(sm.total_marks, 0), NULLIF(a.points, 0), 100)
+        FROM student_marks sm
+        JOIN assignments a ON sm.assignment_id = a.id
+        WHERE sm.marks_obtained IS NOT NULL
+          AND julianday(COALESCE(a.due_date, sm.marked_at)) >= julianday(:today, '-{WINDOW_DAYS} days')
+        UNION ALL
+        SELECT m.student_id, julianday(s.assessment_date) - julianday(:today),
+               m.score * 100.0 / NULLIF(s.max_score, 0)
+        FROM marks m
+        JOIN assessments s ON m.assessment_id = s.id
+        WHERE s.max_score > 0
+          AND julianday(s.assessment_date) >= julianday(:today, '-{WINDOW_DAYS} days')
+    ''', {'today': today}, 3)
+    x, y = marks[:, 1], marks[:, 2]
+    n, sx, sy, sxy, sxx = _sums(student_ids, marks[:, 0].astype(np.int64),
+                                np.ones(len(marks)), x, y, x * y, x * x)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rate_recent = np.where(counted_recent > 0, attended_recent / counted_recent, np.nan)
+        rate_prior = np.where(counted_prior > 0, attended_prior / counted_prior, np.nan)
+        # Least-squares slope of percentage over time, in points per half window
+        denominator = n * sxx - sx * sx
+        slope = np.where((n >= 3) & (denominator > 0), (n * sxy - sx * sy) / denominator, np.nan)
+        features = {
+            'attendance_rate': np.where(counted_all > 0, attended_all / counted_all, np.nan),
+            'attendance_trend': rate_recent - rate_prior,
+            'due_assignments': due_count,
+            'missed_submissions': missed,
+            'mark_average': np.where(n > 0, sy / n, np.nan),
+            'mark_trend': slope * half,
+        }
+    return student_ids, features
+
+
+def score(features):
+    """Boolean signal arrays and the per-student risk score"""
+    f = features
+    with np.errstate(invalid='ignore', divide='ignore'):
+        signals = {
+            'low_attendance': f['attendance_rate'] < MIN_ATTENDANCE_RATE,
+            'falling_attendance': f['attendance_trend'] <= -ATTENDANCE_DROP,
+            'missed_submissions': (f['missed_submissions'] >= MIN_MISSED)
+                                  & (f['missed_submissions'] >= MISSED_SHARE * f['due_assignments']),
+            'low_marks': f['mark_average'] < LOW_MARK,
+            'falling_marks': f['mark_trend'] <= -MARK_DROP,
+        }
+    risk = sum(signal.astype(int) for signal in signals.values())
+    return signals, risk
+
+
+def _value(array, i, digits):
+    return None if np.isnan(array[i]) else round(float(array[i]), digits)
+
+
+def run(conn, today=None):
+    """Recompute at_risk_students for every student
+
+    Returns:
+        dict: students scored, students flagged and seconds taken
+    """
+    started = time.perf_counter()
+    started_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    cur = conn.cursor()
+
+    student_ids, features = compute_features(cur, today)
+    signals, risk = score(features)
+    flagged = np.flatnonzero(risk >= MIN_SIGNALS)
+
+    rows = []
+    for i in flagged:
+        reasons = '; '.join(label for name, label in SIGNALS if signals[name][i])
+        rows.append((
+            int(student_ids[i]), int(risk[i]),
+            _value(features['attendance_rate'], i, 3), _value(features['attendance_trend'], i, 3),
+            int(features['due_assignments'][i]), int(features['missed_submissions'][i]),
+            _value(features['mark_average'], i, 2), _value(features['mark_trend'], i, 2),
+            reasons, started_at
+        ))
+
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('DELETE FROM at_risk_students')
+        conn.executemany('''
+            INSERT INTO at_risk_students (student_id, risk_score, attendance_rate, attendance_trend,
+                                          due_assignments, missed_submissions, mark_average, mark_trend,
+                                          reasons, computed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        seconds = round(time.perf_counter() - started, 3)
+        conn.execute('''
+            INSERT INTO at_risk_runs (started_at, finished_at, students, flagged, seconds)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (started_at, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), len(student_ids), len(rows), seconds))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return {'students': len(student_ids), 'flagged': len(rows), 'seconds': seconds}
+
+
+def last_run(cur):
+    """Most recent run as a dict, or None"""
+    cur.execute('SELECT finished_at, students, flagged, seconds FROM at_risk_runs ORDER BY id DESC LIMIT 1')
+    row = cur.fetchone()
+    if not row:
+        return None
+    return {'finished_at': row[0], 'students': row[1], 'flagged': row[2], 'seconds': row[3]}
+
+
+def get_flagged(cur, class_ids=None, limit=None):
+    """Flagged students, highest risk first
+
+    With class_ids, only students actively enrolled in those classes are
+    returned, with the names of the matching classes.
+    """
+    params = []
+    class_filter = ''
+    if class_ids is not None:
+        if not class_ids:
+            return []
+        class_filter = f"WHERE scm.class_id IN ({','.join('?' * len(class_ids))})"
+        params.extend(class_ids)
+    limit_sql = 'LIMIT ?' if limit else ''
+    if limit:
+        params.append(limit)
+    cur.execute(f'''
+        SELECT r.student_id, u.name, u.username, r.risk_score, r.attendance_rate, r.attendance_trend,
+               r.due_assignments, r.missed_submissions, r.mark_average, r.mark_trend, r.reasons,
+               r.computed_at, GROUP_CONCAT(DISTINCT c.name)
+        FROM at_risk_students r
+        JOIN users u ON r.student_id = u.id
+        LEFT JOIN student_class_map scm ON scm.student_id = r.student_id AND scm.status = 'active'
+        LEFT JOIN classes c ON scm.class_id = c.id
+        {class_filter}
+        GROUP BY r.student_id
+        ORDER BY r.risk_score DESC, r.mark_average, u.name
+        {limit_sql}
+    ''', params)
+    return [{
+        'student_id': row[0],
+        'name': row[1] or row[2],
+        'username': row[2],
+        'risk_score': row[3],
+        'attendance_rate': row[4],
+        'attendance_trend': row[5],
+        'due_assignments': row[6],
+        'missed_submissions': row[7],
+        'mark_average': row[8],
+        'mark_trend': row[9],
+        'reasons': row[10],
+        'computed_at': row[11],
+        'classes': row[12] or ''
+    } for row in cur.fetchall()]
+
+
+def _is_due(conn, now=None):
+    """True if no run finished since the latest scheduled run time"""
+    now = now or datetime.now()
+    scheduled = now.replace(hour=RUN_HOUR, minute=0, second=0, microsecond=0)
+    if scheduled > now:
+        scheduled -= timedelta(days=1)
+    run_info = last_run(conn.cursor())
+    return not run_info or run_info['finished_at'] < scheduled.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _seconds_until_next_run(now=None):
+    now = now or datetime.now()
+    scheduled = now.replace(hour=RUN_HOUR, minute=0, second=0, microsecond=0)
+    if scheduled <= now:
+        scheduled += timedelta(days=1)
+    return (scheduled - now).total_seconds()
+
+
+def start_nightly_thread(db_path=DATABASE):
+    """Run the job in a background thread every night at RUN_HOUR
+
+    A missed night (app not running at RUN_HOUR) is caught up on start.
+    When several processes start the thread, the one holding the lease runs
+    the job.
+    """
+    lease = Lease('at_risk', ttl=LEASE_TTL)
+
+    def run_background():
+        while True:
+            conn = sqlite3.connect(db_path)
+            try:
+                if _is_due(conn) and lease.acquire(conn):
+                    result = run(conn)
+                    print(f"✓ At-risk job scored {result['students']} students, "
+                          f"flagged {result['flagged']} in {result['seconds']}s")
+            except Exception as e:
+                print(f"✗ At-risk job error: {e}")
+            finally:
+                conn.close()
+            time.sleep(_seconds_until_next_run())
+
+    thread = threading.Thread(target=run_background, daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    conn = sqlite3.connect(DATABASE)
+    try:
+        result = run(conn)
+    except sqlite3.Error as e:
+        print(f"✗ At-risk job failed: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+    print(f"✓ Scored {result['students']} students, flagged {result['flagged']} in {result['seconds']}s")
@@ -0,0 +1,150 @@
+"""
+Monthly attendance rollups for the admin attendance report
+attendance_monthly keeps one row per (student, class, month) with the
+status counts, maintained by SQLite triggers on every attendance write
+(migration 0006).
+Reports read rollup rows for the whole months inside the requested range
+and only scan raw attendance rows for the partial months at its edges.
+Rebuild with: python attendance_rollups.py --rebuild (archived months are kept)
+"""
+import calendar
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+DATABASE = 'users.db'
+
+STATUSES = ('present', 'absent', 'late', 'excused')
+
+
+def rebuild_rollups(conn, keep_before=None):
+    """Recompute rollup rows from the raw attendance table
+
+    Months before keep_before (an archive cutoff, 'YYYY-MM-01') have no raw
+    rows left in the live database, so their rollups are kept as they are.
+    """
+    counts = ',\n'.join(f"SUM(CASE WHEN status = '{status}' THEN 1 ELSE 0 END)" for status in STATUSES)
+    keep_month = keep_before[:7] if keep_before else ''
+    conn.execute('DELETE FROM attendance_monthly WHERE month >= ?', (keep_month,))
+    conn.execute(f'''
+        INSERT INTO attendance_monthly (student_id, class_id, month, total, {', '.join(STATUSES)})
+        SELECT student_id, class_id, substr(attendance_date, 1, 7), COUNT(*),
+               {counts}
+        FROM attendance
+        WHERE substr(attendance_date, 1, 7) >= ?
+        GROUP BY student_id, class_id, substr(attendance_date, 1, 7)
+    ''', (keep_month,))
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
+def _month_end(day):
+    return day.replace(day=calendar.monthrange(day.year, day.month)[1])
+
+
+def split_range(start_date=None, end_date=None):
+    """Split a date range into whole months and partial-month edges
+
+    Returns:
+        tuple: (months, edges). months is a (first, last) pair of 'YYYY-MM'
+        strings, either of which may be None for an open end, or None when
+        no whole month is covered. edges is a list of (start, end) ISO
+        date pairs that must be read from raw attendance rows.
+    """
+    start = _parse_date(start_date)
+    end = _parse_date(end_date)
+
+    if start and end and start > end:
+        return None, []
+
+    first_month = last_month = None
+    edges = []
+
+    if start:
+        if start.day == 1:
+            first_month = start.strftime('%Y-%m')
+        else:
+            first_month = (_month_end(start) + timedelta(days=1)).strftime('%Y-%m')
+            edges.append((start.isoformat(), _month_end(start).isoformat()))
+
+    if end:
+        if end == _month_end(end):
+            last_month = end.strftime('%Y-%m')
+        else:
+            last_month = (end.replace(day=1) - timedelta(days=1)).strftime('%Y-%m')
+            edges.append((end.replace(day=1).isoformat(), end.isoformat()))
+
+    if first_month and last_month and first_month > last_month:
+        # The range sits inside one or two partial months: scan it directly
+        return None, [(start.isoformat(), end.isoformat())]
+
+    return (first_month, last_month), edges
+
+
+def summary_source(class_id=None, start_date=None, end_date=None, attendance_table='attendance'):
+    """Build a subquery of per-(student, class) count rows covering a range
+
+    Columns: student_id, class_id, total, present, absent, late, excused.
+    Callers GROUP BY student_id, class_id and SUM the counts.
+    attendance_table is the raw row source for partial months, e.g. a
+    union with archived rows from term_archive.table_source().
+    """
+    months, edges = split_range(start_date, end_date)
+    parts = []
+    params = []
+
+    if months:
+        conditions = []
+        for condition, value in zip(('month >= ?', 'month <= ?'), months):
+            if value:
+                conditions.append(condition)
+                params.append(value)
+        if class_id:
+            conditions.append('class_id = ?')
+            params.append(class_id)
+        parts.append(f'''
+            SELECT student_id, class_id, total, {', '.join(STATUSES)}
+            FROM attendance_monthly
+            WHERE {' AND '.join(conditions) or '1=1'}''')
+
+    status_counts = ', '.join(f"CASE WHEN status = '{status}' THEN 1 ELSE 0 END AS {status}" for status in STATUSES)
+    for edge_start, edge_end in edges:
+        where = 'attendance_date >= ? AND attendance_date <= ?'
+        params.extend([edge_start, edge_end])
+        if class_id:
+            where += ' AND class_id = ?'
+            params.append(class_id)
+        parts.append(f'''
+            SELECT student_id, class_id, 1 AS total, {status_counts}
+            FROM {attendance_table}
+            WHERE {where}''')
+
+    if not parts:
+        # Empty range (start after end)
+        parts.append(f"SELECT student_id, class_id, total, {', '.join(STATUSES)} FROM attendance_monthly WHERE 0")
+
+    return '\n            UNION ALL'.join(parts), params
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Maintain the monthly attendance rollups')
+    parser.add_argument('--rebuild', action='store_true', help='Recompute all rollups from raw attendance')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(DATABASE)
+    try:
+        if args.rebuild:
+            from term_archive import archive_cutoff
+            rebuild_rollups(conn, keep_before=archive_cutoff(conn))
+            conn.commit()
+            count = conn.execute('SELECT COUNT(*) FROM attendance_monthly').fetchone()[0]
+            print(f"✓ Rebuilt {count} attendance rollup rows")
+        else:
+            parser.print_help()
+            sys.exit(1)
+    finally:
+        conn.close()
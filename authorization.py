@@ -0,0 +1,160 @@
+"""
+Role and class authorization for the teacher and student blueprints
+Each logged-in principal carries the set of class ids and assignment ids it
+may touch, computed once per session and rebuilt whenever the session store
+invalidates the principal. Views declare their access rule with a decorator
+so the check is a set lookup instead of a JOIN on the class maps.
+"""
+import sqlite3
+from functools import wraps
+
+from flask import flash, jsonify, redirect, request, session, url_for
+
+from session_store import session_store, get_current_principal
+
+DATABASE = 'users.db'
+
+
+class AccessSet:
+    def __init__(self, class_ids, assignment_ids):
+        self.class_ids = frozenset(class_ids)
+        self.assignment_ids = frozenset(assignment_ids)
+
+
+def _load_access(principal):
+    """Build the access set for a principal from its cached class list"""
+    conn = sqlite3.connect(DATABASE)
+    cur = conn.cursor()
+    try:
+        if principal.role == 'teacher':
+            # Teachers manage the assignments they created
+            cur.execute('SELECT id FROM assignments WHERE teacher_id = ?', (principal.id,))
+            assignment_ids = [row[0] for row in cur.fetchall()]
+        elif principal.role == 'student' and principal.class_ids:
+            placeholders = ','.join('?' * len(principal.class_ids))
+            cur.execute(f'''
+                SELECT id FROM assignments
+                WHERE class_id IN ({placeholders}) AND status = 'active'
+            ''', principal.class_ids)
+            assignment_ids = [row[0] for row in cur.fetchall()]
+        else:
+            assignment_ids = []
+    finally:
+        conn.close()
+
+    return AccessSet(principal.class_ids, assignment_ids)
+
+
+def get_access(principal=None):
+    """Get the cached access set for the current (or given) principal"""
+    principal = principal or get_current_principal()
+    if principal is None:
+        return AccessSet([], [])
+
+    # Stored on the principal so it is dropped together with it
+    access = getattr(principal, 'access', None)
+    if access is None:
+        access = _load_access(principal)
+        principal.access = access
+    return access
+
+
+def can_access_class(class_id):
+    try:
+        return int(class_id) in get_access().class_ids
+    except (TypeError, ValueError):
+        return False
+
+
+def can_access_assignment(assignment_id):
+    try:
+        return int(assignment_id) in get_access().assignment_ids
+    except (TypeError, ValueError):
+        return False
+
+
+def invalidate_class_members(class_id):
+    """Rebuild access for everyone mapped to a class after it changes"""
+    conn = sqlite3.connect(DATABASE)
+    cur = conn.cursor()
+    try:
+        cur.execute('''
+            SELECT student_id FROM student_class_map WHERE class_id = ?
+            UNION
+            SELECT teacher_id FROM teacher_class_map WHERE class_id = ?
+        ''', (class_id, class_id))
+        member_ids = [row[0] for row in cur.fetchall()]
+    finally:
+        conn.close()
+
+    session_store.invalidate_users(member_ids)
+
+
+def _requested_id(name, view_kwargs):
+    """Find an id in the URL, then the query string, then the form or JSON body"""
+    if name in view_kwargs:
+        return view_kwargs[name]
+    value = request.values.get(name)
+    if value is None and request.is_json:
+        value = (request.get_json(silent=True) or {}).get(name)
+    return value
+
+
+def _deny(message, as_json, endpoint):
+    if as_json:
+        return jsonify({'success': False, 'message': message}), 403
+    flash(message, 'error')
+    return redirect(url_for(endpoint))
+
+
+def teacher_owns_class(param='class_id', as_json=False, redirect_to='teacher.marks_roster', required=False):
+    """Allow the view only if the teacher is mapped to the requested class
+
+    The id is optional unless required=True, so list pages that filter by
+    class can still render without one.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if session.get('role') != 'teacher':
+                if as_json:
+                    return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+                return redirect(url_for('auth.login'))
+
+            class_id = _requested_id(param, kwargs)
+            if class_id in (None, ''):
+                if required:
+                    return _deny('Class ID is required', as_json, redirect_to)
+            elif not can_access_class(class_id):
+                return _deny('Class not found or unauthorized access', as_json, redirect_to)
+
+            return view(*args, **kwargs)
+        return wrapped
+    return decorator
+
+
+def student_enrolled(param='assignment_id', kind='assignment', as_json=False, redirect_to='student.homework'):
+    """Allow the view only if the student is enrolled for the requested item
+
+    kind is 'assignment' (active assignment in one of the student's classes)
+    or 'class' (one of the student's active enrolments).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if session.get('role') != 'student':
+                if as_json:
+                    return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+                return redirect(url_for('auth.login'))
+
+            item_id = _requested_id(param, kwargs)
+            if item_id in (None, ''):
+                return _deny(f'{kind.capitalize()} ID is required', as_json, redirect_to)
+
+            allowed = can_access_class(item_id) if kind == 'class' else can_access_assignment(item_id)
+            if not allowed:
+                return _deny(f'{kind.capitalize()} not found or access denied', as_json, redirect_to)
+
+            return view(*args, **kwargs)
+        return wrapped
+    return decorator
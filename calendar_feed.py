@@ -0,0 +1,118 @@
+"""
+iCalendar feeds of class timetables
+Every teacher and student can subscribe to a private feed URL holding a
+random token, so calendar apps can sync without a login session. A feed
+has one weekly recurring event per scheduled class. Its ETag is the
+schedule version from timetable.py, which triggers bump on any class or
+enrollment change, so polling clients get a 304 until something moves.
+"""
+import secrets
+from datetime import date, datetime, timedelta
+
+import timetable
+
+PRODID = '-//School Management System//Timetable//EN'
+BYDAY = {day: day[:2].upper() for day in timetable.WEEKDAYS}
+
+
+def get_token(conn, user_id, reset=False):
+    """Feed token of a user, created on first request or replaced on reset"""
+    if not reset:
+        row = conn.execute('SELECT token FROM calendar_tokens WHERE user_id = ?', (user_id,)).fetchone()
+        if row:
+            return row[0]
+    token = secrets.token_urlsafe(24)
+    conn.execute('''
+        INSERT INTO calendar_tokens (user_id, token) VALUES (?, ?)
+        ON CONFLICT (user_id) DO UPDATE SET token = excluded.token, created_at = CURRENT_TIMESTAMP
+    ''', (user_id, token))
+    conn.commit()
+    return token
+
+
+def find_user(cur, token):
+    """(user_id, role) owning a feed token, or None"""
+    cur.execute('''
+        SELECT u.id, u.role
+        FROM calendar_tokens ct
+        JOIN users u ON u.id = ct.user_id
+        WHERE ct.token = ?
+    ''', (token,))
+    return cur.fetchone()
+
+
+def feed_etag(schedule, user_id):
+    return f'schedule-{schedule.version}-{user_id}'
+
+
+def _escape(text):
+    return (str(text or '').replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _fold(line):
+    # Content lines are limited to 75 octets; continuations start with a space
+    data = line.encode('utf-8')
+    parts = []
+    while len(data) > 75:
+        cut = 75 if not parts else 74
+        while (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode('utf-8'))
+        data = data[cut:]
+    parts.append(data.decode('utf-8'))
+    return '\r\n '.join(parts)
+
+
+def _first_date(anchor, days):
+    """First date on or after anchor that falls on one of days"""
+    weekdays = {timetable.WEEKDAYS.index(day) for day in days}
+    for offset in range(7):
+        day = anchor + timedelta(days=offset)
+        if day.weekday() in weekdays:
+            return day
+
+
+def _anchor(created_at):
+    try:
+        return datetime.strptime(str(created_at)[:10], '%Y-%m-%d').date()
+    except ValueError:
+        return date(2024, 1, 1)
+
+
+def build_feed(schedule, role, user_id, domain):
+    """iCalendar text for one person's classes in a loaded Timetable"""
+    stamp = str(schedule.updated_at or '1970-01-01 00:00:00')
+    dtstamp = stamp[:19].replace('-', '').replace(':', '').replace(' ', 'T') + 'Z'
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        'X-WR-CALNAME:Class Timetable',
+    ]
+    for class_id, info in sorted(schedule.user_classes(role, user_id).items()):
+        # A class meets for the same hours on each of its days
+        by_time = {}
+        for day, start, end in info['slots']:
+            by_time.setdefault((start, end), []).append(day)
+        for (start, end), days in sorted(by_time.items()):
+            first = _first_date(_anchor(info['created_at']), days)
+            summary = info['name'] + (f" ({info['subject']})" if info['subject'] else '')
+            lines += [
+                'BEGIN:VEVENT',
+                f'UID:class-{class_id}-{start}-{end}@{domain}',
+                f'DTSTAMP:{dtstamp}',
+                f"DTSTART:{first.strftime('%Y%m%d')}T{timetable.format_time(start).replace(':', '')}00",
+                f"DTEND:{first.strftime('%Y%m%d')}T{timetable.format_time(end).replace(':', '')}00",
+                f"RRULE:FREQ=WEEKLY;BYDAY={','.join(BYDAY[day] for day in days)}",
+                f'SUMMARY:{_escape(summary)}',
+            ]
+            if info['section']:
+                lines.append(f"DESCRIPTION:{_escape('Section ' + str(info['section']))}")
+            if info['meeting_link']:
+                lines += [f"LOCATION:{_escape(info['meeting_link'])}", f"URL:{info['meeting_link']}"]
+            lines.append('END:VEVENT')
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(_fold(line) for line in lines) + '\r\n'
@@ -0,0 +1,250 @@
+"""
+Dependency-aware deletion of users and classes
+The delete plan is derived from the foreign keys declared in the database
+(ON DELETE CASCADE) plus CASCADE_EDGES for databases created before those
+declarations existed. Child rows are deleted deepest first, all inside one
+transaction, from the live tables and from the term archive (archive.db)
+when one exists. Large leaf tables are pre-drained in short committed
+batches before that transaction so it never holds the write lock for long,
+and uploaded files of deleted rows are removed by a background worker after
+the commit.
+"""
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from term_archive import ARCHIVE_SCHEMA, attach_existing_archive
+
+# (child table, child column, parent table, parent column) deleted with the parent.
+# References by an acting user (marked_by, graded_by, created_by, ...) and a
+# teacher's ownership of class content are deliberately not listed: deleting
+# a teacher keeps the classes, assignments and announcements they created.
+CASCADE_EDGES = (
+    ('student_class_map', 'class_id', 'classes', 'id'),
+    ('teacher_class_map', 'class_id', 'classes', 'id'),
+    ('assignments', 'class_id', 'classes', 'id'),
+    ('assessments', 'class_id', 'classes', 'id'),
+    ('attendance', 'class_id', 'classes', 'id'),
+    ('announcements', 'class_id', 'classes', 'id'),
+    ('student_marks', 'class_id', 'classes', 'id'),
+    ('grade_reports', 'class_id', 'classes', 'id'),
+    ('reminders', 'class_id', 'classes', 'id'),
+    ('attendance_monthly', 'class_id', 'classes', 'id'),
+    ('announcement_reads', 'class_id', 'classes', 'id'),
+    ('submissions', 'assignment_id', 'assignments', 'id'),
+    ('student_marks', 'assignment_id', 'assignments', 'id'),
+    ('marks', 'assessment_id', 'assessments', 'id'),
+    ('doubt_replies', 'doubt_id', 'doubts', 'id'),
+    ('student_class_map', 'student_id', 'users', 'id'),
+    ('teacher_class_map', 'teacher_id', 'users', 'id'),
+    ('student_subjects', 'student_id', 'users', 'id'),
+    ('teacher_subjects', 'teacher_id', 'users', 'id'),
+    ('user_role_map', 'user_id', 'users', 'id'),
+    ('feedback', 'student_id', 'users', 'id'),
+    ('doubts', 'student_id', 'users', 'id'),
+    ('submissions', 'student_id', 'users', 'id'),
+    ('student_marks', 'student_id', 'users', 'id'),
+    ('grade_reports', 'student_id', 'users', 'id'),
+    ('marks', 'student_id', 'users', 'id'),
+    ('attendance', 'student_id', 'users', 'id'),
+    ('attendance_monthly', 'student_id', 'users', 'id'),
+    ('reminders', 'user_id', 'users', 'id'),
+    ('user_sessions', 'user_id', 'users', 'id'),
+    ('announcement_reads', 'student_id', 'users', 'id'),
+)
+
+# Columns holding paths of uploaded files
+FILE_COLUMNS = {
+    'assignments': 'file_path',
+    'submissions': 'file_path',
+    'classes': 'schedule_pdf_path',
+}
+UPLOAD_ROOTS = ('uploads', os.path.join('static', 'uploads'))
+
+# Leaf tables with more matching rows than this are pre-drained in batches
+BATCH_SIZE = 2000
+MAX_DEPTH = 6
+
+_file_cleaner = ThreadPoolExecutor(max_workers=1, thread_name_prefix='cascade-files')
+
+
+class DeleteResult:
+    def __init__(self, table, found=True):
+        self.table = table
+        self.found = found
+        self.deleted = {}
+        self.files_scheduled = 0
+
+    def add(self, table, count):
+        if count > 0:
+            self.deleted[table] = self.deleted.get(table, 0) + count
+
+    @property
+    def total(self):
+        return sum(self.deleted.values())
+
+
+def _cascade_edges(conn):
+    """Cascading edges by parent table, from declared foreign keys and CASCADE_EDGES"""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    edges = {(child, column, parent, parent_column) for child, column, parent, parent_column in CASCADE_EDGES
+             if child in tables and parent in tables}
+
+    for table in tables:
+        for fk in conn.execute(f'PRAGMA foreign_key_list("{table}")'):
+            parent, column, parent_column, on_delete = fk[2], fk[3], fk[4] or 'id', fk[6]
+            if on_delete == 'CASCADE' and parent in tables:
+                edges.add((table, column, parent, parent_column))
+
+    by_parent = {}
+    for child, column, parent, parent_column in sorted(edges):
+        by_parent.setdefault(parent, []).append((child, column, parent_column))
+    return by_parent
+
+
+def _plan(by_parent, table, where, params, depth=0):
+    """Depth-first (table, where, params) steps, children before their parent"""
+    steps = []
+    if depth < MAX_DEPTH:
+        for child, column, parent_column in by_parent.get(table, []):
+            if child == table:
+                continue
+            child_where = f'{column} IN (SELECT {parent_column} FROM {table} WHERE {where})'
+            steps.extend(_plan(by_parent, child, child_where, params, depth + 1))
+    steps.append((table, where, params))
+    return steps
+
+
+def _with_archive(steps, archived):
+    """Steps plus the same deletes from the archive copy of archived tables
+
+    The archive step follows the live one, while the parent rows its
+    WHERE refers to still exist.
+    """
+    merged = []
+    for table, where, params in steps:
+        merged.append((table, where, params))
+        if table in archived:
+            merged.append((f'{ARCHIVE_SCHEMA}.{table}', where, params))
+    return merged
+
+
+def _collect_files(conn, steps):
+    paths = set()
+    for table, where, params in steps:
+        column = FILE_COLUMNS.get(table.split('.')[-1])
+        if column:
+            rows = conn.execute(f'SELECT {column} FROM {table} WHERE ({where}) AND {column} IS NOT NULL', params)
+            paths.update(row[0] for row in rows if row[0])
+    return paths
+
+
+def _still_referenced(conn, paths, archived):
+    referenced = set()
+    tables = list(FILE_COLUMNS.items())
+    tables += [(f'{ARCHIVE_SCHEMA}.{table}', column) for table, column in FILE_COLUMNS.items() if table in archived]
+    for table, column in tables:
+        try:
+            for path in paths:
+                if conn.execute(f'SELECT 1 FROM {table} WHERE {column} = ? LIMIT 1', (path,)).fetchone():
+                    referenced.add(path)
+        except sqlite3.OperationalError:
+            continue
+    return referenced
+
+
+def _remove_files(paths, base_dir):
+    """Delete uploaded files, refusing anything outside the upload folders"""
+    roots = [os.path.realpath(os.path.join(base_dir, root)) for root in UPLOAD_ROOTS]
+    removed = 0
+    for path in paths:
+        full_path = os.path.realpath(path if os.path.isabs(path) else os.path.join(base_dir, path))
+        if not any(full_path.startswith(root + os.sep) for root in roots):
+            print(f"⚠️ Not removing file outside upload folders: {path}")
+            continue
+        try:
+            os.remove(full_path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"⚠️ Could not remove {path}: {e}")
+    return removed
+
+
+def _pre_drain(conn, by_parent, steps, result, batch_size):
+    """Delete large leaf tables in short committed batches"""
+    for table, where, params in steps:
+        if table in by_parent:
+            continue
+        count = conn.execute(f'SELECT COUNT(*) FROM {table} WHERE {where}', params).fetchone()[0]
+        if count <= batch_size:
+            continue
+        while True:
+            cur = conn.execute(f'''
+                DELETE FROM {table} WHERE rowid IN (
+                    SELECT rowid FROM {table} WHERE {where} LIMIT ?
+                )
+            ''', params + [batch_size])
+            conn.commit()
+            result.add(table, cur.rowcount)
+            if cur.rowcount < batch_size:
+                break
+
+
+def delete_row(conn, table, row_id, batch_size=BATCH_SIZE, base_dir=None):
+    """Delete one users/classes row and everything that cascades from it
+
+    Rows of large leaf tables are removed before the main transaction in
+    batches; rerunning after a failure finishes the job. Archived rows
+    (term_archive) are deleted too, so they do not resurface in
+    historical reports.
+
+    Returns:
+        DeleteResult: per-table deleted counts (found is False if the row
+        does not exist)
+    """
+    result = DeleteResult(table)
+    if not conn.execute(f'SELECT 1 FROM {table} WHERE id = ?', (row_id,)).fetchone():
+        result.found = False
+        return result
+
+    by_parent = _cascade_edges(conn)
+    # ATTACH is not allowed inside a transaction
+    if conn.in_transaction:
+        conn.commit()
+    archived = attach_existing_archive(conn)
+    try:
+        steps = _with_archive(_plan(by_parent, table, 'id = ?', [row_id]), archived)
+        files = _collect_files(conn, steps)
+
+        _pre_drain(conn, by_parent, steps, result, batch_size)
+
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for step_table, where, params in steps:
+                cur = conn.execute(f'DELETE FROM {step_table} WHERE {where}', params)
+                result.add(step_table, cur.rowcount)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        files -= _still_referenced(conn, files, archived)
+    finally:
+        if ARCHIVE_SCHEMA in {row[1] for row in conn.execute('PRAGMA database_list')}:
+            conn.execute(f'DETACH DATABASE {ARCHIVE_SCHEMA}')
+    if files:
+        _file_cleaner.submit(_remove_files, sorted(files), base_dir or os.getcwd())
+        result.files_scheduled = len(files)
+    return result
+
+
+def delete_user(conn, user_id, **kwargs):
+    """Delete a user with their enrollments, work, marks and attendance"""
+    return delete_row(conn, 'users', user_id, **kwargs)
+
+
+def delete_class(conn, class_id, **kwargs):
+    """Delete a class with its mappings, assignments, assessments and attendance"""
+    return delete_row(conn, 'classes', class_id, **kwargs)
@@ -0,0 +1,118 @@
+"""
+Per-class statistics shared by the class listing pages
+Enrollment, teacher and assignment counts live in a class_stats table
+with one row per class, kept current by SQLite triggers on the mapping
+tables and assignments (migration 0006), so listing pages read one row
+per class instead of re-aggregating student_class_map, teacher_class_map
+and assignments.
+Pending assignments depend on the current time and are counted at read
+time. rebuild_class_stats() repairs drift (python class_stats.py --rebuild).
+"""
+import sqlite3
+import sys
+
+DATABASE = 'users.db'
+
+EMPTY_STATS = {
+    'student_count': 0,
+    'teacher_count': 0,
+    'assignment_count': 0,
+    'active_assignments': 0,
+    'pending_assignments': 0
+}
+
+
+def _class_filter(class_ids, column='class_id'):
+    """Build an optional WHERE clause limiting a query to some classes"""
+    if class_ids is None:
+        return '', []
+    placeholders = ','.join('?' * len(class_ids))
+    return f'WHERE {column} IN ({placeholders})', list(class_ids)
+
+
+def rebuild_class_stats(conn):
+    """Recompute every class_stats row from the source tables"""
+    conn.execute('DELETE FROM class_stats')
+    conn.execute('''
+        INSERT INTO class_stats (class_id, student_count, teacher_count, assignment_count, active_assignments)
+        SELECT c.id,
+               (SELECT COUNT(*) FROM student_class_map WHERE class_id = c.id),
+               (SELECT COUNT(*) FROM teacher_class_map WHERE class_id = c.id),
+               (SELECT COUNT(*) FROM assignments WHERE class_id = c.id),
+               (SELECT COUNT(*) FROM assignments WHERE class_id = c.id AND status = 'active')
+        FROM classes c
+    ''')
+
+
+def get_class_stats(cur, class_ids=None):
+    """Get counts per class for the given class ids (or every class)
+
+    Returns:
+        dict: class_id -> stats dict with the keys of EMPTY_STATS
+    """
+    if class_ids is not None:
+        class_ids = list(class_ids)
+        if not class_ids:
+            return {}
+    stats = {}
+    where, params = _class_filter(class_ids)
+
+    cur.execute(f'''
+        SELECT class_id, student_count, teacher_count, assignment_count, active_assignments
+        FROM class_stats {where}
+    ''', params)
+    for class_id, students, teachers, assignments, active in cur.fetchall():
+        stats[class_id] = dict(EMPTY_STATS, student_count=students, teacher_count=teachers,
+                               assignment_count=assignments, active_assignments=active)
+
+    # Pending depends on the clock, so it is the one count read live
+    where, params = _class_filter(class_ids)
+    cur.execute(f'''
+        SELECT class_id, COUNT(*)
+        FROM assignments
+        {where + ' AND' if where else 'WHERE'} status = 'active' AND due_date >= datetime('now')
+        GROUP BY class_id
+    ''', params)
+    for class_id, pending in cur.fetchall():
+        stats.setdefault(class_id, dict(EMPTY_STATS))['pending_assignments'] = pending
+
+    for class_id in class_ids or []:
+        stats.setdefault(class_id, dict(EMPTY_STATS))
+    return stats
+
+
+def get_teacher_names(cur, class_ids):
+    """Get a comma separated list of teacher names per class"""
+    class_ids = list(class_ids)
+    if not class_ids:
+        return {}
+    where, params = _class_filter(class_ids, 'tcm.class_id')
+    cur.execute(f'''
+        SELECT tcm.class_id, GROUP_CONCAT(u.name, ', ')
+        FROM teacher_class_map tcm
+        JOIN users u ON tcm.teacher_id = u.id
+        {where}
+        GROUP BY tcm.class_id
+    ''', params)
+    return dict(cur.fetchall())
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Maintain the class_stats table')
+    parser.add_argument('--rebuild', action='store_true', help='Recompute all rows from the source tables')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(DATABASE)
+    try:
+        if args.rebuild:
+            rebuild_class_stats(conn)
+            conn.commit()
+            count = conn.execute('SELECT COUNT(*) FROM class_stats').fetchone()[0]
+            print(f"✓ Rebuilt class_stats for {count} classes")
+        else:
+            parser.print_help()
+            sys.exit(1)
+    finally:
+        conn.close()
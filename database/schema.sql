@@ -17,7 +17,8 @@ CREATE TABLE users (
     created_by INTEGER,
     updated_by INTEGER,
     updated_on DATETIME,
-    created_on DATETIME
+    created_on DATETIME,
+    session_version INTEGER NOT NULL DEFAULT 0
 );
 
 -- Classes table - Class/course management
@@ -52,7 +53,9 @@ CREATE TABLE student_class_map (
     class_id INTEGER,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     status TEXT DEFAULT 'active',
-    assigned_by INTEGER
+    assigned_by INTEGER,
+    FOREIGN KEY (student_id) REFERENCES users (id) ON DELETE CASCADE,
+    FOREIGN KEY (class_id) REFERENCES classes (id) ON DELETE CASCADE
 );
 
 -- Teacher-Class mapping
@@ -63,8 +66,8 @@ CREATE TABLE teacher_class_map (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     assigned_by INTEGER,
     role TEXT DEFAULT 'primary',
-    FOREIGN KEY (teacher_id) REFERENCES users (id),
-    FOREIGN KEY (class_id) REFERENCES classes (id)
+    FOREIGN KEY (teacher_id) REFERENCES users (id) ON DELETE CASCADE,
+    FOREIGN KEY (class_id) REFERENCES classes (id) ON DELETE CASCADE
 );
 
 -- Assignments table
@@ -83,7 +86,8 @@ CREATE TABLE assignments (
     original_filename TEXT,
     points INTEGER,
     allow_late_submission INTEGER DEFAULT 0,
-    FOREIGN KEY (class_id) REFERENCES classes (id),
+    version INTEGER NOT NULL DEFAULT 1,
+    FOREIGN KEY (class_id) REFERENCES classes (id) ON DELETE CASCADE,
     FOREIGN KEY (teacher_id) REFERENCES users (id)
 );
 
@@ -100,8 +104,8 @@ CREATE TABLE submissions (
     feedback TEXT,
     graded_by INTEGER,
     graded_on DATETIME,
-    FOREIGN KEY (assignment_id) REFERENCES assignments (id),
-    FOREIGN KEY (student_id) REFERENCES users (id),
+    FOREIGN KEY (assignment_id) REFERENCES assignments (id) ON DELETE CASCADE,
+    FOREIGN KEY (student_id) REFERENCES users (id) ON DELETE CASCADE,
     FOREIGN KEY (graded_by) REFERENCES users (id)
 );
 
@@ -118,9 +122,10 @@ CREATE TABLE student_marks (
     remarks TEXT,
     marked_by INTEGER,
     marked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (student_id) REFERENCES users (id),
-    FOREIGN KEY (assignment_id) REFERENCES assignments (id),
-    FOREIGN KEY (class_id) REFERENCES classes (id),
+    version INTEGER NOT NULL DEFAULT 1,
+    FOREIGN KEY (student_id) REFERENCES users (id) ON DELETE CASCADE,
+    FOREIGN KEY (assignment_id) REFERENCES assignments (id) ON DELETE CASCADE,
+    FOREIGN KEY (class_id) REFERENCES classes (id) ON DELETE CASCADE,
     FOREIGN KEY (marked_by) REFERENCES users (id)
 );
 
@@ -138,8 +143,8 @@ CREATE TABLE grade_reports (
     teacher_remarks TEXT,
     generated_by INTEGER,
     generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (student_id) REFERENCES users (id),
-    FOREIGN KEY (class_id) REFERENCES classes (id),
+    FOREIGN KEY (student_id) REFERENCES users (id) ON DELETE CASCADE,
+    FOREIGN KEY (class_id) REFERENCES classes (id) ON DELETE CASCADE,
     FOREIGN KEY (generated_by) REFERENCES users (id)
 );
 
@@ -156,7 +161,7 @@ CREATE TABLE assessments (
     weight REAL NOT NULL DEFAULT 1.0,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (teacher_id) REFERENCES users (id),
-    FOREIGN KEY (class_id) REFERENCES classes (id)
+    FOREIGN KEY (class_id) REFERENCES classes (id) ON DELETE CASCADE
 );
 
 -- Marks for assessments
@@ -168,8 +173,8 @@ CREATE TABLE marks (
     comment TEXT,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     marked_by INTEGER,
-    FOREIGN KEY (student_id) REFERENCES users (id),
-    FOREIGN KEY (assessment_id) REFERENCES assessments (id)
+    FOREIGN KEY (student_id) REFERENCES users (id) ON DELETE CASCADE,
+    FOREIGN KEY (assessment_id) REFERENCES assessments (id) ON DELETE CASCADE
 );
 
 -- Attendance tracking
@@ -182,8 +187,8 @@ CREATE TABLE attendance (
     marked_by INTEGER NOT NULL,
     marked_on DATETIME DEFAULT CURRENT_TIMESTAMP,
     notes TEXT,
-    FOREIGN KEY (student_id) REFERENCES users (id),
-    FOREIGN KEY (class_id) REFERENCES classes (id),
+    FOREIGN KEY (student_id) REFERENCES users (id) ON DELETE CASCADE,
+    FOREIGN KEY (class_id) REFERENCES classes (id) ON DELETE CASCADE,
     FOREIGN KEY (marked_by) REFERENCES users (id)
 );
 
@@ -199,7 +204,7 @@ CREATE TABLE announcements (
     is_active INTEGER DEFAULT 1,
     target_audience TEXT DEFAULT 'class',
     FOREIGN KEY (teacher_id) REFERENCES users (id),
-    FOREIGN KEY (class_id) REFERENCES classes (id)
+    FOREIGN KEY (class_id) REFERENCES classes (id) ON DELETE CASCADE
 );
 
 -- Student doubts/questions
@@ -212,7 +217,12 @@ CREATE TABLE doubts (
     doubt_text TEXT,
     submitted_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     resolved_on DATETIME,
-    resolved_by INTEGER
+    resolved_by INTEGER,
+    class_id INTEGER,
+    response TEXT,
+    responder_id INTEGER,
+    response_time DATETIME,
+    FOREIGN KEY (student_id) REFERENCES users (id) ON DELETE CASCADE
 );
 
 -- Doubt replies from teachers
@@ -222,7 +232,7 @@ CREATE TABLE doubt_replies (
     teacher_id INTEGER NOT NULL,
     reply_text TEXT NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (doubt_id) REFERENCES doubts(id),
+    FOREIGN KEY (doubt_id) REFERENCES doubts(id) ON DELETE CASCADE,
     FOREIGN KEY (teacher_id) REFERENCES users(id)
 );
 
@@ -261,7 +271,7 @@ CREATE TABLE user_role_map (
     role_id INTEGER NOT NULL,
     assigned_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     assigned_by INTEGER,
-    FOREIGN KEY (user_id) REFERENCES users (id),
+    FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
     FOREIGN KEY (role_id) REFERENCES user_roles (id),
     FOREIGN KEY (assigned_by) REFERENCES users (id)
 );
@@ -273,7 +283,7 @@ CREATE TABLE student_subjects (
     subject_name TEXT NOT NULL,
     assigned_by INTEGER,
     assigned_on DATETIME DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (student_id) REFERENCES users (id),
+    FOREIGN KEY (student_id) REFERENCES users (id) ON DELETE CASCADE,
     FOREIGN KEY (assigned_by) REFERENCES users (id)
 );
 
@@ -284,7 +294,7 @@ CREATE TABLE teacher_subjects (
     subject_name TEXT NOT NULL,
     assigned_by INTEGER,
     assigned_on DATETIME DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (teacher_id) REFERENCES users (id),
+    FOREIGN KEY (teacher_id) REFERENCES users (id) ON DELETE CASCADE,
     FOREIGN KEY (assigned_by) REFERENCES users (id)
 );
 
@@ -295,7 +305,11 @@ CREATE TABLE feedback (
     feedback_text TEXT NOT NULL,
     rating INTEGER,
     submitted_on DATETIME DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (student_id) REFERENCES users (id)
+    status TEXT DEFAULT 'pending',
+    admin_response TEXT,
+    response_date DATETIME,
+    responded_by INTEGER,
+    FOREIGN KEY (student_id) REFERENCES users (id) ON DELETE CASCADE
 );
 
 -- Reminders system
@@ -307,8 +321,97 @@ CREATE TABLE reminders (
     sent_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     status TEXT,
     message TEXT,
-    FOREIGN KEY (user_id) REFERENCES users (id),
-    FOREIGN KEY (class_id) REFERENCES classes (id)
+    reminder_date TEXT,
+    FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+    FOREIGN KEY (class_id) REFERENCES classes (id) ON DELETE CASCADE
+);
+
+-- Category weights for weighted grades (weighted_grades.py)
+CREATE TABLE grade_category_weights (
+    class_id INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    weight REAL NOT NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (class_id, category),
+    FOREIGN KEY (class_id) REFERENCES classes (id) ON DELETE CASCADE
+);
+
+-- Stored responses of batch marks requests by idempotency key (marks_batch.py)
+CREATE TABLE marks_batch_requests (
+    teacher_id INTEGER NOT NULL,
+    idempotency_key TEXT NOT NULL,
+    request_hash TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (teacher_id, idempotency_key)
+);
+
+-- Nightly at-risk student flags and job runs (at_risk.py)
+CREATE TABLE at_risk_students (
+    student_id INTEGER PRIMARY KEY,
+    risk_score INTEGER NOT NULL,
+    attendance_rate REAL,
+    attendance_trend REAL,
+    due_assignments INTEGER NOT NULL DEFAULT 0,
+    missed_submissions INTEGER NOT NULL DEFAULT 0,
+    mark_average REAL,
+    mark_trend REAL,
+    reasons TEXT NOT NULL,
+    computed_at DATETIME NOT NULL,
+    FOREIGN KEY (student_id) REFERENCES users (id) ON DELETE CASCADE
+);
+
+CREATE TABLE at_risk_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at DATETIME NOT NULL,
+    finished_at DATETIME NOT NULL,
+    students INTEGER NOT NULL,
+    flagged INTEGER NOT NULL,
+    seconds REAL NOT NULL
+);
+
+-- Schedule change counter, bumped by triggers on classes and the class maps (timetable.py)
+CREATE TABLE schedule_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at DATETIME
+);
+
+-- Private iCalendar feed tokens (calendar_feed.py)
+CREATE TABLE calendar_tokens (
+    user_id INTEGER PRIMARY KEY,
+    token TEXT NOT NULL UNIQUE,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+);
+
+-- Leader leases for background jobs (scheduler_lease.py)
+CREATE TABLE scheduler_leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    acquired_at REAL NOT NULL,
+    heartbeat_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+
+-- Login throttling state (token buckets and backoff per username / client IP)
+CREATE TABLE login_throttle (
+    throttle_key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    failures INTEGER NOT NULL DEFAULT 0,
+    locked_until REAL NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+
+-- Server-side sessions holding the cached user principal
+CREATE TABLE user_sessions (
+    session_id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    principal TEXT,
+    principal_version INTEGER,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    last_seen DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
 );
 
 -- Performance indexes
@@ -316,8 +419,14 @@ CREATE INDEX IF NOT EXISTS idx_users_username ON users(username);
 CREATE INDEX IF NOT EXISTS idx_users_role ON users(role);
 CREATE INDEX IF NOT EXISTS idx_classes_teacher_id ON classes(teacher_id);
 CREATE INDEX IF NOT EXISTS idx_assignments_class_id ON assignments(class_id);
-CREATE INDEX IF NOT EXISTS idx_submissions_assignment_id ON submissions(assignment_id);
+CREATE INDEX IF NOT EXISTS idx_assignments_teacher_id ON assignments(teacher_id);
+CREATE INDEX IF NOT EXISTS idx_submissions_assignment_student ON submissions(assignment_id, student_id);
 CREATE INDEX IF NOT EXISTS idx_submissions_student_id ON submissions(student_id);
+-- Unique mapping keys (enrollments.py inserts with ON CONFLICT DO NOTHING)
+CREATE UNIQUE INDEX IF NOT EXISTS uq_student_class_map_student_id_class_id ON student_class_map(student_id, class_id);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_teacher_class_map_teacher_id_class_id ON teacher_class_map(teacher_id, class_id);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_student_subjects_student_id_subject_name ON student_subjects(student_id, subject_name);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_teacher_subjects_teacher_id_subject_name ON teacher_subjects(teacher_id, subject_name);
 CREATE INDEX IF NOT EXISTS idx_student_class_map_student_id ON student_class_map(student_id);
 CREATE INDEX IF NOT EXISTS idx_student_class_map_class_id ON student_class_map(class_id);
 CREATE INDEX IF NOT EXISTS idx_teacher_class_map_teacher_id ON teacher_class_map(teacher_id);
@@ -325,10 +434,21 @@ CREATE INDEX IF NOT EXISTS idx_teacher_class_map_class_id ON teacher_class_map(c
 CREATE INDEX IF NOT EXISTS idx_attendance_student_id ON attendance(student_id);
 CREATE INDEX IF NOT EXISTS idx_attendance_class_id ON attendance(class_id);
 CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance(attendance_date);
+CREATE INDEX IF NOT EXISTS idx_attendance_class_date_status ON attendance(class_id, attendance_date, status, student_id);
 CREATE INDEX IF NOT EXISTS idx_announcements_teacher_id ON announcements(teacher_id);
 CREATE INDEX IF NOT EXISTS idx_announcements_class_id ON announcements(class_id);
-CREATE INDEX IF NOT EXISTS idx_student_marks_student_id ON student_marks(student_id);
+CREATE INDEX IF NOT EXISTS idx_announcements_active_created ON announcements(is_active, created_at);
+CREATE INDEX IF NOT EXISTS idx_student_marks_student_assignment ON student_marks(student_id, assignment_id);
 CREATE INDEX IF NOT EXISTS idx_student_marks_assignment_id ON student_marks(assignment_id);
+CREATE INDEX IF NOT EXISTS idx_grade_reports_term_class ON grade_reports(term, class_id, rank);
+CREATE INDEX IF NOT EXISTS idx_grade_reports_student ON grade_reports(student_id, term);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_marks_assessment_id_student_id ON marks(assessment_id, student_id);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_student_marks_assignment_id_student_id ON student_marks(assignment_id, student_id);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_reminders_class_user_type_date ON reminders(class_id, user_id, reminder_type, reminder_date);
 CREATE INDEX IF NOT EXISTS idx_doubts_student_id ON doubts(student_id);
+CREATE INDEX IF NOT EXISTS idx_doubts_status ON doubts(status);
+CREATE INDEX IF NOT EXISTS idx_feedback_status_submitted ON feedback(status, submitted_on);
+CREATE INDEX IF NOT EXISTS idx_feedback_submitted_on ON feedback(submitted_on);
 CREATE INDEX IF NOT EXISTS idx_doubt_replies_doubt_id ON doubt_replies(doubt_id);
-CREATE INDEX IF NOT EXISTS idx_notifications_user_id ON notifications(user_id);
+CREATE INDEX IF NOT EXISTS idx_notifications_user_type_read_created ON notifications(user_id, user_type, is_read, created_at);
+CREATE INDEX IF NOT EXISTS idx_user_sessions_user_id ON user_sessions(user_id);
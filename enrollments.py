@@ -0,0 +1,59 @@
+"""
+Set-based class and subject mappings for students and teachers
+Mappings are written with a single executemany INSERT ... ON CONFLICT DO
+NOTHING against a unique (user, class/subject) key, and edits are applied
+as a diff so only the changed rows are inserted or removed.
+"""
+# kind -> (table, user column, value column)
+LINK_TABLES = {
+    'student_class': ('student_class_map', 'student_id', 'class_id'),
+    'teacher_class': ('teacher_class_map', 'teacher_id', 'class_id'),
+    'student_subject': ('student_subjects', 'student_id', 'subject_name'),
+    'teacher_subject': ('teacher_subjects', 'teacher_id', 'subject_name'),
+}
+
+
+def _normalize(kind, values):
+    if kind.endswith('_class'):
+        return {int(value) for value in values if str(value).strip()}
+    return {str(value).strip() for value in values if str(value).strip()}
+
+
+def add_links(cur, kind, pairs, assigned_by=None):
+    """Insert (user_id, value) pairs, skipping ones that already exist
+
+    Returns:
+        int: Number of mappings actually inserted
+    """
+    pairs = list(pairs)
+    if not pairs:
+        return 0
+
+    table, user_column, value_column = LINK_TABLES[kind]
+    cur.executemany(f'''
+        INSERT INTO {table} ({user_column}, {value_column}, assigned_by)
+        VALUES (?, ?, ?)
+        ON CONFLICT ({user_column}, {value_column}) DO NOTHING
+    ''', [(user_id, value, assigned_by) for user_id, value in pairs])
+    return max(cur.rowcount, 0)
+
+
+def sync_links(cur, kind, user_id, values, assigned_by=None):
+    """Make a user's mappings of one kind match values exactly
+
+    Returns:
+        tuple: (added, removed) sets of values
+    """
+    table, user_column, value_column = LINK_TABLES[kind]
+
+    wanted = _normalize(kind, values)
+    cur.execute(f'SELECT {value_column} FROM {table} WHERE {user_column} = ?', (user_id,))
+    current = {row[0] for row in cur.fetchall()}
+
+    added = wanted - current
+    removed = current - wanted
+    if removed:
+        cur.executemany(f'DELETE FROM {table} WHERE {user_column} = ? AND {value_column} = ?',
+                        [(user_id, value) for value in removed])
+    add_links(cur, kind, [(user_id, value) for value in sorted(added)], assigned_by)
+    return added, removed
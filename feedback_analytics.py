@@ -0,0 +1,110 @@
+"""
+Feedback analytics for the admin feedback page
+Status counts come from one GROUP BY, rating distribution and the
+submission trend are aggregated in SQL, and the feedback list is served a
+page at a time. The (status, submitted_on) index keeps status-filtered
+pages and the trend window cheap as submissions accumulate.
+"""
+STATUSES = ('pending', 'reviewed', 'resolved')
+DATE_RANGES = {
+    'today': "date('now')",
+    'week': "date('now', '-6 days')",
+    'month': "date('now', 'start of month')"
+}
+PER_PAGE = 25
+
+
+def _filters(status=None, rating=None, date_range=None):
+    """Build the WHERE clause shared by the list and its count"""
+    conditions = []
+    params = []
+    if status in STATUSES:
+        # Rows saved before the status column existed count as pending
+        if status == 'pending':
+            conditions.append("(f.status = 'pending' OR f.status IS NULL)")
+        else:
+            conditions.append('f.status = ?')
+            params.append(status)
+    if rating:
+        conditions.append('f.rating = ?')
+        params.append(int(rating))
+    if date_range in DATE_RANGES:
+        conditions.append(f'f.submitted_on >= {DATE_RANGES[date_range]}')
+    return ('WHERE ' + ' AND '.join(conditions)) if conditions else '', params
+
+
+def get_status_counts(cur):
+    """Count feedback per status in a single pass"""
+    cur.execute('''
+        SELECT COALESCE(status, 'pending'), COUNT(*)
+        FROM feedback
+        GROUP BY COALESCE(status, 'pending')
+    ''')
+    counts = dict(cur.fetchall())
+    stats = {status: counts.get(status, 0) for status in STATUSES}
+    stats['total'] = sum(counts.values())
+    return stats
+
+
+def get_rating_distribution(cur):
+    """Number of submissions per star rating (None for unrated)"""
+    cur.execute('SELECT rating, COUNT(*) FROM feedback GROUP BY rating')
+    counts = dict(cur.fetchall())
+    distribution = {stars: counts.get(stars, 0) for stars in range(5, 0, -1)}
+    distribution[None] = counts.get(None, 0)
+    return distribution
+
+
+def get_trend(cur, months=6):
+    """Submissions and average rating per month for the last few months"""
+    cur.execute('''
+        SELECT strftime('%Y-%m', submitted_on) AS month,
+               COUNT(*),
+               ROUND(AVG(rating), 2)
+        FROM feedback
+        WHERE submitted_on >= date('now', 'start of month', ?)
+        GROUP BY month
+        ORDER BY month
+    ''', (f'-{months - 1} months',))
+    return [{'month': month, 'count': count, 'avg_rating': avg_rating}
+            for month, count, avg_rating in cur.fetchall()]
+
+
+def get_feedback_page(cur, page=1, per_page=PER_PAGE, status=None, rating=None, date_range=None):
+    """One page of feedback rows, newest first
+
+    Returns:
+        tuple: (rows, pagination) where rows are dicts and pagination has
+        the page actually served, the page count and the filtered total
+    """
+    where, params = _filters(status, rating, date_range)
+
+    cur.execute(f'SELECT COUNT(*) FROM feedback f {where}', params)
+    total = cur.fetchone()[0]
+
+    pages = max(1, (total + per_page - 1) // per_page)
+    page = min(max(1, page), pages)
+    cur.execute(f'''
+        SELECT f.id, f.student_id, f.feedback_text, f.rating, f.submitted_on,
+               u.username, f.status, f.admin_response, f.response_date
+        FROM feedback f
+        LEFT JOIN users u ON f.student_id = u.id
+        {where}
+        ORDER BY f.submitted_on DESC, f.id DESC
+        LIMIT ? OFFSET ?
+    ''', params + [per_page, (page - 1) * per_page])
+
+    rows = []
+    for row in cur.fetchall():
+        rows.append({
+            'id': row[0],
+            'student_id': row[1],
+            'feedback_text': row[2],
+            'rating': row[3],
+            'submitted_on': row[4],
+            'username': row[5],
+            'status': row[6] or 'pending',
+            'admin_response': row[7] or '',
+            'response_date': row[8] or ''
+        })
+    return rows, {'page': page, 'pages': pages, 'total': total}
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Term grade snapshots stored in grade_reports
+One INSERT ... SELECT per run aggregates student_marks per (student,
+class), ranks students inside each class with RANK() and writes the rows
+in bulk, so transcripts and historical reports read precomputed rows
+instead of re-aggregating marks. A term is the set of assignments due in
+[due_from, due_before).
+
+Usage: python grade_snapshots.py --term "2024-25 Term 1" --from 2024-08-01 --before 2025-01-01
+"""
+import sqlite3
+import sys
+
+from grading import grade_sql
+
+DATABASE = 'users.db'
+
+
+def _scope(due_from=None, due_before=None, class_ids=None):
+    conditions = []
+    params = []
+    if due_from:
+        conditions.append('a.due_date >= ?')
+        params.append(due_from)
+    if due_before:
+        conditions.append('a.due_date < ?')
+        params.append(due_before)
+    if class_ids:
+        conditions.append(f"sm.class_id IN ({','.join('?' * len(class_ids))})")
+        params.extend(class_ids)
+    return ('WHERE ' + ' AND '.join(conditions)) if conditions else '', params
+
+
+def write_snapshot(conn, term, due_from=None, due_before=None, class_ids=None, generated_by=None, replace=True,
+                   marks_table='student_marks'):
+    """Write the grade_reports rows of a term without committing
+
+    With replace, earlier rows of the term (for the same classes) are
+    replaced; otherwise only missing (student, class) rows are added.
+    marks_table is the marks source, e.g. term_archive.table_source()
+    for terms that reach into the archive.
+
+    Returns:
+        int: number of rows written
+    """
+    class_ids = list(class_ids) if class_ids else None
+    where, params = _scope(due_from, due_before, class_ids)
+
+    if replace:
+        delete_sql = 'DELETE FROM grade_reports WHERE term = ?'
+        delete_params = [term]
+        if class_ids:
+            delete_sql += f" AND class_id IN ({','.join('?' * len(class_ids))})"
+            delete_params.extend(class_ids)
+        conn.execute(delete_sql, delete_params)
+
+    # Ranks are taken over every student of the class before existing rows
+    # are skipped, so added rows rank against the ones already stored
+    cur = conn.execute(f'''
+        INSERT INTO grade_reports (student_id, class_id, term, total_marks, obtained_marks,
+                                   percentage, grade, rank, generated_by)
+        SELECT student_id, class_id, ?, total, obtained, percentage,
+               {grade_sql('percentage')}, class_rank, ?
+        FROM (
+            SELECT student_id, class_id, total, obtained, percentage,
+                   RANK() OVER (PARTITION BY class_id ORDER BY percentage DESC) AS class_rank
+            FROM (
+                SELECT sm.student_id, sm.class_id,
+                       SUM(sm.total_marks) AS total,
+                       SUM(sm.marks_obtained) AS obtained,
+                       ROUND(SUM(sm.marks_obtained) * 100.0 / NULLIF(SUM(sm.total_marks), 0), 2) AS percentage
+                FROM {marks_table} sm
+                JOIN assignments a ON sm.assignment_id = a.id
+                {where}
+                GROUP BY sm.student_id, sm.class_id
+            )
+        ) t
+        WHERE NOT EXISTS (
+            SELECT 1 FROM grade_reports g
+            WHERE g.student_id = t.student_id AND g.class_id = t.class_id AND g.term = ?
+        )
+    ''', [term, generated_by] + params + [term])
+    return cur.rowcount
+
+
+def snapshot_term(conn, term, due_from=None, due_before=None, class_ids=None, generated_by=None):
+    """Replace a term's grade_reports rows in one transaction
+
+    Marks of archived terms are read from the archive database, so an
+    archived term can be regenerated; if the archive cannot be read the
+    existing rows are kept and ValueError is raised.
+    """
+    # term_archive imports write_snapshot from this module
+    from term_archive import needs_archive, table_source
+
+    # A term without a start date covers every earlier (possibly archived) mark;
+    # ATTACH has to happen before the transaction starts
+    since = due_from or '0001-01-01'
+    marks_table = table_source(conn, 'student_marks', since)
+    if marks_table == 'student_marks' and needs_archive(conn, since):
+        raise ValueError(f'Marks of {term} are archived and the archive database could not be read')
+    try:
+        if not conn.in_transaction:
+            conn.execute('BEGIN IMMEDIATE')
+        written = write_snapshot(conn, term, due_from, due_before, class_ids, generated_by,
+                                 marks_table=marks_table)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return written
+
+
+def list_terms(cur):
+    """Terms with snapshots, most recently generated first"""
+    cur.execute('''
+        SELECT term, COUNT(*), MAX(generated_at)
+        FROM grade_reports
+        GROUP BY term
+        ORDER BY MAX(generated_at) DESC
+    ''')
+    return [{'term': term, 'rows': rows, 'generated_at': generated_at}
+            for term, rows, generated_at in cur.fetchall()]
+
+
+def get_term_reports(cur, term, class_id=None):
+    """Snapshot rows of a term, by class and rank"""
+    class_filter = 'AND g.class_id = ?' if class_id else ''
+    params = [term, class_id] if class_id else [term]
+    cur.execute(f'''
+        SELECT g.student_id, u.name, u.username, g.class_id, c.name,
+               g.total_marks, g.obtained_marks, g.percentage, g.grade, g.rank, g.generated_at
+        FROM grade_reports g
+        JOIN users u ON g.student_id = u.id
+        JOIN classes c ON g.class_id = c.id
+        WHERE g.term = ? {class_filter}
+        ORDER BY c.name, g.rank, u.name
+    ''', params)
+    return [{
+        'student_id': row[0],
+        'student_name': row[1],
+        'username': row[2],
+        'class_id': row[3],
+        'class_name': row[4],
+        'total_marks': row[5],
+        'obtained_marks': row[6],
+        'percentage': row[7],
+        'grade': row[8],
+        'rank': row[9],
+        'generated_at': row[10]
+    } for row in cur.fetchall()]
+
+
+def get_transcript(cur, student_id):
+    """Every snapshot row of one student, newest term first"""
+    cur.execute('''
+        SELECT g.term, c.name, g.total_marks, g.obtained_marks, g.percentage, g.grade, g.rank,
+               (SELECT COUNT(*) FROM grade_reports peers WHERE peers.term = g.term AND peers.class_id = g.class_id)
+        FROM grade_reports g
+        JOIN classes c ON g.class_id = c.id
+        WHERE g.student_id = ?
+        ORDER BY g.generated_at DESC, c.name
+    ''', (student_id,))
+    return [{
+        'term': row[0],
+        'class_name': row[1],
+        'total_marks': row[2],
+        'obtained_marks': row[3],
+        'percentage': row[4],
+        'grade': row[5],
+        'rank': row[6],
+        'class_size': row[7]
+    } for row in cur.fetchall()]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Generate grade_reports snapshots for a term')
+    parser.add_argument('--term', required=True, help='Term name stored on the snapshot rows')
+    parser.add_argument('--from', dest='due_from', help='First assignment due date of the term (YYYY-MM-DD)')
+    parser.add_argument('--before', dest='due_before', help='Assignments due on or after this date are excluded')
+    parser.add_argument('--class-id', type=int, action='append', help='Limit to a class (repeatable)')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(DATABASE)
+    try:
+        written = snapshot_term(conn, args.term, args.due_from, args.due_before, args.class_id)
+    except (sqlite3.Error, ValueError) as e:
+        print(f"✗ Snapshot failed: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+    print(f"✓ Wrote {written} grade report rows for {args.term}")
@@ -0,0 +1,126 @@
+"""
+Incremental gradebook cell saves
+Each edited cell of the marks roster is sent on its own as (student,
+assignment, value, version). student_marks rows carry a version that a
+trigger bumps on every change of the mark, so a save only applies when
+the row is still at the version the teacher was looking at; otherwise the
+current value is returned as a conflict. A successful save answers with
+the recalculated totals of that student's row only.
+"""
+from grading import letter_grade
+from marks_batch import validate_items
+import student_progress
+from term_archive import assignment_archived
+from weighted_grades import compute_class_grades, invalidate
+
+
+def _current_cell(cur, student_id, assignment_id):
+    cur.execute('''
+        SELECT marks_obtained, total_marks, grade, version
+        FROM student_marks
+        WHERE student_id = ? AND assignment_id = ?
+    ''', (student_id, assignment_id))
+    row = cur.fetchone()
+    if not row:
+        return {'obtained': None, 'total': None, 'grade': None, 'version': 0}
+    return {'obtained': row[0], 'total': row[1], 'grade': row[2], 'version': row[3]}
+
+
+def row_totals(cur, class_id, teacher_id, student_id):
+    """Totals of one roster row, matching marks_roster's summary columns"""
+    cur.execute('''
+        SELECT TOTAL(sm.marks_obtained), TOTAL(COALESCE(a.points, 100))
+        FROM assignments a
+        LEFT JOIN student_marks sm ON sm.assignment_id = a.id AND sm.student_id = ?
+        WHERE a.class_id = ? AND a.teacher_id = ?
+    ''', (student_id, class_id, teacher_id))
+    obtained, possible = cur.fetchone()
+    percentage = round(obtained / possible * 100, 2) if possible else 0
+    weighted = compute_class_grades(cur, class_id)['students'].get(student_id, {})
+    return {
+        'total_obtained': obtained,
+        'total_possible': possible,
+        'percentage': percentage,
+        'grade': letter_grade(percentage) if possible else 'N/A',
+        'weighted_percentage': weighted.get('weighted_percentage'),
+        'weighted_grade': weighted.get('weighted_grade', 'N/A')
+    }
+
+
+def save_cell(conn, teacher_id, assignment_id, student_id, value, version):
+    """Apply one cell edit if the row is still at the given version
+
+    version 0 means the cell was empty when the teacher loaded it. An
+    empty value clears the cell. The caller must have checked that the
+    teacher may grade the assignment.
+
+    Returns:
+        tuple: (http_status, response dict)
+    """
+    cur = conn.cursor()
+
+    cur.execute('SELECT class_id, COALESCE(points, 100) FROM assignments WHERE id = ?', (assignment_id,))
+    assignment = cur.fetchone()
+    if not assignment:
+        return 404, {'success': False, 'message': 'Assignment not found'}
+    class_id, max_score = assignment
+    if assignment_archived(conn, assignment_id):
+        return 403, {'success': False, 'message': 'Marks of archived terms are read-only'}
+
+    try:
+        version = int(version)
+    except (TypeError, ValueError):
+        return 400, {'success': False, 'message': 'version must be an integer'}
+
+    rows, results = validate_items(cur, class_id, max_score, [{'student_id': student_id, 'score': value}])
+    if results[0]['status'] == 'error':
+        return 400, {'success': False, 'message': results[0]['message']}
+    student_id = results[0]['student_id']
+
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        if not rows and version == 0:
+            # Clearing a cell that was empty: fine unless someone marked it meanwhile
+            applied = _current_cell(cur, student_id, assignment_id)['version'] == 0
+        elif not rows:
+            cur.execute('''
+                DELETE FROM student_marks
+                WHERE student_id = ? AND assignment_id = ? AND version = ?
+            ''', (student_id, assignment_id, version))
+            applied = cur.rowcount == 1
+        else:
+            score = rows[0]['score']
+            percentage = score * 100.0 / max_score if max_score else 0
+            values = (score, max_score, round(percentage, 2), letter_grade(percentage), teacher_id)
+            if version == 0:
+                cur.execute('''
+                    INSERT INTO student_marks (marks_obtained, total_marks, percentage, grade, marked_by,
+                                               student_id, assignment_id, class_id, version)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1)
+                    ON CONFLICT (assignment_id, student_id) DO NOTHING
+                ''', values + (student_id, assignment_id, class_id))
+            else:
+                cur.execute('''
+                    UPDATE student_marks
+                    SET marks_obtained = ?, total_marks = ?, percentage = ?, grade = ?, marked_by = ?,
+                        marked_at = CURRENT_TIMESTAMP, version = version + 1
+                    WHERE student_id = ? AND assignment_id = ? AND version = ?
+                ''', values + (student_id, assignment_id, version))
+            applied = cur.rowcount == 1
+
+        cell = _current_cell(cur, student_id, assignment_id)
+        if not applied:
+            conn.rollback()
+            return 409, {
+                'success': False,
+                'message': 'This mark was changed by someone else; the current value is shown',
+                'cell': cell
+            }
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    invalidate(class_id)
+    student_progress.invalidate(student_id=student_id, class_id=class_id)
+    return 200, {'success': True, 'cell': cell, 'row': row_totals(cur, class_id, teacher_id, student_id)}
@@ -0,0 +1,22 @@
+"""
+Letter grade bands shared by every grade calculation
+Marks pages, reports, snapshots and weighted grades all map percentages
+to letters through this module so the boundaries cannot drift apart.
+"""
+
+# (lowest percentage, grade), highest band first; anything below is F
+GRADE_BANDS = ((90, 'A+'), (80, 'A'), (70, 'B+'), (60, 'B'), (50, 'C'), (40, 'D'))
+
+
+def letter_grade(percentage):
+    """Letter grade of a percentage using GRADE_BANDS"""
+    for floor, grade in GRADE_BANDS:
+        if percentage >= floor:
+            return grade
+    return 'F'
+
+
+def grade_sql(column):
+    """SQL CASE mapping a percentage column to a letter grade"""
+    bands = ' '.join(f"WHEN {column} >= {floor} THEN '{grade}'" for floor, grade in GRADE_BANDS)
+    return f"CASE {bands} ELSE 'F' END"
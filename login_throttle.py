@@ -0,0 +1,211 @@
+"""
+Login throttling for the authentication blueprint
+A token bucket per username sheds credential-stuffing bursts before they
+reach the users table, and repeated failures for the same username back
+off exponentially. A whole school logs in from one NAT address, so the
+client IP bucket is only charged for failed password checks: it limits
+how fast one address can guess without holding back good logins. State
+is held in memory and flushed to SQLite periodically so a restart does
+not clear an active lockout.
+Failures are forgotten once a key has been quiet (no attempts and no
+lockout) for failure_ttl seconds, so keys tried once by a credential
+stuffing run do not pile up in memory or in the table.
+"""
+import sqlite3
+import threading
+import time
+
+
+class LoginThrottle:
+    def __init__(self, db_path='users.db', user_capacity=5, user_refill_per_minute=5,
+                 ip_capacity=60, ip_refill_per_minute=30, user_failure_threshold=3,
+                 base_backoff=2, max_backoff=900, persist_interval=30, failure_ttl=3600):
+        self.db_path = db_path
+        # A school network shares one IP, so its bucket counts failures only
+        # and is far larger than a username's
+        self.limits = {
+            'user': (user_capacity, user_refill_per_minute / 60.0),
+            'ip': (ip_capacity, ip_refill_per_minute / 60.0)
+        }
+        self.user_failure_threshold = user_failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.persist_interval = persist_interval
+        self.failure_ttl = failure_ttl
+
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._dirty = set()
+        self._loaded = False
+        self._last_persist = time.time()
+
+    def _keys(self, username, ip):
+        """Build the throttle keys checked for one login attempt"""
+        keys = []
+        if username:
+            keys.append(('user', f"user:{username.strip().lower()}"))
+        if ip:
+            keys.append(('ip', f"ip:{ip}"))
+        return keys
+
+    def _load(self):
+        """Load persisted lockouts the first time the throttle is used"""
+        self._loaded = True
+        try:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                rows = conn.execute('''
+                    SELECT throttle_key, tokens, failures, locked_until, updated_at
+                    FROM login_throttle
+                    WHERE MAX(updated_at, locked_until) > ?
+                ''', (time.time() - self.failure_ttl,)).fetchall()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠ Could not load login throttle state: {e}")
+            return
+
+        for key, tokens, failures, locked_until, updated_at in rows:
+            self._entries[key] = {
+                'tokens': tokens,
+                'failures': failures,
+                'locked_until': locked_until,
+                'updated': updated_at
+            }
+
+    def _expired(self, entry, now):
+        """True once a key has been quiet for failure_ttl seconds"""
+        return max(entry['updated'], entry['locked_until']) + self.failure_ttl <= now
+
+    def _entry(self, kind, key, now):
+        """Get an entry with its bucket refilled up to now"""
+        capacity, refill_rate = self.limits[kind]
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = {'tokens': float(capacity), 'failures': 0, 'locked_until': 0, 'updated': now}
+            self._entries[key] = entry
+        else:
+            if self._expired(entry, now):
+                entry['failures'] = 0
+                entry['locked_until'] = 0
+            elapsed = max(0, now - entry['updated'])
+            entry['tokens'] = min(capacity, entry['tokens'] + elapsed * refill_rate)
+            entry['updated'] = now
+        return entry
+
+    def check(self, username, ip):
+        """Consume one attempt for this username; the IP bucket is only checked
+
+        Returns:
+            int: Seconds the caller must wait, or 0 if the attempt may proceed
+        """
+        now = time.time()
+        with self._lock:
+            if not self._loaded:
+                self._load()
+
+            wait = 0
+            entries = []
+            for kind, key in self._keys(username, ip):
+                entry = self._entry(kind, key, now)
+                entries.append((key, entry))
+
+                if entry['locked_until'] > now:
+                    wait = max(wait, entry['locked_until'] - now)
+                elif entry['tokens'] < 1:
+                    refill_rate = self.limits[kind][1]
+                    wait = max(wait, (1 - entry['tokens']) / refill_rate)
+
+            # Only spend a token when every key allows the attempt
+            if not wait:
+                for key, entry in entries:
+                    if key.startswith('user:'):
+                        entry['tokens'] -= 1
+                        self._dirty.add(key)
+
+            self._maybe_persist(now)
+
+        return int(wait) + 1 if wait else 0
+
+    def record_failure(self, username, ip):
+        """Register a failed password check: charge the IP, back off the username"""
+        now = time.time()
+        with self._lock:
+            for kind, key in self._keys(username, ip):
+                entry = self._entry(kind, key, now)
+                if kind == 'ip':
+                    entry['tokens'] = max(0.0, entry['tokens'] - 1)
+                else:
+                    entry['failures'] += 1
+                    excess = entry['failures'] - self.user_failure_threshold
+                    if excess >= 0:
+                        backoff = min(self.max_backoff, self.base_backoff * (2 ** excess))
+                        entry['locked_until'] = now + backoff
+                self._dirty.add(key)
+
+            self._maybe_persist(now)
+
+    def record_success(self, username, ip):
+        """Clear the failure history for a username after a good login"""
+        now = time.time()
+        with self._lock:
+            for kind, key in self._keys(username, None):
+                entry = self._entry(kind, key, now)
+                entry['failures'] = 0
+                entry['locked_until'] = 0
+                self._dirty.add(key)
+
+            self._maybe_persist(now)
+
+    def _maybe_persist(self, now):
+        """Flush changed entries to SQLite once per persist interval"""
+        if now - self._last_persist < self.persist_interval:
+            return
+        self._last_persist = now
+        self.persist(now)
+
+    def persist(self, now=None):
+        """Write dirty entries to SQLite and drop idle or expired ones"""
+        now = now or time.time()
+
+        # Entries with a full bucket and no failures carry no state worth keeping
+        idle = []
+        for key, entry in self._entries.items():
+            kind = key.split(':', 1)[0]
+            capacity, refill_rate = self.limits[kind]
+            tokens = min(capacity, entry['tokens'] + (now - entry['updated']) * refill_rate)
+            if self._expired(entry, now) or (
+                    tokens >= capacity and not entry['failures'] and entry['locked_until'] <= now):
+                idle.append(key)
+
+        for key in idle:
+            del self._entries[key]
+
+        upserts = [
+            (key, e['tokens'], e['failures'], e['locked_until'], e['updated'])
+            for key, e in ((k, self._entries[k]) for k in self._dirty if k in self._entries)
+        ]
+        removals = [(key,) for key in idle]
+        self._dirty.clear()
+
+        try:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                conn.executemany('''
+                    INSERT OR REPLACE INTO login_throttle
+                        (throttle_key, tokens, failures, locked_until, updated_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', upserts)
+                conn.executemany('DELETE FROM login_throttle WHERE throttle_key = ?', removals)
+                # Rows expired while not in memory (e.g. skipped by _load)
+                conn.execute('DELETE FROM login_throttle WHERE MAX(updated_at, locked_until) <= ?',
+                             (now - self.failure_ttl,))
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠ Could not persist login throttle state: {e}")
+
+
+# Shared instance used by routes/auth.py
+login_throttle = LoginThrottle()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Management commands for School Management Portal
+Keeps one-off and long-running work out of the web workers:
+
+    python manage.py migrate          create users.db if missing and apply migrations/
+    python manage.py migrate --check  list pending migrations without applying them
+    python manage.py seed             add the test accounts and sample classes
+    python manage.py scheduler        run the reminder and at-risk jobs (one process only)
+    python manage.py bench-startup    time worker startup (import + create_app + first request)
+"""
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+
+import schema_migrations
+
+DATABASE = 'users.db'
+
+# Measured in a fresh interpreter so imports are not already cached
+BENCH_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+import app as app_module
+imported = time.perf_counter()
+if sys.argv[1] == 'init':
+    app_module.init_database()
+app = app_module.create_app()
+created = time.perf_counter()
+app.test_client().get('/auth/login')
+served = time.perf_counter()
+print(json.dumps({'import': imported - started, 'create_app': created - imported,
+                  'first_request': served - created, 'total': served - started}))
+'''
+
+
+def migrate():
+    """Create the database if missing and apply pending migrations"""
+    if not os.path.exists(DATABASE):
+        from init_database import create_database
+        create_database()
+
+    conn = sqlite3.connect(DATABASE)
+    try:
+        applied = schema_migrations.migrate(conn)
+        print(f"✓ Schema at version {schema_migrations.check(conn)['current']} ({applied} migrations applied)")
+    except (sqlite3.Error, ValueError) as e:
+        print(f"✗ Migration failed: {e}")
+        return False
+    finally:
+        conn.close()
+    return True
+
+
+def check_migrations():
+    """Report pending or edited migrations without changing the database"""
+    if not os.path.exists(DATABASE):
+        print("✗ No database found, run: python manage.py migrate")
+        return False
+
+    conn = sqlite3.connect(DATABASE)
+    try:
+        status = schema_migrations.check(conn)
+    finally:
+        conn.close()
+
+    print(f"📋 Schema at version {status['current']}")
+    for migration in status['pending']:
+        print(f"   pending   {migration.version:04d}_{migration.name}")
+    for migration in status['modified']:
+        print(f"   modified  {migration.version:04d}_{migration.name} (file changed after it was applied)")
+    for version in status['unknown']:
+        print(f"   unknown   {version:04d} (applied, but no migration file)")
+    if status['pending'] or status['modified']:
+        return False
+    print("✓ Database is up to date")
+    return True
+
+
+def seed():
+    """Add test data (skipped when the admin account already exists)"""
+    from app import populate_test_data
+    if not os.path.exists(DATABASE):
+        print("✗ No database found, run: python manage.py migrate")
+        return False
+    populate_test_data()
+    return True
+
+
+def scheduler():
+    """Run the background jobs in the foreground of this process"""
+    from at_risk import start_nightly_thread
+    from reminder_scheduler import ReminderScheduler
+
+    start_nightly_thread()
+    print("↗ At-risk detection job scheduled in background thread")
+    ReminderScheduler().run_scheduler()
+    return True
+
+
+def bench_startup(runs=5, with_init=False):
+    """Time cold worker starts and print min / median / max per phase"""
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', BENCH_SCRIPT, 'init' if with_init else 'lazy'],
+                                capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        if result.returncode != 0:
+            print(f"✗ Startup failed:\n{result.stderr}")
+            return False
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    mode = 'with init_database()' if with_init else 'lazy create_app()'
+    print(f"⏱ Worker startup, {mode}, {runs} runs (ms)")
+    print(f"   {'phase':<14}{'min':>8}{'median':>8}{'max':>8}")
+    for phase in ('import', 'create_app', 'first_request', 'total'):
+        values = [sample[phase] * 1000 for sample in samples]
+        print(f"   {phase:<14}{min(values):>8.1f}{statistics.median(values):>8.1f}{max(values):>8.1f}")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='School Management Portal management commands')
+    commands = parser.add_subparsers(dest='command', required=True)
+    migrate_parser = commands.add_parser('migrate', help='Create the database and apply migrations')
+    migrate_parser.add_argument('--check', action='store_true',
+                                help='Only list pending migrations (exit code 1 if any)')
+    commands.add_parser('seed', help='Add test data')
+    commands.add_parser('scheduler', help='Run the reminder and at-risk jobs')
+    bench = commands.add_parser('bench-startup', help='Time worker startup')
+    bench.add_argument('--runs', type=int, default=5, help='Number of cold starts (default 5)')
+    bench.add_argument('--with-init', action='store_true',
+                       help='Also run init_database() like create_app used to, for comparison')
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        ok = check_migrations() if args.check else migrate()
+    elif args.command == 'seed':
+        ok = seed()
+    elif args.command == 'scheduler':
+        ok = scheduler()
+    else:
+        ok = bench_startup(args.runs, args.with_init)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,234 @@
+"""
+Batch marks saving for the gradebook JSON API
+A request carries the marks of many students for one assessment (marks
+table) or one assignment (student_marks). The whole payload is validated
+before anything is written; valid batches are upserted with a single
+executemany on the (item, student) unique key inside one transaction.
+Clients may send an idempotency key: the response of a completed request
+is stored with it and replayed when the same request is retried.
+"""
+import hashlib
+import json
+import math
+
+from grading import letter_grade
+from term_archive import assignment_archived
+
+MAX_ITEMS = 1000
+MAX_COMMENT_LENGTH = 1000
+IDEMPOTENCY_TTL = '-1 day'
+
+KINDS = {
+    'assessment': {
+        'table': 'marks',
+        'item_column': 'assessment_id',
+        'item_sql': 'SELECT class_id, max_score FROM assessments WHERE id = ?',
+    },
+    'assignment': {
+        'table': 'student_marks',
+        'item_column': 'assignment_id',
+        'item_sql': 'SELECT class_id, COALESCE(points, 100) FROM assignments WHERE id = ?',
+    },
+}
+
+UPSERT_SQL = {
+    'assessment': '''
+        INSERT INTO marks (assessment_id, student_id, score, comment, marked_by, updated_at)
+        VALUES (:item_id, :student_id, :score, :comment, :teacher_id, CURRENT_TIMESTAMP)
+        ON CONFLICT (assessment_id, student_id) DO UPDATE SET
+            score = excluded.score,
+            comment = excluded.comment,
+            marked_by = excluded.marked_by,
+            updated_at = CURRENT_TIMESTAMP
+    ''',
+    'assignment': '''
+        INSERT INTO student_marks (student_id, assignment_id, class_id, marks_obtained, total_marks,
+                                   percentage, grade, remarks, marked_by, marked_at)
+        VALUES (:student_id, :item_id, :class_id, :score, :max_score,
+                :percentage, :grade, :comment, :teacher_id, CURRENT_TIMESTAMP)
+        ON CONFLICT (assignment_id, student_id) DO UPDATE SET
+            marks_obtained = excluded.marks_obtained,
+            total_marks = excluded.total_marks,
+            percentage = excluded.percentage,
+            grade = excluded.grade,
+            remarks = excluded.remarks,
+            marked_by = excluded.marked_by,
+            marked_at = CURRENT_TIMESTAMP
+    ''',
+}
+
+
+def get_item(cur, kind, item_id):
+    """(class_id, max_score) of an assessment or assignment, or None"""
+    cur.execute(KINDS[kind]['item_sql'], (item_id,))
+    return cur.fetchone()
+
+
+def _request_hash(kind, item_id, items):
+    payload = json.dumps([kind, item_id, items], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _enrolled(cur, class_id, student_ids):
+    if not student_ids:
+        return set()
+    placeholders = ','.join('?' * len(student_ids))
+    cur.execute(f'''
+        SELECT student_id FROM student_class_map
+        WHERE class_id = ? AND student_id IN ({placeholders})
+    ''', [class_id] + list(student_ids))
+    return {row[0] for row in cur.fetchall()}
+
+
+def validate_items(cur, class_id, max_score, items):
+    """Check every item of a payload
+
+    Returns:
+        tuple: (rows, results) where rows are the marks to write and
+        results has one entry per item, in order; any 'error' result
+        means the batch must be rejected
+    """
+    parsed = []
+    for item in items:
+        if not isinstance(item, dict):
+            parsed.append((None, None, None, 'Each item must be an object'))
+            continue
+        try:
+            student_id = int(item.get('student_id'))
+        except (TypeError, ValueError):
+            parsed.append((None, None, None, 'student_id must be an integer'))
+            continue
+
+        score = item.get('score')
+        if score is None or score == '':
+            parsed.append((student_id, None, None, None))
+            continue
+        try:
+            score = float(score)
+        except (TypeError, ValueError):
+            parsed.append((student_id, None, None, f'Invalid score {score!r}'))
+            continue
+        if not math.isfinite(score) or score < 0 or score > max_score:
+            parsed.append((student_id, None, None, f'Score must be between 0 and {max_score:g}'))
+            continue
+
+        comment = item.get('comment') or ''
+        if not isinstance(comment, str) or len(comment) > MAX_COMMENT_LENGTH:
+            parsed.append((student_id, None, None, f'Comment must be text of at most {MAX_COMMENT_LENGTH} characters'))
+            continue
+        parsed.append((student_id, score, comment.strip(), None))
+
+    enrolled = _enrolled(cur, class_id, {p[0] for p in parsed if p[0] is not None})
+
+    rows = []
+    results = []
+    seen = set()
+    for student_id, score, comment, error in parsed:
+        if error is None and student_id is not None:
+            if student_id in seen:
+                error = 'Student appears more than once in this batch'
+            elif student_id not in enrolled:
+                error = 'Student is not enrolled in this class'
+        if student_id is not None:
+            seen.add(student_id)
+
+        if error:
+            results.append({'student_id': student_id, 'status': 'error', 'message': error})
+        elif score is None:
+            results.append({'student_id': student_id, 'status': 'skipped'})
+        else:
+            results.append({'student_id': student_id, 'status': 'valid'})
+            rows.append({'student_id': student_id, 'score': score, 'comment': comment})
+    return rows, results
+
+
+def save_batch(conn, kind, item_id, teacher_id, items, idempotency_key=None):
+    """Validate and upsert one batch of marks
+
+    The caller must have checked that the teacher may grade item_id.
+
+    Returns:
+        tuple: (http_status, response dict)
+    """
+    cur = conn.cursor()
+
+    if not isinstance(items, list) or not items:
+        return 400, {'success': False, 'message': 'items must be a non-empty list'}
+    if len(items) > MAX_ITEMS:
+        return 400, {'success': False, 'message': f'At most {MAX_ITEMS} items per request'}
+
+    item = get_item(cur, kind, item_id)
+    if not item:
+        return 404, {'success': False, 'message': f'{kind.capitalize()} not found'}
+    class_id, max_score = item
+    if kind == 'assignment' and assignment_archived(conn, item_id):
+        return 403, {'success': False, 'message': 'Marks of archived terms are read-only'}
+
+    request_hash = _request_hash(kind, item_id, items)
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+
+        if idempotency_key:
+            cur.execute('''
+                SELECT request_hash, response FROM marks_batch_requests
+                WHERE teacher_id = ? AND idempotency_key = ? AND created_at >= datetime('now', ?)
+            ''', (teacher_id, idempotency_key, IDEMPOTENCY_TTL))
+            stored = cur.fetchone()
+            if stored:
+                conn.rollback()
+                if stored[0] != request_hash:
+                    return 409, {'success': False, 'message': 'Idempotency key was already used for a different request'}
+                return 200, dict(json.loads(stored[1]), replayed=True)
+
+        rows, results = validate_items(cur, class_id, max_score, items)
+        failed = sum(1 for result in results if result['status'] == 'error')
+        if failed:
+            conn.rollback()
+            return 400, {
+                'success': False,
+                'message': f'{failed} item(s) failed validation; nothing was saved',
+                'results': results
+            }
+
+        # Existing marks decide between 'created' and 'updated'
+        existing = set()
+        if rows:
+            table, item_column = KINDS[kind]['table'], KINDS[kind]['item_column']
+            placeholders = ','.join('?' * len(rows))
+            cur.execute(f'''
+                SELECT student_id FROM {table}
+                WHERE {item_column} = ? AND student_id IN ({placeholders})
+            ''', [item_id] + [row['student_id'] for row in rows])
+            existing = {row[0] for row in cur.fetchall()}
+
+        for row in rows:
+            percentage = row['score'] * 100.0 / max_score if max_score else 0
+            row.update(item_id=item_id, class_id=class_id, max_score=max_score, teacher_id=teacher_id,
+                       percentage=round(percentage, 2), grade=letter_grade(percentage))
+        cur.executemany(UPSERT_SQL[kind], rows)
+
+        for result in results:
+            if result['status'] == 'valid':
+                result['status'] = 'updated' if result['student_id'] in existing else 'created'
+
+        response = {
+            'success': True,
+            'created': sum(1 for r in results if r['status'] == 'created'),
+            'updated': sum(1 for r in results if r['status'] == 'updated'),
+            'skipped': sum(1 for r in results if r['status'] == 'skipped'),
+            'results': results,
+            'replayed': False
+        }
+
+        if idempotency_key:
+            cur.execute("DELETE FROM marks_batch_requests WHERE created_at < datetime('now', ?)", (IDEMPOTENCY_TTL,))
+            cur.execute('''
+                INSERT OR REPLACE INTO marks_batch_requests (teacher_id, idempotency_key, request_hash, response)
+                VALUES (?, ?, ?, ?)
+            ''', (teacher_id, idempotency_key, request_hash, json.dumps(response)))
+
+        conn.commit()
+        return 200, response
+    except Exception:
+        conn.rollback()
+        raise
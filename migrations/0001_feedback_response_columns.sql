@@ -0,0 +1,5 @@
+-- Columns the admin feedback pages write (respond_to_feedback, update_feedback_status)
+ALTER TABLE feedback ADD COLUMN status TEXT DEFAULT 'pending';
+ALTER TABLE feedback ADD COLUMN admin_response TEXT;
+ALTER TABLE feedback ADD COLUMN response_date DATETIME;
+ALTER TABLE feedback ADD COLUMN responded_by INTEGER;
@@ -0,0 +1,5 @@
+-- Columns the admin doubt response writes (respond_doubt)
+ALTER TABLE doubts ADD COLUMN class_id INTEGER;
+ALTER TABLE doubts ADD COLUMN response TEXT;
+ALTER TABLE doubts ADD COLUMN responder_id INTEGER;
+ALTER TABLE doubts ADD COLUMN response_time DATETIME;
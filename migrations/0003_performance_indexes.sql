@@ -0,0 +1,33 @@
+-- Performance indexes from schema.sql that databases created before them lack.
+-- Hot filters get composite indexes; the single-column indexes that became
+-- their leading prefix are dropped to keep writes cheap
+-- transaction: per-statement
+CREATE INDEX IF NOT EXISTS idx_users_username ON users(username);
+CREATE INDEX IF NOT EXISTS idx_users_role ON users(role);
+CREATE INDEX IF NOT EXISTS idx_classes_teacher_id ON classes(teacher_id);
+CREATE INDEX IF NOT EXISTS idx_assignments_class_id ON assignments(class_id);
+CREATE INDEX IF NOT EXISTS idx_assignments_teacher_id ON assignments(teacher_id);
+CREATE INDEX IF NOT EXISTS idx_submissions_assignment_student ON submissions(assignment_id, student_id);
+DROP INDEX IF EXISTS idx_submissions_assignment_id;
+CREATE INDEX IF NOT EXISTS idx_submissions_student_id ON submissions(student_id);
+CREATE INDEX IF NOT EXISTS idx_student_class_map_student_id ON student_class_map(student_id);
+CREATE INDEX IF NOT EXISTS idx_student_class_map_class_id ON student_class_map(class_id);
+CREATE INDEX IF NOT EXISTS idx_teacher_class_map_teacher_id ON teacher_class_map(teacher_id);
+CREATE INDEX IF NOT EXISTS idx_teacher_class_map_class_id ON teacher_class_map(class_id);
+CREATE INDEX IF NOT EXISTS idx_attendance_student_id ON attendance(student_id);
+CREATE INDEX IF NOT EXISTS idx_attendance_class_id ON attendance(class_id);
+CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance(attendance_date);
+CREATE INDEX IF NOT EXISTS idx_attendance_class_date_status ON attendance(class_id, attendance_date, status, student_id);
+CREATE INDEX IF NOT EXISTS idx_announcements_teacher_id ON announcements(teacher_id);
+CREATE INDEX IF NOT EXISTS idx_announcements_class_id ON announcements(class_id);
+CREATE INDEX IF NOT EXISTS idx_announcements_active_created ON announcements(is_active, created_at);
+CREATE INDEX IF NOT EXISTS idx_student_marks_student_assignment ON student_marks(student_id, assignment_id);
+DROP INDEX IF EXISTS idx_student_marks_student_id;
+CREATE INDEX IF NOT EXISTS idx_student_marks_assignment_id ON student_marks(assignment_id);
+CREATE INDEX IF NOT EXISTS idx_doubts_student_id ON doubts(student_id);
+CREATE INDEX IF NOT EXISTS idx_doubts_status ON doubts(status);
+CREATE INDEX IF NOT EXISTS idx_doubt_replies_doubt_id ON doubt_replies(doubt_id);
+CREATE INDEX IF NOT EXISTS idx_notifications_user_type_read_created ON notifications(user_id, user_type, is_read, created_at);
+DROP INDEX IF EXISTS idx_notifications_user_id;
+CREATE INDEX IF NOT EXISTS idx_feedback_status_submitted ON feedback(status, submitted_on);
+CREATE INDEX IF NOT EXISTS idx_feedback_submitted_on ON feedback(submitted_on);
@@ -0,0 +1,21 @@
+-- One reminder per (class, user, type, day): the insert that wins the key
+-- sends it (reminder_scheduler.send_reminder)
+CREATE TABLE IF NOT EXISTS notifications (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER,
+    user_type TEXT,
+    message TEXT,
+    is_read INTEGER DEFAULT 0,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+ALTER TABLE reminders ADD COLUMN reminder_date TEXT;
+UPDATE reminders SET reminder_date = DATE(sent_at) WHERE reminder_date IS NULL;
+-- Duplicates sent before the key existed: keep the first of each day
+DELETE FROM reminders
+WHERE id NOT IN (
+    SELECT MIN(id) FROM reminders
+    GROUP BY class_id, user_id, reminder_type, reminder_date
+);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_reminders_class_user_type_date
+ON reminders (class_id, user_id, reminder_type, reminder_date);
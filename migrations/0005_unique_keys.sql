@@ -0,0 +1,24 @@
+-- Unique (user, class/subject) mapping keys and (item, student) marks keys
+-- that the set-based writers upsert against. Duplicate rows written before
+-- the keys existed are dropped first: the oldest mapping and the newest
+-- mark of each pair are kept
+DELETE FROM student_class_map
+WHERE id NOT IN (SELECT MIN(id) FROM student_class_map GROUP BY student_id, class_id);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_student_class_map_student_id_class_id ON student_class_map(student_id, class_id);
+DELETE FROM teacher_class_map
+WHERE id NOT IN (SELECT MIN(id) FROM teacher_class_map GROUP BY teacher_id, class_id);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_teacher_class_map_teacher_id_class_id ON teacher_class_map(teacher_id, class_id);
+DELETE FROM student_subjects
+WHERE id NOT IN (SELECT MIN(id) FROM student_subjects GROUP BY student_id, subject_name);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_student_subjects_student_id_subject_name ON student_subjects(student_id, subject_name);
+DELETE FROM teacher_subjects
+WHERE id NOT IN (SELECT MIN(id) FROM teacher_subjects GROUP BY teacher_id, subject_name);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_teacher_subjects_teacher_id_subject_name ON teacher_subjects(teacher_id, subject_name);
+DELETE FROM marks
+WHERE id NOT IN (SELECT MAX(id) FROM marks GROUP BY assessment_id, student_id);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_marks_assessment_id_student_id ON marks(assessment_id, student_id);
+-- Superseded by the unique (assessment_id, student_id) key
+DROP INDEX IF EXISTS idx_marks_assessment_id;
+DELETE FROM student_marks
+WHERE id NOT IN (SELECT MAX(id) FROM student_marks GROUP BY assignment_id, student_id);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_student_marks_assignment_id_student_id ON student_marks(assignment_id, student_id);
@@ -0,0 +1,200 @@
+-- Trigger-maintained summaries: per-class counts, monthly attendance
+-- rollups, the schedule version and the student_marks row version.
+-- Each summary is filled from its source tables when it is first created
+CREATE TABLE IF NOT EXISTS class_stats (
+    class_id INTEGER PRIMARY KEY,
+    student_count INTEGER NOT NULL DEFAULT 0,
+    teacher_count INTEGER NOT NULL DEFAULT 0,
+    assignment_count INTEGER NOT NULL DEFAULT 0,
+    active_assignments INTEGER NOT NULL DEFAULT 0
+);
+-- Every trigger first makes sure the class has a stats row
+CREATE TRIGGER IF NOT EXISTS trg_class_stats_class_insert
+AFTER INSERT ON classes BEGIN
+    INSERT OR IGNORE INTO class_stats (class_id) VALUES (NEW.id);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_class_stats_class_delete
+AFTER DELETE ON classes BEGIN
+    DELETE FROM class_stats WHERE class_id = OLD.id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_class_stats_student_insert
+AFTER INSERT ON student_class_map BEGIN
+    INSERT OR IGNORE INTO class_stats (class_id) VALUES (NEW.class_id);
+    UPDATE class_stats SET student_count = student_count + 1 WHERE class_id = NEW.class_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_class_stats_student_delete
+AFTER DELETE ON student_class_map BEGIN
+    UPDATE class_stats SET student_count = student_count - 1 WHERE class_id = OLD.class_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_class_stats_student_move
+AFTER UPDATE OF class_id ON student_class_map BEGIN
+    INSERT OR IGNORE INTO class_stats (class_id) VALUES (NEW.class_id);
+    UPDATE class_stats SET student_count = student_count - 1 WHERE class_id = OLD.class_id;
+    UPDATE class_stats SET student_count = student_count + 1 WHERE class_id = NEW.class_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_class_stats_teacher_insert
+AFTER INSERT ON teacher_class_map BEGIN
+    INSERT OR IGNORE INTO class_stats (class_id) VALUES (NEW.class_id);
+    UPDATE class_stats SET teacher_count = teacher_count + 1 WHERE class_id = NEW.class_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_class_stats_teacher_delete
+AFTER DELETE ON teacher_class_map BEGIN
+    UPDATE class_stats SET teacher_count = teacher_count - 1 WHERE class_id = OLD.class_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_class_stats_teacher_move
+AFTER UPDATE OF class_id ON teacher_class_map BEGIN
+    INSERT OR IGNORE INTO class_stats (class_id) VALUES (NEW.class_id);
+    UPDATE class_stats SET teacher_count = teacher_count - 1 WHERE class_id = OLD.class_id;
+    UPDATE class_stats SET teacher_count = teacher_count + 1 WHERE class_id = NEW.class_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_class_stats_assignment_insert
+AFTER INSERT ON assignments BEGIN
+    INSERT OR IGNORE INTO class_stats (class_id) VALUES (NEW.class_id);
+    UPDATE class_stats
+    SET assignment_count = assignment_count + 1,
+        active_assignments = active_assignments + (NEW.status = 'active')
+    WHERE class_id = NEW.class_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_class_stats_assignment_delete
+AFTER DELETE ON assignments BEGIN
+    UPDATE class_stats
+    SET assignment_count = assignment_count - 1,
+        active_assignments = active_assignments - (OLD.status = 'active')
+    WHERE class_id = OLD.class_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_class_stats_assignment_update
+AFTER UPDATE OF class_id, status ON assignments BEGIN
+    INSERT OR IGNORE INTO class_stats (class_id) VALUES (NEW.class_id);
+    UPDATE class_stats
+    SET assignment_count = assignment_count - 1,
+        active_assignments = active_assignments - (OLD.status = 'active')
+    WHERE class_id = OLD.class_id;
+    UPDATE class_stats
+    SET assignment_count = assignment_count + 1,
+        active_assignments = active_assignments + (NEW.status = 'active')
+    WHERE class_id = NEW.class_id;
+END;
+INSERT OR IGNORE INTO class_stats (class_id, student_count, teacher_count, assignment_count, active_assignments)
+SELECT c.id,
+       (SELECT COUNT(*) FROM student_class_map WHERE class_id = c.id),
+       (SELECT COUNT(*) FROM teacher_class_map WHERE class_id = c.id),
+       (SELECT COUNT(*) FROM assignments WHERE class_id = c.id),
+       (SELECT COUNT(*) FROM assignments WHERE class_id = c.id AND status = 'active')
+FROM classes c;
+
+CREATE TABLE IF NOT EXISTS attendance_monthly (
+    student_id INTEGER NOT NULL,
+    class_id INTEGER NOT NULL,
+    month TEXT NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    present INTEGER NOT NULL DEFAULT 0,
+    absent INTEGER NOT NULL DEFAULT 0,
+    late INTEGER NOT NULL DEFAULT 0,
+    excused INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (student_id, class_id, month)
+);
+CREATE INDEX IF NOT EXISTS idx_attendance_monthly_month ON attendance_monthly(month, class_id);
+CREATE TRIGGER IF NOT EXISTS trg_attendance_monthly_insert
+AFTER INSERT ON attendance BEGIN
+    INSERT OR IGNORE INTO attendance_monthly (student_id, class_id, month)
+    VALUES (NEW.student_id, NEW.class_id, substr(NEW.attendance_date, 1, 7));
+    UPDATE attendance_monthly
+    SET total = total + 1, present = present + (NEW.status = 'present'), absent = absent + (NEW.status = 'absent'),
+        late = late + (NEW.status = 'late'), excused = excused + (NEW.status = 'excused')
+    WHERE student_id = NEW.student_id AND class_id = NEW.class_id AND month = substr(NEW.attendance_date, 1, 7);
+END;
+-- term_archive.py drops this trigger while it moves rows out and recreates it from its stored SQL
+CREATE TRIGGER IF NOT EXISTS trg_attendance_monthly_delete
+AFTER DELETE ON attendance BEGIN
+    UPDATE attendance_monthly
+    SET total = total - 1, present = present - (OLD.status = 'present'), absent = absent - (OLD.status = 'absent'),
+        late = late - (OLD.status = 'late'), excused = excused - (OLD.status = 'excused')
+    WHERE student_id = OLD.student_id AND class_id = OLD.class_id AND month = substr(OLD.attendance_date, 1, 7);
+    DELETE FROM attendance_monthly
+    WHERE student_id = OLD.student_id AND class_id = OLD.class_id AND month = substr(OLD.attendance_date, 1, 7)
+      AND total <= 0;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_attendance_monthly_update
+AFTER UPDATE OF student_id, class_id, attendance_date, status ON attendance BEGIN
+    UPDATE attendance_monthly
+    SET total = total - 1, present = present - (OLD.status = 'present'), absent = absent - (OLD.status = 'absent'),
+        late = late - (OLD.status = 'late'), excused = excused - (OLD.status = 'excused')
+    WHERE student_id = OLD.student_id AND class_id = OLD.class_id AND month = substr(OLD.attendance_date, 1, 7);
+    DELETE FROM attendance_monthly
+    WHERE student_id = OLD.student_id AND class_id = OLD.class_id AND month = substr(OLD.attendance_date, 1, 7)
+      AND total <= 0;
+    INSERT OR IGNORE INTO attendance_monthly (student_id, class_id, month)
+    VALUES (NEW.student_id, NEW.class_id, substr(NEW.attendance_date, 1, 7));
+    UPDATE attendance_monthly
+    SET total = total + 1, present = present + (NEW.status = 'present'), absent = absent + (NEW.status = 'absent'),
+        late = late + (NEW.status = 'late'), excused = excused + (NEW.status = 'excused')
+    WHERE student_id = NEW.student_id AND class_id = NEW.class_id AND month = substr(NEW.attendance_date, 1, 7);
+END;
+-- Only an empty table is filled: rollups of archived months have no raw rows left
+INSERT INTO attendance_monthly (student_id, class_id, month, total, present, absent, late, excused)
+SELECT student_id, class_id, substr(attendance_date, 1, 7), COUNT(*),
+       SUM(CASE WHEN status = 'present' THEN 1 ELSE 0 END),
+       SUM(CASE WHEN status = 'absent' THEN 1 ELSE 0 END),
+       SUM(CASE WHEN status = 'late' THEN 1 ELSE 0 END),
+       SUM(CASE WHEN status = 'excused' THEN 1 ELSE 0 END)
+FROM attendance
+WHERE NOT EXISTS (SELECT 1 FROM attendance_monthly)
+GROUP BY student_id, class_id, substr(attendance_date, 1, 7);
+
+CREATE TABLE IF NOT EXISTS schedule_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at DATETIME
+);
+ALTER TABLE schedule_version ADD COLUMN updated_at DATETIME;
+INSERT OR IGNORE INTO schedule_version (id, version, updated_at) VALUES (1, 0, CURRENT_TIMESTAMP);
+-- Triggers created before updated_at existed are replaced
+DROP TRIGGER IF EXISTS trg_schedule_version_class_insert;
+DROP TRIGGER IF EXISTS trg_schedule_version_class_delete;
+DROP TRIGGER IF EXISTS trg_schedule_version_class_update;
+DROP TRIGGER IF EXISTS trg_schedule_version_student_insert;
+DROP TRIGGER IF EXISTS trg_schedule_version_student_delete;
+DROP TRIGGER IF EXISTS trg_schedule_version_student_update;
+DROP TRIGGER IF EXISTS trg_schedule_version_teacher_insert;
+DROP TRIGGER IF EXISTS trg_schedule_version_teacher_delete;
+DROP TRIGGER IF EXISTS trg_schedule_version_teacher_update;
+-- Any change to a class schedule or to who attends which class
+CREATE TRIGGER trg_schedule_version_class_insert AFTER INSERT ON classes BEGIN
+    UPDATE schedule_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+END;
+CREATE TRIGGER trg_schedule_version_class_delete AFTER DELETE ON classes BEGIN
+    UPDATE schedule_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+END;
+CREATE TRIGGER trg_schedule_version_class_update
+AFTER UPDATE OF name, subject, section, schedule_days, schedule_time_start, schedule_time_end, status, meeting_link
+ON classes BEGIN
+    UPDATE schedule_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+END;
+CREATE TRIGGER trg_schedule_version_student_insert AFTER INSERT ON student_class_map BEGIN
+    UPDATE schedule_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+END;
+CREATE TRIGGER trg_schedule_version_student_delete AFTER DELETE ON student_class_map BEGIN
+    UPDATE schedule_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+END;
+CREATE TRIGGER trg_schedule_version_student_update AFTER UPDATE ON student_class_map BEGIN
+    UPDATE schedule_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+END;
+CREATE TRIGGER trg_schedule_version_teacher_insert AFTER INSERT ON teacher_class_map BEGIN
+    UPDATE schedule_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+END;
+CREATE TRIGGER trg_schedule_version_teacher_delete AFTER DELETE ON teacher_class_map BEGIN
+    UPDATE schedule_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+END;
+CREATE TRIGGER trg_schedule_version_teacher_update AFTER UPDATE ON teacher_class_map BEGIN
+    UPDATE schedule_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+END;
+
+ALTER TABLE student_marks ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+-- Bumps the version when any writer (form save, batch API, cell save)
+-- changes a mark without setting the version itself
+CREATE TRIGGER IF NOT EXISTS trg_student_marks_version
+AFTER UPDATE OF marks_obtained, total_marks, remarks ON student_marks
+WHEN NEW.version IS OLD.version
+BEGIN
+    UPDATE student_marks SET version = OLD.version + 1 WHERE id = NEW.id;
+END;
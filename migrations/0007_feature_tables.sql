@@ -0,0 +1,85 @@
+-- Tables and indexes the feature modules read and write
+CREATE INDEX IF NOT EXISTS idx_announcements_feed ON announcements(class_id, is_active, created_at);
+CREATE TABLE IF NOT EXISTS announcement_reads (
+    student_id INTEGER PRIMARY KEY,
+    last_read_id INTEGER NOT NULL DEFAULT 0,
+    read_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (student_id) REFERENCES users (id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_grade_reports_term_class ON grade_reports(term, class_id, rank);
+CREATE INDEX IF NOT EXISTS idx_grade_reports_student ON grade_reports(student_id, term);
+CREATE TABLE IF NOT EXISTS grade_category_weights (
+    class_id INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    weight REAL NOT NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (class_id, category),
+    FOREIGN KEY (class_id) REFERENCES classes (id) ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS marks_batch_requests (
+    teacher_id INTEGER NOT NULL,
+    idempotency_key TEXT NOT NULL,
+    request_hash TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (teacher_id, idempotency_key)
+);
+CREATE TABLE IF NOT EXISTS at_risk_students (
+    student_id INTEGER PRIMARY KEY,
+    risk_score INTEGER NOT NULL,
+    attendance_rate REAL,
+    attendance_trend REAL,
+    due_assignments INTEGER NOT NULL DEFAULT 0,
+    missed_submissions INTEGER NOT NULL DEFAULT 0,
+    mark_average REAL,
+    mark_trend REAL,
+    reasons TEXT NOT NULL,
+    computed_at DATETIME NOT NULL,
+    FOREIGN KEY (student_id) REFERENCES users (id) ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS at_risk_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at DATETIME NOT NULL,
+    finished_at DATETIME NOT NULL,
+    students INTEGER NOT NULL,
+    flagged INTEGER NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS calendar_tokens (
+    user_id INTEGER PRIMARY KEY,
+    token TEXT NOT NULL UNIQUE,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS scheduler_leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    acquired_at REAL NOT NULL,
+    heartbeat_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS archive_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    term TEXT NOT NULL,
+    cutoff_date TEXT NOT NULL,
+    archive_path TEXT NOT NULL,
+    rows_moved INTEGER NOT NULL DEFAULT 0,
+    archived_by INTEGER,
+    archived_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS login_throttle (
+    throttle_key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    failures INTEGER NOT NULL DEFAULT 0,
+    locked_until REAL NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS user_sessions (
+    session_id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    principal TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    last_seen DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+CREATE INDEX IF NOT EXISTS idx_user_sessions_user_id ON user_sessions(user_id);
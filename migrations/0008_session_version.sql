@@ -0,0 +1,47 @@
+-- users.session_version moves whenever anything a cached session principal
+-- is built from changes (identity, role, class maps, assignments of the
+-- user's classes); session_store.py compares it on every request, so the
+-- change applies in every worker process at once
+ALTER TABLE users ADD COLUMN session_version INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE user_sessions ADD COLUMN principal_version INTEGER;
+CREATE TRIGGER IF NOT EXISTS trg_session_version_user_update
+AFTER UPDATE OF username, role, name, email ON users
+WHEN NEW.session_version IS OLD.session_version
+BEGIN
+    UPDATE users SET session_version = OLD.session_version + 1 WHERE id = NEW.id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_session_version_student_insert AFTER INSERT ON student_class_map BEGIN
+    UPDATE users SET session_version = session_version + 1 WHERE id = NEW.student_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_session_version_student_delete AFTER DELETE ON student_class_map BEGIN
+    UPDATE users SET session_version = session_version + 1 WHERE id = OLD.student_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_session_version_student_update AFTER UPDATE ON student_class_map BEGIN
+    UPDATE users SET session_version = session_version + 1 WHERE id IN (OLD.student_id, NEW.student_id);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_session_version_teacher_insert AFTER INSERT ON teacher_class_map BEGIN
+    UPDATE users SET session_version = session_version + 1 WHERE id = NEW.teacher_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_session_version_teacher_delete AFTER DELETE ON teacher_class_map BEGIN
+    UPDATE users SET session_version = session_version + 1 WHERE id = OLD.teacher_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_session_version_teacher_update AFTER UPDATE ON teacher_class_map BEGIN
+    UPDATE users SET session_version = session_version + 1 WHERE id IN (OLD.teacher_id, NEW.teacher_id);
+END;
+-- Access sets list the teacher's assignments and the active assignments of a student's classes
+CREATE TRIGGER IF NOT EXISTS trg_session_version_assignment_insert AFTER INSERT ON assignments BEGIN
+    UPDATE users SET session_version = session_version + 1
+    WHERE id = NEW.teacher_id
+       OR id IN (SELECT student_id FROM student_class_map WHERE class_id = NEW.class_id);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_session_version_assignment_delete AFTER DELETE ON assignments BEGIN
+    UPDATE users SET session_version = session_version + 1
+    WHERE id = OLD.teacher_id
+       OR id IN (SELECT student_id FROM student_class_map WHERE class_id = OLD.class_id);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_session_version_assignment_update
+AFTER UPDATE OF class_id, teacher_id, status ON assignments BEGIN
+    UPDATE users SET session_version = session_version + 1
+    WHERE id IN (OLD.teacher_id, NEW.teacher_id)
+       OR id IN (SELECT student_id FROM student_class_map WHERE class_id IN (OLD.class_id, NEW.class_id));
+END;
@@ -0,0 +1,121 @@
+-- Per-class counter behind the weighted gradebook cache (weighted_grades.py):
+-- every write to something a class gradebook is computed from bumps the
+-- class's version, so cached grades are checked with one primary key read
+CREATE TABLE IF NOT EXISTS gradebook_version (
+    class_id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TRIGGER IF NOT EXISTS trg_gradebook_version_student_insert
+AFTER INSERT ON student_class_map BEGIN
+    INSERT INTO gradebook_version (class_id, version) SELECT NEW.class_id, 1 WHERE NEW.class_id IS NOT NULL
+    ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_gradebook_version_student_delete
+AFTER DELETE ON student_class_map BEGIN
+    INSERT INTO gradebook_version (class_id, version) SELECT OLD.class_id, 1 WHERE OLD.class_id IS NOT NULL
+    ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_gradebook_version_student_update
+AFTER UPDATE OF student_id, class_id ON student_class_map BEGIN
+    INSERT INTO gradebook_version (class_id, version) SELECT OLD.class_id, 1 WHERE OLD.class_id IS NOT NULL
+    ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+    INSERT INTO gradebook_version (class_id, version) SELECT NEW.class_id, 1 WHERE NEW.class_id IS NOT NULL
+    ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_gradebook_version_role_update
+AFTER UPDATE OF role ON users BEGIN
+    INSERT INTO gradebook_version (class_id, version)
+    SELECT class_id, 1 FROM student_class_map WHERE student_id = NEW.id
+    ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_gradebook_version_assignment_insert
+AFTER INSERT ON assignments BEGIN
+    INSERT INTO gradebook_version (class_id, version) SELECT NEW.class_id, 1 WHERE NEW.class_id IS NOT NULL
+    ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_gradebook_version_assignment_delete
+AFTER DELETE ON assignments BEGIN
+    INSERT INTO gradebook_version (class_id, version) SELECT OLD.class_id, 1 WHERE OLD.class_id IS NOT NULL
+    ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_gradebook_version_assignment_update
+AFTER UPDATE OF class_id, points, assignment_type ON assignments BEGIN
+    INSERT INTO gradebook_version (class_id, version) SELECT OLD.class_id, 1 WHERE OLD.class_id IS NOT NULL
+    ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+    INSERT INTO gradebook_version (class_id, version) SELECT NEW.class_id, 1 WHERE NEW.class_id IS NOT NULL
+    ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_gradebook_version_assessment_insert
+AFTER INSERT ON assessments BEGIN
+    INSERT INTO gradebook_version (class_id, version) SELECT NEW.class_id, 1 WHERE NEW.class_id IS NOT NULL
+    ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_gradebook_version_assessment_delete
+AFTER DELETE ON assessments BEGIN
+    INSERT INTO gradebook_version (class_id, version) SELECT OLD.class_id, 1 WHERE OLD.class_id IS NOT NULL
+    ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_gradebook_version_assessment_update
+AFTER UPDATE OF class_id, max_score, weight ON assessments BEGIN
+    INSERT INTO gradebook_version (class_id, version) SELECT OLD.class_id, 1 WHERE OLD.class_id IS NOT NULL
+    ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+    INSERT INTO gradebook_version (class_id, version) SELECT NEW.class_id, 1 WHERE NEW.class_id IS NOT NULL
+    ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_gradebook_version_student_mark_insert
+AFTER INSERT ON student_marks BEGIN
+    INSERT INTO gradebook_version (class_id, version)
+    SELECT class_id, 1 FROM assignments WHERE id = NEW.assignment_id
+    ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_gradebook_version_student_mark_delete
+AFTER DELETE ON student_marks BEGIN
+    INSERT INTO gradebook_version (class_id, version)
+    SELECT class_id, 1 FROM assignments WHERE id = OLD.assignment_id
+    ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_gradebook_version_student_mark_update
+AFTER UPDATE OF student_id, assignment_id, marks_obtained, total_marks ON student_marks BEGIN
+    INSERT INTO gradebook_version (class_id, version)
+    SELECT class_id, 1 FROM assignments WHERE id IN (OLD.assignment_id, NEW.assignment_id)
+    ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_gradebook_version_mark_insert
+AFTER INSERT ON marks BEGIN
+    INSERT INTO gradebook_version (class_id, version)
+    SELECT class_id, 1 FROM assessments WHERE id = NEW.assessment_id
+    ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_gradebook_version_mark_delete
+AFTER DELETE ON marks BEGIN
+    INSERT INTO gradebook_version (class_id, version)
+    SELECT class_id, 1 FROM assessments WHERE id = OLD.assessment_id
+    ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_gradebook_version_mark_update
+AFTER UPDATE OF student_id, assessment_id, score ON marks BEGIN
+    INSERT INTO gradebook_version (class_id, version)
+    SELECT class_id, 1 FROM assessments WHERE id IN (OLD.assessment_id, NEW.assessment_id)
+    ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_gradebook_version_weight_insert
+AFTER INSERT ON grade_category_weights BEGIN
+    INSERT INTO gradebook_version (class_id, version) SELECT NEW.class_id, 1 WHERE NEW.class_id IS NOT NULL
+    ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_gradebook_version_weight_delete
+AFTER DELETE ON grade_category_weights BEGIN
+    INSERT INTO gradebook_version (class_id, version) SELECT OLD.class_id, 1 WHERE OLD.class_id IS NOT NULL
+    ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_gradebook_version_weight_update
+AFTER UPDATE ON grade_category_weights BEGIN
+    INSERT INTO gradebook_version (class_id, version) SELECT OLD.class_id, 1 WHERE OLD.class_id IS NOT NULL
+    ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+    INSERT INTO gradebook_version (class_id, version) SELECT NEW.class_id, 1 WHERE NEW.class_id IS NOT NULL
+    ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_gradebook_version_class_delete
+AFTER DELETE ON classes BEGIN
+    DELETE FROM gradebook_version WHERE class_id = OLD.id;
+END;
@@ -0,0 +1,9 @@
+-- Row version of assignments, bumped on every change of a column the
+-- student mark history shows (student_progress.py keys its cache on it)
+ALTER TABLE assignments ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+CREATE TRIGGER IF NOT EXISTS trg_assignments_version
+AFTER UPDATE OF title, class_id, teacher_id, due_date, points, assignment_type ON assignments
+WHEN NEW.version IS OLD.version
+BEGIN
+    UPDATE assignments SET version = OLD.version + 1 WHERE id = NEW.id;
+END;
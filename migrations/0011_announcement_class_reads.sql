@@ -0,0 +1,21 @@
+-- Read watermarks per feed instead of one per student: class_id is the
+-- class of a membership, 0 the global feed. A class joined later starts
+-- unread instead of inheriting the watermark of the other feeds
+CREATE TABLE announcement_reads_by_feed (
+    student_id INTEGER NOT NULL,
+    class_id INTEGER NOT NULL DEFAULT 0,
+    last_read_id INTEGER NOT NULL DEFAULT 0,
+    read_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (student_id, class_id),
+    FOREIGN KEY (student_id) REFERENCES users (id) ON DELETE CASCADE
+);
+INSERT INTO announcement_reads_by_feed (student_id, class_id, last_read_id, read_at)
+SELECT student_id, 0, last_read_id, read_at FROM announcement_reads;
+-- The old watermark only covered classes the student had joined when it was set
+INSERT OR IGNORE INTO announcement_reads_by_feed (student_id, class_id, last_read_id, read_at)
+SELECT r.student_id, scm.class_id, r.last_read_id, r.read_at
+FROM announcement_reads r
+JOIN student_class_map scm ON scm.student_id = r.student_id
+WHERE scm.class_id IS NOT NULL AND scm.created_at <= r.read_at;
+DROP TABLE announcement_reads;
+ALTER TABLE announcement_reads_by_feed RENAME TO announcement_reads;
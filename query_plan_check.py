@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Query plan regression check
+Collects every SQL string passed to execute()/executemany() in the routes
+and feature modules (with ast, so nothing is imported or run), builds an
+empty database from schema.sql plus migrations, and runs EXPLAIN QUERY
+PLAN on each statement. A plan step that scans a whole hot table fails
+the check, unless the (file, function, table) is in ALLOWED_SCANS with
+the reason it is acceptable.
+
+f-string fields are filled in from simple variables and constants,
+table_source() calls (the live table), placeholder lists and the clause
+fragments in FRAGMENTS, which are built with the app's own helpers. A
+query that cannot be explained, or whose SQL is only known at runtime,
+fails too unless ALLOWED_UNCHECKED says why it is not checked.
+
+    python query_plan_check.py            check, exit code 1 on any unexpected scan or unchecked query
+    python query_plan_check.py --verbose  also print every plan
+"""
+import argparse
+import ast
+import glob
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+import schema_migrations
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+SOURCES = ['routes/*.py', '*.py']
+SKIP_FILES = {'query_plan_check.py', 'manage.py', 'init_database.py', 'models.py', 'run.py'}
+
+# Tables that grow with students x time; a full scan of these is a regression
+HOT_TABLES = {
+    'notifications', 'student_marks', 'marks', 'attendance', 'submissions', 'reminders',
+    'doubts', 'doubt_replies', 'announcements', 'assignments', 'student_class_map',
+    'teacher_class_map', 'feedback',
+}
+
+# (file, function, table) -> why a full scan is fine there
+ALLOWED_SCANS = {
+    ('routes/admin.py', 'view_doubts', 'doubts'): 'admin list of every doubt, unfiltered by design',
+    ('at_risk.py', 'compute_features', 'student_class_map'): 'nightly batch over every active student',
+    ('at_risk.py', 'compute_features', 'student_marks'): 'nightly batch over every student\'s recent marks',
+    ('at_risk.py', 'compute_features', 'marks'): 'nightly batch over every student\'s recent marks',
+    ('feedback_analytics.py', 'get_status_counts', 'feedback'): 'whole-table aggregate, reads the covering index',
+    ('feedback_analytics.py', 'get_rating_distribution', 'feedback'): 'whole-table aggregate for the analytics page',
+    ('reminder_scheduler.py', 'get_upcoming_classes', 'teacher_class_map'):
+        'the job walks every taught class each tick; reads the covering unique index',
+    ('grade_snapshots.py', 'write_snapshot', 'student_marks'):
+        'term snapshot aggregates every mark of the term, grouped in student order',
+    ('timetable.py', '_load', 'teacher_class_map'): 'loads all memberships into the cached timetable',
+    ('timetable.py', '_load', 'student_class_map'): 'loads all memberships into the cached timetable',
+}
+
+# (file, function, f-string field) -> SQL it stands for (or a function building it)
+FRAGMENTS = {
+    ('announcement_feed.py', 'mark_read', 'where'): lambda: __import__('announcement_feed')._visible_filter([1, 2])[0],
+    ('routes/admin.py', 'attendance_report', 'source'):
+        lambda: __import__('attendance_rollups').summary_source(1, '2026-01-15', '2026-03-20')[0],
+    ('routes/teacher.py', 'my_attendance', 'source'):
+        lambda: __import__('attendance_rollups').summary_source(1, '2026-01-15', '2026-03-20')[0],
+    ('routes/teacher.py', 'my_attendance', "' AND '.join(conditions)"):
+        'a.class_id = ? AND a.attendance_date >= ? AND a.attendance_date <= ? AND a.status = ?',
+    ('class_stats.py', 'get_class_stats', 'where'): lambda: __import__('class_stats')._class_filter([1, 2])[0],
+    ('class_stats.py', 'get_teacher_names', 'where'):
+        lambda: __import__('class_stats')._class_filter([1, 2], 'tcm.class_id')[0],
+    ('feedback_analytics.py', 'get_feedback_page', 'where'):
+        lambda: __import__('feedback_analytics')._filters('answered', 5, 'month')[0],
+    ('grade_snapshots.py', 'write_snapshot', 'where'):
+        lambda: __import__('grade_snapshots')._scope('2026-01-01', '2026-06-01', [1, 2])[0],
+    ('grade_snapshots.py', 'write_snapshot', 'marks_table'): 'student_marks',
+    ('grade_snapshots.py', 'write_snapshot', "grade_sql('percentage')"):
+        lambda: __import__('grading').grade_sql('percentage'),
+    ('marks_batch.py', 'save_batch', 'table'): 'student_marks',
+    ('marks_batch.py', 'save_batch', 'item_column'): 'assignment_id',
+    ('timetable.py', 'check_class', 'table'): 'student_class_map',
+    ('timetable.py', 'check_class', 'column'): 'student_id',
+}
+
+# Helpers that run the SQL passed as their argument: name -> argument index
+SQL_ARGUMENTS = {'_rows': 1}
+
+# (file, function) -> why its statements are not checked
+ALLOWED_UNCHECKED = {
+    ('routes/admin.py', 'get_class_subjects'): 'subjects has no class_id column; the endpoint already fails',
+    ('at_risk.py', '_rows'): 'runs the SQL of its callers, which are checked at the _rows() calls',
+    ('cascade_delete.py', '_collect_files'): 'table and column come from the foreign-key graph',
+    ('cascade_delete.py', '_still_referenced'): 'table and column come from the foreign-key graph',
+    ('cascade_delete.py', '_pre_drain'): 'table and column come from the foreign-key graph',
+    ('cascade_delete.py', 'delete_row'): 'table and column come from the foreign-key graph',
+    ('enrollments.py', 'sync_links'): 'mapping table and columns come from LINK_TABLES; keyed by the unique index',
+    ('marks_batch.py', 'get_item'): 'primary key lookup of the item (KINDS item_sql)',
+    ('marks_batch.py', 'save_batch'): 'upsert on the unique key (UPSERT_SQL)',
+    ('schema_migrations.py', '_run_statement'): 'migration files',
+    ('term_archive.py', 'archive_term'): 'moves whole closed terms into the archive',
+    ('term_archive.py', 'attach_existing_archive'): 'catalog of the attached archive database',
+}
+
+DML_PATTERN = re.compile(r'^\s*(WITH|SELECT|UPDATE|DELETE|INSERT\s+(OR\s+\w+\s+)?INTO\s+\w+[^;]*?\bSELECT\b)',
+                         re.IGNORECASE | re.DOTALL)
+TABLE_PATTERN = re.compile(r'\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+SCAN_PATTERN = re.compile(r'^SCAN (\w+)')
+BINDINGS_PATTERN = re.compile(r'uses (\d+)')
+NOT_ALIASES = {'WHERE', 'JOIN', 'LEFT', 'INNER', 'OUTER', 'CROSS', 'ON', 'USING', 'GROUP', 'ORDER', 'LIMIT',
+               'SET', 'VALUES', 'SELECT', 'UNION', 'HAVING', 'WINDOW', 'AND', 'OR', 'AS', 'DEFAULT'}
+
+
+class Statement:
+    def __init__(self, path, line, function, sql):
+        self.path = path
+        self.line = line
+        self.function = function
+        self.sql = sql
+
+    @property
+    def location(self):
+        return f'{self.path}:{self.line} ({self.function})'
+
+
+class _Collector(ast.NodeVisitor):
+    """SQL strings of execute()/executemany() calls, resolving simple variables"""
+
+    def __init__(self, path):
+        self.path = path
+        self.function = '<module>'
+        self.module_assigned = {}
+        self.assigned = self.module_assigned
+        self.statements = []
+        self.dynamic = []
+
+    def visit_FunctionDef(self, node):
+        outer = self.function, self.assigned
+        self.function, self.assigned = node.name, {}
+        self.generic_visit(node)
+        self.function, self.assigned = outer
+
+    def visit_Assign(self, node):
+        self.generic_visit(node)
+        value = self._string(node.value)
+        for target in node.targets:
+            if isinstance(target, ast.Name):
+                # Keep the last resolvable value; branches usually refine a default
+                if value is not None or target.id not in self.assigned:
+                    self.assigned[target.id] = value
+
+    def visit_AugAssign(self, node):
+        self.generic_visit(node)
+        if isinstance(node.target, ast.Name) and isinstance(node.op, ast.Add):
+            base, extra = self.assigned.get(node.target.id), self._string(node.value)
+            self.assigned[node.target.id] = base + extra if base is not None and extra is not None else None
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        if isinstance(node.func, ast.Attribute) and node.func.attr in ('execute', 'executemany'):
+            index = 0
+        else:
+            index = SQL_ARGUMENTS.get(getattr(node.func, 'id', None))
+        if index is None or len(node.args) <= index:
+            return
+        sql = self._string(node.args[index])
+        if sql is None:
+            statement = Statement(self.path, node.lineno, self.function, ast.unparse(node.args[index]))
+            statement.head = self._head(node.args[index])
+            self.dynamic.append(statement)
+        else:
+            self.statements.append(Statement(self.path, node.lineno, self.function, sql))
+
+    def _head(self, node):
+        """Leading SQL text of an f-string, up to its first runtime field"""
+        if not isinstance(node, ast.JoinedStr):
+            return ''
+        head = ''
+        for value in node.values:
+            text = value.value if isinstance(value, ast.Constant) else self._field(value.value)
+            if text is None:
+                break
+            head += text
+        return head
+
+    def _field(self, node):
+        """SQL text standing in for an f-string field"""
+        fragment = FRAGMENTS.get((self.path, self.function, ast.unparse(node)))
+        if fragment is not None:
+            return fragment() if callable(fragment) else fragment
+        return self._string(node)
+
+    def _string(self, node):
+        """Literal value of a string expression, or None when it depends on runtime values"""
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return node.value
+        # Numeric constants such as WINDOW_DAYS are pasted into the SQL text
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            return str(node.value)
+        if isinstance(node, ast.JoinedStr):
+            parts = [value.value if isinstance(value, ast.Constant) else self._field(value.value)
+                     for value in node.values]
+            return None if None in parts else ''.join(parts)
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+            left, right = self._string(node.left), self._string(node.right)
+            return left + right if left is not None and right is not None else None
+        if isinstance(node, ast.Call):
+            name = node.func.attr if isinstance(node.func, ast.Attribute) else getattr(node.func, 'id', '')
+            # table_source(conn, 'attendance', ...) is the live table unless an archive exists
+            if name == 'table_source' and len(node.args) > 1:
+                return self._string(node.args[1])
+            # ','.join('?' * n) placeholder lists
+            if name == 'join' and isinstance(node.func, ast.Attribute) and self._string(node.func.value) == ',':
+                return '?'
+            return None
+        if isinstance(node, ast.IfExp):
+            body = self._string(node.body)
+            return body if body is not None else self._string(node.orelse)
+        if isinstance(node, ast.Name):
+            fragment = FRAGMENTS.get((self.path, self.function, node.id))
+            if fragment is not None:
+                return fragment() if callable(fragment) else fragment
+            if node.id in self.assigned:
+                return self.assigned[node.id]
+            return self.module_assigned.get(node.id)
+        return None
+
+
+def collect(patterns=SOURCES):
+    """(statements, unresolved calls) of every source file"""
+    statements, dynamic = [], []
+    seen = set()
+    for pattern in patterns:
+        for path in sorted(glob.glob(os.path.join(ROOT, pattern))):
+            relative = os.path.relpath(path, ROOT)
+            if relative in seen or os.path.basename(path) in SKIP_FILES:
+                continue
+            seen.add(relative)
+            with open(path, 'r', encoding='utf-8') as f:
+                collector = _Collector(relative)
+                collector.visit(ast.parse(f.read(), relative))
+            statements += collector.statements
+            dynamic += collector.dynamic
+    return statements, dynamic
+
+
+def build_database(path):
+    """Empty database with the full current schema"""
+    with open(os.path.join(ROOT, 'database', 'schema.sql'), 'r', encoding='utf-8') as f:
+        schema_sql = f.read()
+    conn = sqlite3.connect(path)
+    conn.executescript(schema_sql)
+    schema_migrations.migrate(conn, log=lambda message: None)
+    return conn
+
+
+def _aliases(sql):
+    """alias (or table name) -> table name for the tables a statement reads"""
+    aliases = {}
+    for table, alias in TABLE_PATTERN.findall(sql):
+        aliases[table.lower()] = table.lower()
+        if alias and alias.upper() not in NOT_ALIASES:
+            aliases[alias.lower()] = table.lower()
+    return aliases
+
+
+def explain(conn, sql):
+    """EXPLAIN QUERY PLAN detail lines, binding NULL to every parameter"""
+    bindings = []
+    for _ in range(2):
+        try:
+            return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', bindings)]
+        except sqlite3.ProgrammingError as e:
+            match = BINDINGS_PATTERN.search(str(e))
+            if not match:
+                raise
+            bindings = [None] * int(match.group(1))
+    return conn.execute(f'EXPLAIN QUERY PLAN {sql}', bindings).fetchall()
+
+
+def full_scans(sql, plan):
+    """Hot tables that a plan reads in full"""
+    aliases = _aliases(sql)
+    tables = []
+    for detail in plan:
+        match = SCAN_PATTERN.match(detail)
+        if match:
+            table = aliases.get(match.group(1).lower(), match.group(1).lower())
+            if table in HOT_TABLES:
+                tables.append(table)
+    return tables
+
+
+def run(verbose=False):
+    statements, dynamic = collect()
+    handle, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    conn = build_database(db_path)
+
+    checked = allowed = 0
+    failures, unchecked, excused = [], [], []
+    try:
+        for statement in statements:
+            if not DML_PATTERN.match(statement.sql):
+                continue
+            try:
+                plan = explain(conn, statement.sql)
+            except sqlite3.Error as e:
+                unchecked.append((statement, f'not explainable: {e}'))
+                continue
+            checked += 1
+            if verbose:
+                print(f"{statement.location}\n    " + '\n    '.join(plan))
+            for table in full_scans(statement.sql, plan):
+                if (statement.path, statement.function, table) in ALLOWED_SCANS:
+                    allowed += 1
+                else:
+                    failures.append((statement, table, plan))
+    finally:
+        conn.close()
+        os.remove(db_path)
+
+    # SQL known only at runtime can read anything, so it needs a reason too; runtime
+    # DDL and PRAGMA statements and module-level SQL constants are not plans
+    unchecked += [(statement, f'SQL built at runtime ({statement.sql})') for statement in dynamic
+                  if DML_PATTERN.match(statement.head)
+                  or not statement.head.strip() and not statement.sql.isupper()]
+    for statement, message in list(unchecked):
+        if (statement.path, statement.function) in ALLOWED_UNCHECKED:
+            unchecked.remove((statement, message))
+            excused.append((statement, message))
+
+    for statement, table, plan in failures:
+        print(f"✗ {statement.location}: full scan of {table}")
+        print('    ' + ' '.join(statement.sql.split())[:200])
+        print('    plan: ' + ' | '.join(plan))
+    for statement, message in unchecked:
+        print(f"✗ {statement.location}: {message}")
+    if verbose:
+        for statement, message in excused:
+            print(f"⚠ {statement.location}: {message}; {ALLOWED_UNCHECKED[(statement.path, statement.function)]}")
+
+    print(f"📋 {checked} statements checked, {len(failures)} unexpected scans, {allowed} allowed scans, "
+          f"{len(unchecked)} unchecked, {len(excused)} allowed unchecked")
+    return not failures and not unchecked
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Fail on full scans of hot tables in the app\'s SQL')
+    parser.add_argument('--verbose', action='store_true', help='Print every plan and every skipped statement')
+    args = parser.parse_args()
+    sys.exit(0 if run(args.verbose) else 1)
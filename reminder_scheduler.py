@@ -9,6 +9,11 @@ import json
 import threading
 import os
 
+from scheduler_lease import Lease
+
+LEASE_NAME = 'reminder_scheduler'
+
+
 class ReminderScheduler:
     def __init__(self, db_path='users.db'):
         self.db_path = db_path
@@ -59,65 +64,35 @@ class ReminderScheduler:
         conn.close()
         return students
     
-    def send_notification(self, user_id, user_type, message):
-        """Store notification in database for the web app to display"""
-        conn = sqlite3.connect(self.db_path)
+    def send_reminder(self, conn, class_id, user_id, user_type, reminder_type, message):
+        """Log the reminder and notify the user, unless it was already sent today
+
+        The reminder row and the notification commit together, and the
+        unique (class, user, type, date) key lets only one insert through,
+        so a reminder is delivered once even if two schedulers race.
+        """
         cur = conn.cursor()
+        today = datetime.now().strftime('%Y-%m-%d')
+        try:
+            cur.execute('''
+                INSERT OR IGNORE INTO reminders (class_id, user_id, reminder_type, status, message, reminder_date)
+                VALUES (?, ?, ?, 'sent', ?, ?)
+            ''', (class_id, user_id, reminder_type, message, today))
+            if cur.rowcount == 0:
+                conn.rollback()
+                return False
+            cur.execute('''
+                INSERT INTO notifications (user_id, user_type, message)
+                VALUES (?, ?, ?)
+            ''', (user_id, user_type, message))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
         
-        # Create notifications table if it doesn't exist
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS notifications (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                user_type TEXT,
-                message TEXT,
-                is_read INTEGER DEFAULT 0,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        ''')
-        
-        # Insert notification
-        cur.execute('''
-            INSERT INTO notifications (user_id, user_type, message)
-            VALUES (?, ?, ?)
-        ''', (user_id, user_type, message))
-        
-        conn.commit()
-        conn.close()
         print(f"Notification sent to {user_type} {user_id}: {message}")
         return True
     
-    def log_reminder(self, class_id, user_id, reminder_type, status, message):
-        """Log reminder in database"""
-        conn = sqlite3.connect(self.db_path)
-        cur = conn.cursor()
-        
-        cur.execute('''
-            INSERT INTO reminders (class_id, user_id, reminder_type, status, message)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (class_id, user_id, reminder_type, status, message))
-        
-        conn.commit()
-        conn.close()
-    
-    def check_already_sent(self, class_id, user_id, reminder_type):
-        """Check if reminder was already sent today"""
-        conn = sqlite3.connect(self.db_path)
-        cur = conn.cursor()
-        
-        today = datetime.now().strftime('%Y-%m-%d')
-        
-        cur.execute('''
-            SELECT COUNT(*) FROM reminders 
-            WHERE class_id = ? AND user_id = ? AND reminder_type = ? 
-            AND DATE(sent_at) = ?
-        ''', (class_id, user_id, reminder_type, today))
-        
-        count = cur.fetchone()[0]
-        conn.close()
-        return count > 0
-    
     def check_and_send_reminders(self):
         """Main function to check and send reminders"""
         current_time = datetime.now().strftime('%H:%M')
@@ -126,26 +101,25 @@ class ReminderScheduler:
         upcoming_classes = self.get_upcoming_classes()
         reminder_count = 0
         
-        for class_info in upcoming_classes:
-            class_id, class_name, start_time, schedule_days, teacher_name, teacher_id = class_info
-            
-            print(f"Processing class: {class_name} at {start_time}")
-            
-            # Send reminder to teacher (check if not already sent today)
-            if not self.check_already_sent(class_id, teacher_id, 'teacher_reminder'):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            for class_info in upcoming_classes:
+                class_id, class_name, start_time, schedule_days, teacher_name, teacher_id = class_info
+                
+                print(f"Processing class: {class_name} at {start_time}")
+                
+                # Send reminder to teacher
                 teacher_message = f"⏰ Reminder: Your class '{class_name}' starts in 30 minutes at {start_time}. Get ready!"
-                self.send_notification(teacher_id, 'teacher', teacher_message)
-                self.log_reminder(class_id, teacher_id, 'teacher_reminder', 'sent', teacher_message)
-                reminder_count += 1
-            
-            # Send reminders to students
-            students = self.get_class_students(class_id)
-            for student_id, student_name, student_email in students:
-                if not self.check_already_sent(class_id, student_id, 'student_reminder'):
-                    student_message = f"⏰ Reminder: Your class '{class_name}' starts in 30 minutes at {start_time}. Don't be late!"
-                    self.send_notification(student_id, 'student', student_message)
-                    self.log_reminder(class_id, student_id, 'student_reminder', 'sent', student_message)
+                if self.send_reminder(conn, class_id, teacher_id, 'teacher', 'teacher_reminder', teacher_message):
                     reminder_count += 1
+                
+                # Send reminders to students
+                student_message = f"⏰ Reminder: Your class '{class_name}' starts in 30 minutes at {start_time}. Don't be late!"
+                for student_id, student_name, student_email in self.get_class_students(class_id):
+                    if self.send_reminder(conn, class_id, student_id, 'student', 'student_reminder', student_message):
+                        reminder_count += 1
+        finally:
+            conn.close()
         
         if reminder_count > 0:
             print(f"✓ Sent {reminder_count} reminders successfully!")
@@ -155,18 +129,39 @@ class ReminderScheduler:
         return reminder_count
     
     def run_scheduler(self, interval_minutes=2):
-        """Run the scheduler continuously"""
+        """Run the scheduler continuously, while holding the leader lease
+        
+        Every process may call this; only the one holding the lease checks
+        for reminders. The others keep trying and take over when the
+        leader stops renewing (its lease expires after three intervals).
+        """
+        lease = Lease(LEASE_NAME, ttl=interval_minutes * 60 * 3)
         print("↗ Starting automated reminder scheduler...")
         print(f"📅 Checking every {interval_minutes} minutes for classes starting in 30 minutes")
-        print(f"🕐 Started at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        print(f"🕐 Started at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} as {lease.holder}")
         
+        leader = False
         while True:
             try:
-                self.check_and_send_reminders()
+                conn = sqlite3.connect(self.db_path)
+                try:
+                    is_leader = lease.acquire(conn)
+                finally:
+                    conn.close()
+                if is_leader != leader:
+                    print("👑 Reminder scheduler lease acquired" if is_leader else "⏸ Reminder scheduler lease lost")
+                    leader = is_leader
+                if is_leader:
+                    self.check_and_send_reminders()
                 print(f"⏸ Sleeping for {interval_minutes} minutes...\n")
                 time.sleep(interval_minutes * 60)  # Check every 2 minutes by default
             except KeyboardInterrupt:
                 print("\n⏹ Scheduler stopped by user")
+                conn = sqlite3.connect(self.db_path)
+                try:
+                    lease.release(conn)
+                finally:
+                    conn.close()
                 break
             except Exception as e:
                 print(f"✗ Scheduler error: {e}")
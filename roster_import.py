@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Bulk roster import for students and teachers
+Streams a CSV of users with their classes and subjects, validates it in
+batches against the database, hashes passwords (in a process pool for
+large files imported from the command line) and loads users, role mappings, class mappings and subjects
+with executemany, one transaction per batch.
+
+CSV columns: username, password, role, name, email, classes, subjects
+classes and subjects are ';' separated. A class may be given by id or name.
+"""
+import csv
+import hashlib
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from enrollments import add_links
+
+DATABASE = 'users.db'
+
+SUBJECTS = ['Math', 'Science', 'Social Science', 'English', 'Hindi']
+ROLES = ('student', 'teacher')
+REQUIRED_COLUMNS = ('username', 'password', 'role')
+
+# Below this many rows in a file the pool start-up costs more than it saves
+POOL_MIN_ROWS = 1000
+
+
+def hash_password(password):
+    """Same hashing as routes/auth.py so imported users can log in"""
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def split_list(value):
+    return [item.strip() for item in (value or '').split(';') if item.strip()]
+
+
+class ImportReport:
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.total_rows = 0
+        self.created = {'student': 0, 'teacher': 0}
+        self.class_links = 0
+        self.subject_links = 0
+        self.errors = []
+
+    def add_error(self, line, username, message):
+        self.errors.append({'line': line, 'username': username, 'message': message})
+
+    @property
+    def created_total(self):
+        return sum(self.created.values())
+
+
+class RosterImporter:
+    def __init__(self, db_path=DATABASE, assigned_by=None, batch_size=500, hash_workers=None, use_pool=False):
+        self.db_path = db_path
+        self.assigned_by = assigned_by
+        self.batch_size = batch_size
+        self.hash_workers = hash_workers
+        # Forking worker processes from a threaded web server is unsafe,
+        # so only the command line turns the pool on
+        self.use_pool = use_pool
+        self._pool = None
+        self._hashed = 0
+
+    def _load_lookups(self, cur):
+        """Load class and role lookups once per import"""
+        cur.execute('SELECT id, name FROM classes')
+        classes = {}
+        for class_id, name in cur.fetchall():
+            classes[str(class_id)] = class_id
+            if name:
+                classes[name.strip().lower()] = class_id
+
+        cur.execute('SELECT id, role_name FROM user_roles')
+        role_ids = {role_name: role_id for role_id, role_name in cur.fetchall()}
+        return classes, role_ids
+
+    def _existing_usernames(self, cur, usernames):
+        if not usernames:
+            return set()
+        placeholders = ','.join('?' * len(usernames))
+        cur.execute(f'SELECT username FROM users WHERE username IN ({placeholders})', usernames)
+        return {row[0] for row in cur.fetchall()}
+
+    def _validate_batch(self, cur, batch, classes, seen, report):
+        """Check a batch of (line, row) pairs and return the rows that can be loaded"""
+        usernames = [(row.get('username') or '').strip() for _, row in batch]
+        taken = self._existing_usernames(cur, [u for u in usernames if u])
+
+        valid = []
+        for (line, row), username in zip(batch, usernames):
+            role = (row.get('role') or '').strip().lower()
+            password = row.get('password') or ''
+
+            if not username or not password or not role:
+                report.add_error(line, username, 'username, password and role are required')
+                continue
+            if role not in ROLES:
+                report.add_error(line, username, f"Unknown role '{role}'")
+                continue
+            if username in seen:
+                report.add_error(line, username, 'Duplicate username in file')
+                continue
+            if username in taken:
+                report.add_error(line, username, 'Username already exists')
+                continue
+
+            class_ids = []
+            unknown = []
+            for ref in split_list(row.get('classes')):
+                class_id = classes.get(ref) or classes.get(ref.lower())
+                if class_id is None:
+                    unknown.append(ref)
+                elif class_id not in class_ids:
+                    class_ids.append(class_id)
+            if unknown:
+                report.add_error(line, username, f"Unknown class: {', '.join(unknown)}")
+                continue
+
+            subjects = []
+            for subject in split_list(row.get('subjects')):
+                match = next((s for s in SUBJECTS if s.lower() == subject.lower()), None)
+                if match is None:
+                    unknown.append(subject)
+                elif match not in subjects:
+                    subjects.append(match)
+            if unknown:
+                report.add_error(line, username, f"Unknown subject: {', '.join(unknown)}")
+                continue
+
+            seen.add(username)
+            valid.append({
+                'line': line,
+                'username': username,
+                'password': password,
+                'role': role,
+                'name': (row.get('name') or '').strip(),
+                'email': (row.get('email') or '').strip(),
+                'class_ids': class_ids,
+                'subjects': subjects
+            })
+        return valid
+
+    def _hash_passwords(self, passwords):
+        # The file is streamed, so the pool starts once enough rows have been seen
+        self._hashed += len(passwords)
+        if not self.use_pool or self._hashed < POOL_MIN_ROWS:
+            return [hash_password(p) for p in passwords]
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.hash_workers)
+        return list(self._pool.map(hash_password, passwords, chunksize=256))
+
+    def _load_batch(self, conn, rows, role_ids, report):
+        """Insert one validated batch in a single transaction"""
+        hashes = self._hash_passwords([row['password'] for row in rows])
+        cur = conn.cursor()
+        try:
+            cur.executemany('''
+                INSERT INTO users (username, password, role, name, email, created_by)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [(row['username'], hashed, row['role'], row['name'], row['email'], self.assigned_by)
+                  for row, hashed in zip(rows, hashes)])
+
+            placeholders = ','.join('?' * len(rows))
+            cur.execute(f'SELECT username, id FROM users WHERE username IN ({placeholders})',
+                        [row['username'] for row in rows])
+            user_ids = dict(cur.fetchall())
+
+            role_links = []
+            student_classes, teacher_classes = [], []
+            student_subjects, teacher_subjects = [], []
+            for row in rows:
+                user_id = user_ids[row['username']]
+                if row['role'] in role_ids:
+                    role_links.append((user_id, role_ids[row['role']], self.assigned_by))
+                classes = student_classes if row['role'] == 'student' else teacher_classes
+                subjects = student_subjects if row['role'] == 'student' else teacher_subjects
+                classes.extend((user_id, class_id) for class_id in row['class_ids'])
+                subjects.extend((user_id, subject) for subject in row['subjects'])
+
+            cur.executemany('INSERT INTO user_role_map (user_id, role_id, assigned_by) VALUES (?, ?, ?)',
+                            role_links)
+            add_links(cur, 'student_class', student_classes, self.assigned_by)
+            add_links(cur, 'teacher_class', teacher_classes, self.assigned_by)
+            add_links(cur, 'student_subject', student_subjects, self.assigned_by)
+            add_links(cur, 'teacher_subject', teacher_subjects, self.assigned_by)
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            for row in rows:
+                report.add_error(row['line'], row['username'], f'Batch not loaded: {e}')
+            return
+
+        for row in rows:
+            report.created[row['role']] += 1
+        report.class_links += len(student_classes) + len(teacher_classes)
+        report.subject_links += len(student_subjects) + len(teacher_subjects)
+
+    def _batches(self, reader):
+        batch = []
+        for row in reader:
+            # Header is line 1
+            batch.append((reader.line_num, row))
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def run(self, text_stream, dry_run=False):
+        """Import a roster from a text stream and return an ImportReport"""
+        report = ImportReport(dry_run)
+        reader = csv.DictReader(text_stream)
+
+        columns = [c.strip().lower() for c in (reader.fieldnames or [])]
+        missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+        if missing:
+            report.add_error(1, '', f"Missing column(s): {', '.join(missing)}")
+            return report
+        reader.fieldnames = columns
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cur = conn.cursor()
+            classes, role_ids = self._load_lookups(cur)
+            seen = set()
+
+            for batch in self._batches(reader):
+                report.total_rows += len(batch)
+                rows = self._validate_batch(cur, batch, classes, seen, report)
+                if not rows:
+                    continue
+                if dry_run:
+                    for row in rows:
+                        report.created[row['role']] += 1
+                    report.class_links += sum(len(row['class_ids']) for row in rows)
+                    report.subject_links += sum(len(row['subjects']) for row in rows)
+                else:
+                    self._load_batch(conn, rows, role_ids, report)
+        finally:
+            conn.close()
+            self._hashed = 0
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+        return report
+
+
+def import_roster(text_stream, assigned_by=None, dry_run=False, db_path=DATABASE, batch_size=500, use_pool=False):
+    """Import a CSV roster; see RosterImporter for the file format"""
+    importer = RosterImporter(db_path, assigned_by=assigned_by, batch_size=batch_size, use_pool=use_pool)
+    return importer.run(text_stream, dry_run=dry_run)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Import students and teachers from a CSV roster')
+    parser.add_argument('csv_file', help='CSV with username,password,role,name,email,classes,subjects')
+    parser.add_argument('--dry-run', action='store_true', help='Validate only, do not write anything')
+    parser.add_argument('--admin', default='admin', help='Username recorded as assigned_by')
+    parser.add_argument('--batch-size', type=int, default=500, help='Rows per validation/insert batch')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(DATABASE)
+    admin = conn.execute('SELECT id FROM users WHERE username = ?', (args.admin,)).fetchone()
+    conn.close()
+
+    with open(args.csv_file, newline='', encoding='utf-8-sig') as f:
+        report = import_roster(f, assigned_by=admin[0] if admin else None,
+                               dry_run=args.dry_run, batch_size=args.batch_size, use_pool=True)
+
+    mode = 'Dry run' if report.dry_run else 'Import'
+    print(f"✓ {mode}: {report.total_rows} rows, {report.created['student']} students, "
+          f"{report.created['teacher']} teachers, {report.class_links} class links, "
+          f"{report.subject_links} subject links")
+    for error in report.errors:
+        print(f"✗ line {error['line']} {error['username']}: {error['message']}")
+    sys.exit(1 if report.errors else 0)
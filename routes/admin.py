@@ -4,8 +4,20 @@ import os
 import json
 import uuid
 import hashlib
+import io
 from werkzeug.utils import secure_filename
 from datetime import datetime
+from session_store import session_store, get_current_principal
+import roster_import
+import feedback_analytics
+import cascade_delete
+import grade_snapshots
+import at_risk
+import timetable
+from enrollments import add_links, sync_links
+from class_stats import get_class_stats, EMPTY_STATS
+from attendance_rollups import summary_source
+from term_archive import table_source
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -18,15 +30,14 @@ def get_db():
     return sqlite3.connect('users.db')
 
 def get_current_user():
-    """Get current user from session"""
-    class User:
-        def __init__(self, user_id, username):
-            self.id = user_id
-            self.username = username
-    
-    if 'user_id' in session:
-        return User(session['user_id'], session.get('username', ''))
-    return None
+    """Get current user principal from the server-side session store"""
+    return get_current_principal()
+
+def timetable_error(conflicts):
+    """Flash text for timetable conflicts (first few only)"""
+    shown = '; '.join(conflicts[:5])
+    more = f' and {len(conflicts) - 5} more' if len(conflicts) > 5 else ''
+    return f'Timetable conflict: {shown}{more}'
 
 @admin_bp.route('/dashboard')
 def dashboard():
@@ -41,8 +52,30 @@ def dashboard():
     cur.execute('SELECT id, username FROM users ORDER BY id')
     users = cur.fetchall()
     
+    # Students flagged by the nightly at-risk job
+    at_risk_students = at_risk.get_flagged(cur, limit=25)
+    at_risk_run = at_risk.last_run(cur)
+    
     conn.close()
-    return render_template('admin/dashboard.html', users=users)
+    return render_template('admin/dashboard.html', users=users,
+                           at_risk_students=at_risk_students,
+                           at_risk_run=at_risk_run)
+
+@admin_bp.route('/at_risk/run', methods=['POST'])
+def run_at_risk():
+    """Recompute at-risk students now instead of waiting for the nightly run"""
+    if 'role' not in session or session['role'] != 'admin':
+        return redirect(url_for('auth.login'))
+    
+    conn = get_db()
+    try:
+        result = at_risk.run(conn)
+        flash(f"Scored {result['students']} students, {result['flagged']} flagged as at risk", 'success')
+    except sqlite3.Error as e:
+        flash(f'Error computing at-risk students: {str(e)}', 'error')
+    finally:
+        conn.close()
+    return redirect(url_for('admin.dashboard'))
 
 @admin_bp.route('/users')
 def users():
@@ -98,6 +131,13 @@ def add_user():
             flash('Username already exists!', 'error')
             return redirect(url_for('admin.users'))
         
+        # A new user has no classes yet, so only the chosen ones can clash
+        if role in ('student', 'teacher'):
+            conflicts = timetable.check_enrollment(cur, role, 0, request.form.getlist(f'{role}_classes'))
+            if conflicts:
+                flash(timetable_error(conflicts), 'error')
+                return redirect(url_for('admin.users'))
+        
         # Create user
         hashed_password = simple_hash_password(password)
         cur.execute('INSERT INTO users (username, password, role, name, email, created_by) VALUES (?, ?, ?, ?, ?, ?)',
@@ -114,44 +154,25 @@ def add_user():
         
         # Handle student assignments
         if role == 'student':
-            # Assign to classes
-            class_assignments = request.form.getlist('student_classes')
-            for class_id in class_assignments:
-                cur.execute('INSERT INTO student_class_map (student_id, class_id, assigned_by) VALUES (?, ?, ?)',
-                           (user_id, class_id, current_user.id))
-            
-            # Assign subjects
-            subject_assignments = request.form.getlist('subjects')
-            for subject in subject_assignments:
-                cur.execute('INSERT INTO student_subjects (student_id, subject_name, assigned_by) VALUES (?, ?, ?)',
-                           (user_id, subject, current_user.id))
+            # Assign to classes and subjects
+            sync_links(cur, 'student_class', user_id, request.form.getlist('student_classes'), current_user.id)
+            sync_links(cur, 'student_subject', user_id, request.form.getlist('subjects'), current_user.id)
         
         # Handle teacher assignments
         elif role == 'teacher':
-            # Assign to classes
             class_assignments = request.form.getlist('teacher_classes')
-            for class_id in class_assignments:
-                cur.execute('INSERT INTO teacher_class_map (teacher_id, class_id, assigned_by) VALUES (?, ?, ?)',
-                           (user_id, class_id, current_user.id))
             
             # If no classes assigned, assign to first available class to prevent errors
             if not class_assignments:
                 cur.execute('SELECT id FROM classes WHERE status = "active" LIMIT 1')
                 first_class = cur.fetchone()
                 if first_class:
-                    cur.execute('INSERT INTO teacher_class_map (teacher_id, class_id, assigned_by) VALUES (?, ?, ?)',
-                               (user_id, first_class[0], current_user.id))
-            
-            # Assign subjects
-            subject_assignments = request.form.getlist('teacher_subjects')
-            for subject in subject_assignments:
-                cur.execute('INSERT INTO teacher_subjects (teacher_id, subject_name, assigned_by) VALUES (?, ?, ?)',
-                           (user_id, subject, current_user.id))
+                    class_assignments = [first_class[0]]
+            sync_links(cur, 'teacher_class', user_id, class_assignments, current_user.id)
             
             # If no subjects assigned, assign Math as default to prevent errors
-            if not subject_assignments:
-                cur.execute('INSERT INTO teacher_subjects (teacher_id, subject_name, assigned_by) VALUES (?, ?, ?)',
-                           (user_id, 'Math', current_user.id))
+            subject_assignments = request.form.getlist('teacher_subjects') or ['Math']
+            sync_links(cur, 'teacher_subject', user_id, subject_assignments, current_user.id)
         
         conn.commit()
         flash(f'User {username} created successfully!', 'success')
@@ -327,21 +348,18 @@ def update_student(student_id):
         classes = request.form.getlist('classes')
         subjects = request.form.getlist('subjects')
         
-        # Remove existing assignments
-        cur.execute('DELETE FROM student_class_map WHERE student_id = ?', (student_id,))
-        cur.execute('DELETE FROM student_subjects WHERE student_id = ?', (student_id,))
-        
-        # Add new class assignments
-        for class_id in classes:
-            cur.execute('INSERT INTO student_class_map (student_id, class_id, assigned_by) VALUES (?, ?, ?)',
-                       (student_id, class_id, current_user.id))
+        conflicts = timetable.check_enrollment(cur, 'student', student_id, classes, replacing=True)
+        if conflicts:
+            flash(timetable_error(conflicts), 'error')
+            return redirect(url_for('admin.edit_student', student_id=student_id))
         
-        # Add new subject assignments
-        for subject in subjects:
-            cur.execute('INSERT INTO student_subjects (student_id, subject_name, assigned_by) VALUES (?, ?, ?)',
-                       (student_id, subject, current_user.id))
+        # Only insert/remove the mappings that changed
+        added, removed = sync_links(cur, 'student_class', student_id, classes, current_user.id)
+        sync_links(cur, 'student_subject', student_id, subjects, current_user.id)
         
         conn.commit()
+        if added or removed:
+            session_store.invalidate_user(student_id)
         flash('Student assignments updated successfully!', 'success')
         
     except Exception as e:
@@ -417,21 +435,18 @@ def update_teacher(teacher_id):
         classes = request.form.getlist('classes')
         subjects = request.form.getlist('subjects')
         
-        # Remove existing assignments
-        cur.execute('DELETE FROM teacher_class_map WHERE teacher_id = ?', (teacher_id,))
-        cur.execute('DELETE FROM teacher_subjects WHERE teacher_id = ?', (teacher_id,))
+        conflicts = timetable.check_enrollment(cur, 'teacher', teacher_id, classes, replacing=True)
+        if conflicts:
+            flash(timetable_error(conflicts), 'error')
+            return redirect(url_for('admin.edit_teacher', teacher_id=teacher_id))
         
-        # Add new class assignments
-        for class_id in classes:
-            cur.execute('INSERT INTO teacher_class_map (teacher_id, class_id, assigned_by) VALUES (?, ?, ?)',
-                       (teacher_id, class_id, current_user.id))
-        
-        # Add new subject assignments
-        for subject in subjects:
-            cur.execute('INSERT INTO teacher_subjects (teacher_id, subject_name, assigned_by) VALUES (?, ?, ?)',
-                       (teacher_id, subject, current_user.id))
+        # Only insert/remove the mappings that changed
+        added, removed = sync_links(cur, 'teacher_class', teacher_id, classes, current_user.id)
+        sync_links(cur, 'teacher_subject', teacher_id, subjects, current_user.id)
         
         conn.commit()
+        if added or removed:
+            session_store.invalidate_user(teacher_id)
         flash('Teacher assignments updated successfully!', 'success')
         
     except Exception as e:
@@ -461,17 +476,9 @@ def delete_user(user_id):
             flash('Deletion unsuccessful, contact tech team', 'error')
             return redirect(url_for('admin.manage_users'))
         
-        # Delete all related records
-        cur.execute('DELETE FROM student_class_map WHERE student_id = ?', (user_id,))
-        cur.execute('DELETE FROM teacher_class_map WHERE teacher_id = ?', (user_id,))
-        cur.execute('DELETE FROM student_subjects WHERE student_id = ?', (user_id,))
-        cur.execute('DELETE FROM teacher_subjects WHERE teacher_id = ?', (user_id,))
-        cur.execute('DELETE FROM user_role_map WHERE user_id = ?', (user_id,))
-        cur.execute('DELETE FROM feedback WHERE student_id = ?', (user_id,))
-        cur.execute('DELETE FROM doubts WHERE student_id = ?', (user_id,))
-        cur.execute('DELETE FROM users WHERE id = ?', (user_id,))
-        
-        conn.commit()
+        # Delete the user and every record that cascades from it
+        cascade_delete.delete_user(conn, user_id)
+        session_store.remove_user(user_id)
         flash('Deletion successful', 'success')
         return redirect(url_for('admin.manage_users'))
         
@@ -513,6 +520,10 @@ def add_class():
     schedule_days = request.form.getlist('schedule_days')
     schedule_time_start = request.form.get('schedule_time_start', '')
     schedule_time_end = request.form.get('schedule_time_end', '')
+    schedule_error = timetable.validate_schedule(schedule_days, schedule_time_start, schedule_time_end)
+    if schedule_error:
+        flash(schedule_error, 'error')
+        return redirect(url_for('admin.create_class'))
     
     # Handle PDF upload
     schedule_pdf_path = ''
@@ -568,21 +579,22 @@ def view_classes():
     conn = get_db()
     cur = conn.cursor()
     
-    # Get all classes with student/teacher counts
+    # Get all classes, then attach student/teacher counts
     cur.execute('''
         SELECT 
             c.id, c.name, c.type, c.description, c.grade_level, c.section,
             c.schedule_days, c.schedule_time_start, c.schedule_time_end,
-            c.meeting_link, c.max_students, c.status, c.subject,
-            COUNT(DISTINCT scm.student_id) as student_count,
-            COUNT(DISTINCT tcm.teacher_id) as teacher_count
+            c.meeting_link, c.max_students, c.status, c.subject
         FROM classes c
-        LEFT JOIN student_class_map scm ON c.id = scm.class_id
-        LEFT JOIN teacher_class_map tcm ON c.id = tcm.class_id
-        GROUP BY c.id
         ORDER BY c.name
     ''')
-    classes = cur.fetchall()
+    class_rows = cur.fetchall()
+    
+    stats = get_class_stats(cur)
+    classes = []
+    for row in class_rows:
+        class_stats = stats.get(row[0], EMPTY_STATS)
+        classes.append(row + (class_stats['student_count'], class_stats['teacher_count']))
     
     conn.close()
     return render_template('admin/view_classes.html', classes=classes)
@@ -686,16 +698,26 @@ def assign_students():
     cur = conn.cursor()
     
     try:
+        # Students who would be double-booked are left out of the class
+        clashing = {}
         for student_id in student_ids:
-            # Check if already assigned
-            cur.execute('SELECT id FROM student_class_map WHERE student_id = ? AND class_id = ?',
-                       (student_id, class_id))
-            if not cur.fetchone():
-                cur.execute('INSERT INTO student_class_map (student_id, class_id, assigned_by) VALUES (?, ?, ?)',
-                           (student_id, class_id, current_user.id))
+            conflicts = timetable.check_enrollment(cur, 'student', student_id, [class_id])
+            if conflicts:
+                clashing[student_id] = conflicts
+        student_ids = [student_id for student_id in student_ids if student_id not in clashing]
+        
+        # Existing enrollments are skipped by the unique (student_id, class_id) key
+        add_links(cur, 'student_class', [(student_id, class_id) for student_id in student_ids], current_user.id)
         
         conn.commit()
-        flash('Students assigned successfully!', 'success')
+        session_store.invalidate_users(student_ids)
+        if clashing:
+            cur.execute(f"SELECT COALESCE(name, username) FROM users WHERE id IN ({','.join('?' * len(clashing))})",
+                        list(clashing))
+            names = ', '.join(row[0] for row in cur.fetchall())
+            flash(f'{len(clashing)} student(s) not assigned because of timetable conflicts: {names}', 'warning')
+        if student_ids:
+            flash('Students assigned successfully!', 'success')
         
     except Exception as e:
         conn.rollback()
@@ -706,82 +728,152 @@ def assign_students():
     
     return redirect(url_for('admin.add_students'))
 
-# Subject creation functionality removed - using fixed subject list now
-# Fixed subjects: Math, Science, Social Science, English, Hindi
+@admin_bp.route('/import_roster', methods=['GET', 'POST'])
+def import_roster():
+    """Bulk import students and teachers from a CSV roster"""
+    if 'role' not in session or session['role'] != 'admin':
+        return redirect(url_for('auth.login'))
+    
+    report = None
+    if request.method == 'POST':
+        roster_file = request.files.get('roster_file')
+        if not roster_file or not roster_file.filename:
+            flash('Please choose a CSV file to import', 'error')
+            return redirect(url_for('admin.import_roster'))
+        
+        dry_run = request.form.get('dry_run') == 'on'
+        current_user = get_current_user()
+        
+        try:
+            stream = io.TextIOWrapper(roster_file.stream, encoding='utf-8-sig', newline='')
+            report = roster_import.import_roster(stream, assigned_by=current_user.id, dry_run=dry_run)
+        except UnicodeDecodeError:
+            flash('The roster must be a UTF-8 encoded CSV file', 'error')
+            return redirect(url_for('admin.import_roster'))
+        
+        if report.dry_run:
+            flash(f'Dry run: {report.created_total} of {report.total_rows} rows would be imported', 'success')
+        elif report.created_total:
+            flash(f'Imported {report.created_total} of {report.total_rows} users', 'success')
+        if report.errors:
+            flash(f'{len(report.errors)} row(s) have errors', 'error')
+    
+    return render_template('admin/import_roster.html', report=report)
 
-@admin_bp.route('/view_feedback')
-def view_feedback():
-    """View all feedback submissions"""
+@admin_bp.route('/grade_reports', methods=['GET', 'POST'])
+def grade_reports():
+    """Generate and browse term grade report snapshots"""
     if 'role' not in session or session['role'] != 'admin':
         return redirect(url_for('auth.login'))
     
     conn = get_db()
     cur = conn.cursor()
     
-    # Get feedback stats
-    cur.execute('SELECT COUNT(*) FROM feedback')
-    total_feedback = cur.fetchone()[0]
-    
-    # For now, create mock stats since we don't have status field in feedback table
-    feedback_stats = {
-        'total': total_feedback,
-        'pending': total_feedback // 2,
-        'reviewed': total_feedback // 3,
-        'resolved': total_feedback // 4
-    }
+    try:
+        if request.method == 'POST':
+            term = request.form.get('term', '').strip()
+            if not term:
+                flash('Term name is required', 'error')
+                return redirect(url_for('admin.grade_reports'))
+            
+            current_user = get_current_user()
+            try:
+                written = grade_snapshots.snapshot_term(
+                    conn, term,
+                    due_from=request.form.get('due_from') or None,
+                    due_before=request.form.get('due_before') or None,
+                    generated_by=current_user.id
+                )
+            except ValueError as e:
+                flash(str(e), 'error')
+                return redirect(url_for('admin.grade_reports', term=term))
+            flash(f'Generated {written} grade reports for {term}', 'success')
+            return redirect(url_for('admin.grade_reports', term=term))
+        
+        terms = grade_snapshots.list_terms(cur)
+        selected_term = request.args.get('term') or (terms[0]['term'] if terms else '')
+        class_id = request.args.get('class_id', type=int)
+        student_id = request.args.get('student_id', type=int)
+        
+        reports = grade_snapshots.get_term_reports(cur, selected_term, class_id) if selected_term else []
+        transcript = grade_snapshots.get_transcript(cur, student_id) if student_id else []
+        
+        cur.execute('SELECT id, name FROM classes ORDER BY name')
+        classes = cur.fetchall()
+        
+        return render_template('admin/grade_reports.html',
+                             terms=terms,
+                             selected_term=selected_term,
+                             class_id=class_id,
+                             classes=classes,
+                             reports=reports,
+                             student_id=student_id,
+                             transcript=transcript)
     
-    # Get all feedback with user details
-    cur.execute('''
-        SELECT f.id, f.student_id, f.feedback_text, f.rating, f.submitted_on,
-               u.username, f.status, f.admin_response, f.response_date
-        FROM feedback f
-        LEFT JOIN users u ON f.student_id = u.id
-        ORDER BY f.submitted_on DESC
-    ''')
-    feedback_raw = cur.fetchall()
+    except sqlite3.Error as e:
+        conn.rollback()
+        flash(f'Error generating grade reports: {str(e)}', 'error')
+        return redirect(url_for('admin.dashboard'))
+    finally:
+        conn.close()
+
+@admin_bp.route('/timetable_conflicts')
+def timetable_conflicts():
+    """Every teacher and student booked into overlapping classes"""
+    if 'role' not in session or session['role'] != 'admin':
+        return redirect(url_for('auth.login'))
     
-    # Get proper feedback stats
-    cur.execute('SELECT COUNT(*) FROM feedback WHERE status = ?', ('pending',))
-    pending_count = cur.fetchone()[0]
+    conn = get_db()
+    cur = conn.cursor()
     
-    cur.execute('SELECT COUNT(*) FROM feedback WHERE status = ?', ('reviewed',))
-    reviewed_count = cur.fetchone()[0]
+    try:
+        role = request.args.get('role', '')
+        conflicts = timetable.conflict_report(cur)
+        if role:
+            conflicts = [conflict for conflict in conflicts if conflict['role'] == role]
+        
+        return render_template('admin/timetable_conflicts.html', conflicts=conflicts, role=role)
     
-    cur.execute('SELECT COUNT(*) FROM feedback WHERE status = ?', ('resolved',))
-    resolved_count = cur.fetchone()[0]
+    except sqlite3.Error as e:
+        flash(f'Error building timetable report: {str(e)}', 'error')
+        return redirect(url_for('admin.dashboard'))
+    finally:
+        conn.close()
+
+# Subject creation functionality removed - using fixed subject list now
+# Fixed subjects: Math, Science, Social Science, English, Hindi
+
+@admin_bp.route('/view_feedback')
+def view_feedback():
+    """View all feedback submissions"""
+    if 'role' not in session or session['role'] != 'admin':
+        return redirect(url_for('auth.login'))
     
-    feedback_stats = {
-        'total': total_feedback,
-        'pending': pending_count,
-        'reviewed': reviewed_count,
-        'resolved': resolved_count
+    page = request.args.get('page', 1, type=int)
+    filters = {
+        'status': request.args.get('status', ''),
+        'rating': request.args.get('rating', type=int),
+        'date_range': request.args.get('date_range', '')
     }
     
-    # Transform feedback data to match template expectations
-    feedback_list = []
-    for row in feedback_raw:
-        feedback_list.append([
-            row[0],  # id
-            row[1],  # student_id
-            'general',  # category (mock)
-            '',  # subject (mock)
-            '',  # teacher (mock)
-            '',  # class (mock)
-            row[3],  # rating
-            row[2],  # feedback_text
-            0,  # is_anonymous (mock)
-            row[4],  # submitted_on
-            row[6] or 'pending',  # status
-            row[7] or '',  # admin_response
-            row[8] or '',  # response_date
-            '',  # resolved_date (mock)
-            row[5]  # username
-        ])
+    conn = get_db()
+    cur = conn.cursor()
+    
+    try:
+        feedback_stats = feedback_analytics.get_status_counts(cur)
+        rating_distribution = feedback_analytics.get_rating_distribution(cur)
+        feedback_trend = feedback_analytics.get_trend(cur)
+        feedback_list, pagination = feedback_analytics.get_feedback_page(cur, page, **filters)
+    finally:
+        conn.close()
     
-    conn.close()
     return render_template('admin/view_feedback.html', 
                          feedback_stats=feedback_stats, 
-                         feedback_list=feedback_list)
+                         feedback_list=feedback_list,
+                         rating_distribution=rating_distribution,
+                         feedback_trend=feedback_trend,
+                         pagination=pagination,
+                         filters=filters)
 
 @admin_bp.route('/respond_to_feedback', methods=['POST'])
 def respond_to_feedback():
@@ -1003,28 +1095,18 @@ def delete_class(class_id):
         if not class_info:
             return jsonify({'success': False, 'message': 'Class not found'}), 404
         
-        # Delete all related records in the correct order to avoid foreign key constraints
-        
-        # First delete submissions for assignments in this class
-        cur.execute('''DELETE FROM submissions WHERE assignment_id IN 
-                       (SELECT id FROM assignments WHERE class_id = ?)''', (class_id,))
-        
-        # Delete marks for assessments in this class
-        cur.execute('''DELETE FROM marks WHERE assessment_id IN 
-                       (SELECT id FROM assessments WHERE class_id = ?)''', (class_id,))
-        
-        # Delete direct class-related records
-        cur.execute('DELETE FROM student_class_map WHERE class_id = ?', (class_id,))
-        cur.execute('DELETE FROM teacher_class_map WHERE class_id = ?', (class_id,))
-        cur.execute('DELETE FROM announcements WHERE class_id = ?', (class_id,))
-        cur.execute('DELETE FROM attendance WHERE class_id = ?', (class_id,))
-        cur.execute('DELETE FROM assignments WHERE class_id = ?', (class_id,))
-        cur.execute('DELETE FROM assessments WHERE class_id = ?', (class_id,))
+        # Members whose cached class lists will change
+        cur.execute('''
+            SELECT student_id FROM student_class_map WHERE class_id = ?
+            UNION
+            SELECT teacher_id FROM teacher_class_map WHERE class_id = ?
+        ''', (class_id, class_id))
+        member_ids = [row[0] for row in cur.fetchall()]
         
-        # Finally delete the class itself
-        cur.execute('DELETE FROM classes WHERE id = ?', (class_id,))
+        # Delete the class and its dependent records in dependency order
+        cascade_delete.delete_class(conn, class_id)
         
-        conn.commit()
+        session_store.invalidate_users(member_ids)
         return jsonify({'success': True, 'message': f'Class "{class_info[0]}" deleted successfully'})
         
     except Exception as e:
@@ -1055,6 +1137,14 @@ def toggle_class_status(class_id):
         current_status, class_name = result
         new_status = 'inactive' if current_status == 'active' else 'active'
         
+        # Reactivating puts the class back on its members' timetables
+        if new_status == 'active':
+            cur.execute('SELECT schedule_days, schedule_time_start, schedule_time_end FROM classes WHERE id = ?',
+                        (class_id,))
+            conflicts = timetable.check_class(cur, class_id, *cur.fetchone())
+            if conflicts:
+                return jsonify({'error': timetable_error(conflicts), 'conflicts': conflicts}), 409
+        
         # Update status
         cur.execute('UPDATE classes SET status = ? WHERE id = ?', (new_status, class_id))
         
@@ -1297,23 +1387,10 @@ def attendance_report():
     cur = conn.cursor()
     
     try:
-        # Build query based on filters
-        where_conditions = []
-        params = []
-        
-        if class_id:
-            where_conditions.append('a.class_id = ?')
-            params.append(class_id)
-        
-        if start_date:
-            where_conditions.append('a.attendance_date >= ?')
-            params.append(start_date)
-        
-        if end_date:
-            where_conditions.append('a.attendance_date <= ?')
-            params.append(end_date)
-        
-        where_clause = ' AND '.join(where_conditions) if where_conditions else '1=1'
+        # Whole months come from the rollups, partial months from raw rows
+        # Archived rows are only read when the range starts before the archive cutoff
+        attendance_table = table_source(conn, 'attendance', start_date)
+        source, params = summary_source(class_id, start_date, end_date, attendance_table)
         
         # Get attendance summary
         cur.execute(f'''
@@ -1321,17 +1398,17 @@ def attendance_report():
                 u.name as student_name,
                 c.name as class_name,
                 c.grade_level,
-                COUNT(*) as total_days,
-                SUM(CASE WHEN a.status = 'present' THEN 1 ELSE 0 END) as present_days,
-                SUM(CASE WHEN a.status = 'absent' THEN 1 ELSE 0 END) as absent_days,
-                SUM(CASE WHEN a.status = 'late' THEN 1 ELSE 0 END) as late_days,
-                SUM(CASE WHEN a.status = 'excused' THEN 1 ELSE 0 END) as excused_days,
-                ROUND((SUM(CASE WHEN a.status = 'present' THEN 1 ELSE 0 END) * 100.0 / COUNT(*)), 2) as attendance_percentage
-            FROM attendance a
-            JOIN users u ON a.student_id = u.id
-            JOIN classes c ON a.class_id = c.id
-            WHERE {where_clause}
+                SUM(r.total) as total_days,
+                SUM(r.present) as present_days,
+                SUM(r.absent) as absent_days,
+                SUM(r.late) as late_days,
+                SUM(r.excused) as excused_days,
+                ROUND((SUM(r.present) * 100.0 / SUM(r.total)), 2) as attendance_percentage
+            FROM ({source}) r
+            JOIN users u ON r.student_id = u.id
+            JOIN classes c ON r.class_id = c.id
             GROUP BY u.id, c.id
+            HAVING SUM(r.total) > 0
             ORDER BY c.name, u.name
         ''', params)
         report_data = cur.fetchall()
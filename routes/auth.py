@@ -1,6 +1,8 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 import sqlite3
 import hashlib
+from login_throttle import login_throttle
+from session_store import session_store
 
 auth_bp = Blueprint('auth', __name__)
 DATABASE = 'users.db'
@@ -18,6 +20,13 @@ def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
+        client_ip = request.remote_addr
+        
+        # Shed throttled attempts before touching the database
+        wait_seconds = login_throttle.check(username, client_ip)
+        if wait_seconds:
+            flash(f'Too many login attempts. Please try again in {wait_seconds} seconds.', 'error')
+            return render_template('login.html'), 429
         
         conn = sqlite3.connect(DATABASE)
         cur = conn.cursor()
@@ -27,7 +36,12 @@ def login():
         user = cur.fetchone()
         
         if user and check_password(user[2], password):
-            # Set session
+            login_throttle.record_success(username, client_ip)
+            
+            # Only the session id is trusted; sync_session() fills in the
+            # identity keys from the server-side principal on each request
+            session.clear()
+            session['sid'] = session_store.create(user[0])
             session['user_id'] = user[0]
             session['username'] = user[1]
             session['role'] = user[3]
@@ -45,6 +59,7 @@ def login():
                 flash('Unknown user role!', 'error')
                 return redirect(url_for('auth.login'))
         else:
+            login_throttle.record_failure(username, client_ip)
             flash('Invalid username or password!', 'error')
             conn.close()
     
@@ -52,6 +67,7 @@ def login():
 
 @auth_bp.route('/logout')
 def logout():
+    session_store.delete(session.get('sid'))
     session.clear()
     flash('You have been logged out successfully!', 'success')
     return redirect(url_for('auth.login'))
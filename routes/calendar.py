@@ -0,0 +1,57 @@
+from flask import Blueprint, request, redirect, url_for, flash, session, abort, make_response
+import sqlite3
+import calendar_feed
+import timetable
+
+calendar_bp = Blueprint('calendar', __name__, url_prefix='/calendar')
+
+def get_db():
+    """Get database connection"""
+    return sqlite3.connect('users.db')
+
+@calendar_bp.route('/<token>.ics')
+def feed(token):
+    """iCalendar feed of a teacher's or student's classes (no login, token in URL)"""
+    conn = get_db()
+    cur = conn.cursor()
+
+    try:
+        owner = calendar_feed.find_user(cur, token)
+        if not owner or owner[1] not in ('teacher', 'student'):
+            abort(404)
+        user_id, role = owner
+
+        schedule = timetable.get_timetable(cur)
+        etag = calendar_feed.feed_etag(schedule, user_id)
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+        else:
+            body = calendar_feed.build_feed(schedule, role, user_id, request.host.split(':')[0])
+            response = make_response(body)
+            response.mimetype = 'text/calendar'
+            response.charset = 'utf-8'
+            response.headers['Content-Disposition'] = 'inline; filename="timetable.ics"'
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, max-age=300'
+        return response
+
+    finally:
+        conn.close()
+
+@calendar_bp.route('/reset_token', methods=['POST'])
+def reset_token():
+    """Replace the current user's feed token, cutting off old subscriptions"""
+    if session.get('role') not in ('teacher', 'student'):
+        return redirect(url_for('auth.login'))
+
+    conn = get_db()
+    try:
+        calendar_feed.get_token(conn, session['user_id'], reset=True)
+        flash('Calendar link reset. Subscribe again with the new link.', 'success')
+    finally:
+        conn.close()
+
+    if session['role'] == 'teacher':
+        return redirect(url_for('teacher.schedule'))
+    return redirect(url_for('student.classes'))
@@ -4,6 +4,13 @@ import os
 import uuid
 from datetime import datetime
 from werkzeug.utils import secure_filename
+from session_store import get_current_principal
+from authorization import student_enrolled
+from class_stats import get_class_stats, get_teacher_names
+import announcement_feed
+import student_progress
+import timetable
+import calendar_feed
 
 student_bp = Blueprint('student', __name__, url_prefix='/student')
 
@@ -88,30 +95,30 @@ def classes():
         return redirect(url_for('auth.login'))
     
     student_id = session.get('user_id')
+    principal = get_current_principal()
+    student_name = principal.name if principal else None
     conn = get_db()
     cur = conn.cursor()
     
     try:
-        # Get enrolled classes with teacher information and assignment counts
+        # Get enrolled classes, then attach teachers and assignment counts
         cur.execute('''
-            SELECT DISTINCT
+            SELECT
                 c.id, c.name, c.grade_level, c.subject, c.type, c.description,
-                c.schedule_days, c.schedule_time_start, c.schedule_time_end,
-                u.name as teacher_name,
-                COUNT(a.id) as assignment_count,
-                COUNT(CASE WHEN a.due_date >= datetime('now') THEN 1 END) as pending_assignments
+                c.schedule_days, c.schedule_time_start, c.schedule_time_end
             FROM student_class_map scm
             JOIN classes c ON scm.class_id = c.id
-            LEFT JOIN teacher_class_map tcm ON c.id = tcm.class_id
-            LEFT JOIN users u ON tcm.teacher_id = u.id
-            LEFT JOIN assignments a ON c.id = a.class_id AND a.status = 'active'
             WHERE scm.student_id = ? AND scm.status = 'active'
-            GROUP BY c.id, c.name, c.grade_level, c.subject, u.name
             ORDER BY c.grade_level, c.name
         ''', (student_id,))
+        class_rows = cur.fetchall()
+        
+        class_ids = [row[0] for row in class_rows]
+        stats = get_class_stats(cur, class_ids)
+        teacher_names = get_teacher_names(cur, class_ids)
         
         classes_data = []
-        for row in cur.fetchall():
+        for row in class_rows:
             classes_data.append({
                 'id': row[0],
                 'name': row[1],
@@ -119,25 +126,30 @@ def classes():
                 'subject': row[3],
                 'type': row[4] or 'Regular',
                 'description': row[5] or 'No description available',
-                'schedule_days': row[6] or 'TBA',
+                'schedule_days': timetable.format_days(row[6]) or 'TBA',
                 'schedule_time_start': row[7] or '',
                 'schedule_time_end': row[8] or '',
-                'teacher_name': row[9] or 'TBA',
-                'assignment_count': row[10],
-                'pending_assignments': row[11]
+                'teacher_name': teacher_names.get(row[0]) or 'TBA',
+                'assignment_count': stats[row[0]]['active_assignments'],
+                'pending_assignments': stats[row[0]]['pending_assignments']
             })
         
+        week = timetable.week_view(cur, 'student', student_id)
+        calendar_url = url_for('calendar.feed', token=calendar_feed.get_token(conn, student_id), _external=True)
+        
         conn.close()
         return render_template('student/student_classes.html', 
                              student_classes=classes_data,
-                             student_name=session.get('name'))
+                             student_name=student_name,
+                             week=week,
+                             calendar_url=calendar_url)
     
     except Exception as e:
         conn.close()
         flash(f'Error loading classes: {str(e)}', 'error')
         return render_template('student/student_classes.html', 
                              student_classes=[],
-                             student_name=session.get('name'))
+                             student_name=student_name)
 
 @student_bp.route('/homework')
 def homework():
@@ -292,35 +304,18 @@ def announcements():
     cur = conn.cursor()
     
     try:
-        # Get announcements for student's enrolled classes
-        cur.execute('''
-            SELECT DISTINCT
-                a.id, a.title, a.content, a.created_at, a.priority,
-                u.name as teacher_name, c.name as class_name
-            FROM announcements a
-            JOIN users u ON a.teacher_id = u.id
-            LEFT JOIN classes c ON a.class_id = c.id
-            LEFT JOIN student_class_map scm ON c.id = scm.class_id
-            WHERE a.is_active = 1 
-            AND (a.class_id IS NULL OR scm.student_id = ?)
-            ORDER BY a.created_at DESC
-            LIMIT 50
-        ''', (student_id,))
+        # Merge the class feeds of the student's cached enrolments with the global feed
+        principal = get_current_principal()
+        class_ids = principal.class_ids if principal else []
+        announcements_data = announcement_feed.latest_for_student(cur, class_ids)
         
-        announcements_data = []
-        for row in cur.fetchall():
-            announcements_data.append({
-                'id': row[0],
-                'title': row[1],
-                'content': row[2],
-                'created_at': row[3],
-                'priority': row[4] or 'normal',
-                'teacher_name': row[5],
-                'class_name': row[6] or 'All Students'
-            })
+        # Highlight what is new since the last visit, then mark it read
+        new_ids = announcement_feed.unread_ids(cur, student_id, announcements_data)
+        announcement_feed.mark_read(conn, student_id, class_ids)
         
         return render_template('student/student_announcements.html', 
-                             announcements=announcements_data)
+                             announcements=announcements_data,
+                             new_ids=new_ids)
     
     except Exception as e:
         flash(f'Error loading announcements: {str(e)}', 'error')
@@ -329,6 +324,45 @@ def announcements():
     finally:
         conn.close()
 
+@student_bp.route('/progress')
+def progress():
+    """Marks and running percentage in each enrolled class"""
+    if 'role' not in session or session['role'] != 'student':
+        return redirect(url_for('auth.login'))
+    
+    student_id = session.get('user_id')
+    conn = get_db()
+    cur = conn.cursor()
+    
+    try:
+        cur.execute('''
+            SELECT c.id, c.name, c.subject
+            FROM student_class_map scm
+            JOIN classes c ON scm.class_id = c.id
+            WHERE scm.student_id = ? AND scm.status = 'active'
+            ORDER BY c.name
+        ''', (student_id,))
+        
+        classes_progress = []
+        for class_id, name, subject in cur.fetchall():
+            history = student_progress.get_history(cur, student_id, class_id)
+            classes_progress.append({
+                'id': class_id,
+                'name': name,
+                'subject': subject,
+                'marked_items': [item for item in history['items'] if item['marks_obtained'] is not None],
+                'summary': history['summary'],
+                'sparkline': history['sparkline']
+            })
+        
+        return render_template('student/student_progress.html', classes_progress=classes_progress)
+    
+    except Exception as e:
+        flash(f'Error loading progress: {str(e)}', 'error')
+        return render_template('student/student_progress.html', classes_progress=[])
+    finally:
+        conn.close()
+
 @student_bp.route('/doubts', methods=['GET', 'POST'])
 def doubts():
     """Ask doubts/questions"""
@@ -396,6 +430,7 @@ def doubts():
     return render_template('student/student_doubts.html', doubts=doubts_data)
 
 @student_bp.route('/download_assignment/<int:assignment_id>')
+@student_enrolled()
 def download_assignment(assignment_id):
     """Download assignment file"""
     if 'role' not in session or session['role'] != 'student':
@@ -406,7 +441,8 @@ def download_assignment(assignment_id):
     cur = conn.cursor()
     
     try:
-        # Verify student has access to this assignment through their classes
+        # @student_enrolled answers from the cached access set; the mapping
+        # is checked again here so a removed enrolment applies at once
         cur.execute('''
             SELECT a.file_path, a.original_filename, a.title, c.name as class_name
             FROM assignments a
@@ -452,6 +488,7 @@ def download_assignment(assignment_id):
         conn.close()
 
 @student_bp.route('/upload_submission', methods=['POST'])
+@student_enrolled(as_json=True)
 def upload_submission():
     """Handle student assignment submission upload"""
     if 'role' not in session or session['role'] != 'student':
@@ -480,7 +517,7 @@ def upload_submission():
         if file_ext not in ALLOWED_EXTENSIONS:
             return jsonify({'success': False, 'message': f'Invalid file type. Allowed: {", ".join(ALLOWED_EXTENSIONS)}'}), 400
         
-        # Verify student has access to this assignment
+        # The cached access set may lag behind an enrolment change
         conn = get_db()
         cur = conn.cursor()
         
@@ -541,13 +578,13 @@ def dashboard():
         return redirect(url_for('auth.login'))
     
     student_id = session.get('user_id')
+    principal = get_current_principal()
     conn = get_db()
     cur = conn.cursor()
     
     try:
-        # Get student's classes count
-        cur.execute('SELECT COUNT(*) FROM student_class_map WHERE student_id = ?', (student_id,))
-        enrolled_classes_count = cur.fetchone()[0]
+        # Enrolled classes come from the cached principal
+        enrolled_classes_count = len(principal.class_ids) if principal else 0
         
         # Get pending assignments count
         cur.execute('''
@@ -557,9 +594,9 @@ def dashboard():
         ''', (student_id,))
         pending_assignments = cur.fetchone()[0]
         
-        # Get announcements count
-        cur.execute('SELECT COUNT(*) FROM announcements WHERE is_active = 1')
-        announcements_count = cur.fetchone()[0]
+        # Get announcements visible to this student and how many are unread
+        announcements_count, unread_announcements = announcement_feed.counts_for_student(
+            cur, student_id, principal.class_ids if principal else [])
         
         # Get notifications
         notifications = get_notifications(student_id, 'student')
@@ -568,6 +605,7 @@ def dashboard():
             'enrolled_classes': enrolled_classes_count,
             'pending_assignments': pending_assignments,
             'announcements_count': announcements_count,
+            'unread_announcements': unread_announcements,
             'total_subjects': 0
         }
         
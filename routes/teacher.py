@@ -1,9 +1,22 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, send_file, send_from_directory
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
 import uuid
 from werkzeug.utils import secure_filename
+from session_store import get_current_principal
+from class_stats import get_class_stats
+from attendance_rollups import summary_source
+from term_archive import archive_cutoff, assignment_archived, table_source
+from grading import letter_grade
+from weighted_grades import compute_class_grades, set_category_weights, invalidate as invalidate_grades
+from authorization import teacher_owns_class, can_access_class, can_access_assignment, invalidate_class_members
+from marks_batch import save_batch, get_item
+from gradebook_cells import save_cell
+import student_progress
+import at_risk
+import timetable
+import calendar_feed
 
 teacher_bp = Blueprint('teacher', __name__, url_prefix='/teacher')
 
@@ -44,13 +57,13 @@ def dashboard():
         return redirect(url_for('auth.login'))
     
     teacher_id = session.get('user_id')
+    principal = get_current_principal()
     conn = get_db()
     cur = conn.cursor()
     
     try:
-        # Get assigned classes count
-        cur.execute('SELECT COUNT(*) FROM teacher_class_map WHERE teacher_id = ?', (teacher_id,))
-        assigned_classes_count = cur.fetchone()[0]
+        # Assigned classes come from the cached principal
+        assigned_classes_count = len(principal.class_ids) if principal else 0
         
         # Get pending doubts count
         cur.execute('SELECT COUNT(*) FROM doubts WHERE status = "open"')
@@ -89,6 +102,9 @@ def dashboard():
                 'end_time': row[3]
             })
         
+        # Students in the teacher's classes flagged by the nightly at-risk job
+        at_risk_students = at_risk.get_flagged(cur, principal.class_ids if principal else [])
+        
         stats = {
             'assigned_classes': assigned_classes_count,
             'pending_doubts': pending_doubts_count,
@@ -100,7 +116,8 @@ def dashboard():
                              stats=stats,
                              todays_schedule=todays_schedule,
                              recent_notifications=[],
-                             notifications=notifications)
+                             notifications=notifications,
+                             at_risk_students=at_risk_students)
     
     except Exception as e:
         flash(f'Error loading dashboard: {str(e)}', 'error')
@@ -108,7 +125,8 @@ def dashboard():
                              stats={'assigned_classes': 0, 'pending_doubts': 0, 'submissions_to_grade': 0, 'total_students': 0},
                              todays_schedule=[],
                              recent_notifications=[],
-                             notifications=[])
+                             notifications=[],
+                             at_risk_students=[])
     finally:
         conn.close()
 
@@ -126,21 +144,17 @@ def schedule():
         # Get teacher's assigned classes using JOIN with teacher_class_map (same logic as my_classes)
         cur.execute('''
             SELECT c.id, c.name, c.subject, c.grade_level, c.description, c.section,
-                   c.schedule_days, c.schedule_time_start, c.schedule_time_end, c.max_students,
-                   COUNT(DISTINCT scm.student_id) as student_count,
-                   COUNT(DISTINCT a.id) as assignment_count
+                   c.schedule_days, c.schedule_time_start, c.schedule_time_end, c.max_students
             FROM classes c
             JOIN teacher_class_map tcm ON c.id = tcm.class_id
-            LEFT JOIN student_class_map scm ON c.id = scm.class_id
-            LEFT JOIN assignments a ON c.id = a.class_id
             WHERE tcm.teacher_id = ?
-            GROUP BY c.id, c.name, c.subject, c.grade_level, c.description, c.section,
-                     c.schedule_days, c.schedule_time_start, c.schedule_time_end, c.max_students
             ORDER BY c.name
         ''', (teacher_id,))
+        class_rows = cur.fetchall()
+        counts = get_class_stats(cur, [row[0] for row in class_rows])
         
         all_classes = []
-        for row in cur.fetchall():
+        for row in class_rows:
             class_data = {
                 'id': row[0],
                 'name': row[1],
@@ -148,12 +162,12 @@ def schedule():
                 'grade_level': row[3],
                 'description': row[4],
                 'section': row[5],
-                'schedule_days': row[6],
+                'schedule_days': timetable.format_days(row[6]),
                 'schedule_time_start': row[7],
                 'schedule_time_end': row[8],
                 'max_students': row[9] or 0,
-                'student_count': row[10] or 0,
-                'assignment_count': row[11] or 0
+                'student_count': counts[row[0]]['student_count'],
+                'assignment_count': counts[row[0]]['assignment_count']
             }
             all_classes.append(class_data)
         
@@ -179,10 +193,15 @@ def schedule():
             'total_students': total_students
         }
         
+        week = timetable.week_view(cur, 'teacher', teacher_id)
+        calendar_url = url_for('calendar.feed', token=calendar_feed.get_token(conn, teacher_id), _external=True)
+        
         return render_template('teacher/schedule.html', 
                              stats=stats,
                              classes_with_schedules=classes_with_schedules,
-                             classes_without_schedules=classes_without_schedules)
+                             classes_without_schedules=classes_without_schedules,
+                             week=week,
+                             calendar_url=calendar_url)
         
     except Exception as e:
         flash(f"Error loading schedule: {str(e)}", 'error')
@@ -231,20 +250,21 @@ def homework():
         ''', (teacher_id,))
         teacher_subjects = cur.fetchall()
         
-        # Get assignments
+        # Get assignments (class sizes come from the maintained class_stats rows)
         cur.execute('''
             SELECT a.id, a.teacher_id, a.class_id, a.title, a.description, a.assignment_type,
                    a.due_date, a.points, a.file_path, a.original_filename, a.allow_late_submission, 
                    a.created_at, a.status, c.name as class_name,
                    COUNT(s.id) as submission_count,
-                   (SELECT COUNT(*) FROM student_class_map WHERE class_id = a.class_id) as total_students
+                   cs.student_count as total_students
             FROM assignments a
             JOIN classes c ON a.class_id = c.id
+            LEFT JOIN class_stats cs ON cs.class_id = a.class_id
             LEFT JOIN submissions s ON a.id = s.assignment_id
             WHERE a.teacher_id = ?
             GROUP BY a.id, a.teacher_id, a.class_id, a.title, a.description, a.assignment_type,
                      a.due_date, a.points, a.file_path, a.original_filename, a.allow_late_submission,
-                     a.created_at, a.status, c.name
+                     a.created_at, a.status, c.name, cs.student_count
             ORDER BY a.created_at DESC
         ''', (teacher_id,))
         
@@ -430,21 +450,17 @@ def my_classes():
         # Get teacher's assigned classes using JOIN with teacher_class_map
         cur.execute('''
             SELECT c.id, c.name, c.subject, c.grade_level, c.description, c.section,
-                   c.schedule_days, c.schedule_time_start, c.schedule_time_end, c.max_students,
-                   COUNT(DISTINCT scm.student_id) as student_count,
-                   COUNT(DISTINCT a.id) as assignment_count
+                   c.schedule_days, c.schedule_time_start, c.schedule_time_end, c.max_students
             FROM classes c
             JOIN teacher_class_map tcm ON c.id = tcm.class_id
-            LEFT JOIN student_class_map scm ON c.id = scm.class_id
-            LEFT JOIN assignments a ON c.id = a.class_id
             WHERE tcm.teacher_id = ?
-            GROUP BY c.id, c.name, c.subject, c.grade_level, c.description, c.section,
-                     c.schedule_days, c.schedule_time_start, c.schedule_time_end, c.max_students
             ORDER BY c.name
         ''', (teacher_id,))
+        class_rows = cur.fetchall()
+        counts = get_class_stats(cur, [row[0] for row in class_rows])
         
         classes = []
-        for row in cur.fetchall():
+        for row in class_rows:
             classes.append({
                 'id': row[0],
                 'name': row[1],
@@ -452,12 +468,12 @@ def my_classes():
                 'grade_level': row[3],
                 'description': row[4],
                 'section': row[5],
-                'schedule_days': row[6],
+                'schedule_days': timetable.format_days(row[6]),
                 'schedule_time_start': row[7],
                 'schedule_time_end': row[8],
                 'max_students': row[9] or 0,
-                'student_count': row[10] or 0,
-                'assignment_count': row[11] or 0
+                'student_count': counts[row[0]]['student_count'],
+                'assignment_count': counts[row[0]]['assignment_count']
             })
         
     except Exception as e:
@@ -469,6 +485,7 @@ def my_classes():
     return render_template('teacher/my_classes.html', classes=classes)
 
 @teacher_bp.route('/upload_assignment', methods=['POST'])
+@teacher_owns_class(as_json=True, required=True)
 def upload_assignment():
     """Upload a new assignment"""
     if 'role' not in session or session['role'] != 'teacher':
@@ -534,6 +551,10 @@ def upload_assignment():
         assignment_id = cur.lastrowid
         conn.close()
         
+        # The new assignment must show up in everyone's access set
+        invalidate_class_members(class_id)
+        student_progress.invalidate(class_id=class_id)
+        
         message = f'Assignment "{title}" uploaded successfully!'
         if file_path:
             message += f' File "{original_filename}" attached.'
@@ -635,6 +656,7 @@ def marks_roster():
     
     teacher_id = session.get('user_id')
     view_type = request.args.get('view', 'marks')  # 'marks' or 'reports'
+    edit_mode = request.args.get('mode') == 'edit'  # editable gradebook cells
     conn = get_db()
     cur = conn.cursor()
     
@@ -660,18 +682,19 @@ def marks_roster():
     selected_class_id = request.args.get('class_id', type=int)
     assignments = []
     students_data = []
+    category_weights = {}
     
     if not selected_class_id and classes:
         selected_class_id = classes[0]['id']
     
     if selected_class_id:
-        # Get assignments for the selected class
+        # Get assignments for the selected class; marks of archived terms are read-only
         cur.execute('''
-            SELECT id, title, points, assignment_type, due_date
+            SELECT id, title, points, assignment_type, due_date, due_date < ?
             FROM assignments
             WHERE class_id = ? AND teacher_id = ?
             ORDER BY due_date DESC
-        ''', (selected_class_id, teacher_id))
+        ''', (archive_cutoff(conn), selected_class_id, teacher_id))
         
         for row in cur.fetchall():
             assignments.append({
@@ -679,9 +702,26 @@ def marks_roster():
                 'title': row[1],
                 'total_marks': row[2] or 100,  # Use points as total_marks
                 'type': row[3],
-                'due_date': row[4]
+                'due_date': row[4],
+                'archived': bool(row[5])
             })
         
+        # All marks for these assignments in one query
+        marks_by_cell = {}
+        if assignments:
+            placeholders = ','.join('?' * len(assignments))
+            cur.execute(f'''
+                SELECT student_id, assignment_id, marks_obtained, total_marks, grade, remarks, version
+                FROM student_marks
+                WHERE assignment_id IN ({placeholders})
+            ''', [assignment['id'] for assignment in assignments])
+            for row in cur.fetchall():
+                marks_by_cell[(row[0], row[1])] = row[2:]
+        
+        # Weighted averages across all assignments and assessments of the class
+        weighted = compute_class_grades(cur, selected_class_id)
+        category_weights = weighted['categories']
+        
         # Get students in the selected class with their marks
         cur.execute('''
             SELECT DISTINCT u.id, u.name, u.username
@@ -693,6 +733,7 @@ def marks_roster():
         
         for student_row in cur.fetchall():
             student_id = student_row[0]
+            student_weighted = weighted['students'].get(student_id, {})
             student_data = {
                 'id': student_id,
                 'name': student_row[1],
@@ -701,24 +742,22 @@ def marks_roster():
                 'total_obtained': 0,
                 'total_possible': 0,
                 'percentage': 0,
-                'grade': 'N/A'
+                'grade': 'N/A',
+                'weighted_percentage': student_weighted.get('weighted_percentage'),
+                'weighted_grade': student_weighted.get('weighted_grade', 'N/A'),
+                'category_scores': student_weighted.get('categories', {})
             }
             
             # Get marks for each assignment
             for assignment in assignments:
-                cur.execute('''
-                    SELECT marks_obtained, total_marks, grade, remarks
-                    FROM student_marks
-                    WHERE student_id = ? AND assignment_id = ?
-                ''', (student_id, assignment['id']))
-                
-                mark_row = cur.fetchone()
+                mark_row = marks_by_cell.get((student_id, assignment['id']))
                 if mark_row:
                     student_data['marks'][assignment['id']] = {
                         'obtained': mark_row[0],
                         'total': mark_row[1],
                         'grade': mark_row[2],
-                        'remarks': mark_row[3]
+                        'remarks': mark_row[3],
+                        'version': mark_row[4]
                     }
                     student_data['total_obtained'] += mark_row[0] or 0
                 else:
@@ -726,7 +765,8 @@ def marks_roster():
                         'obtained': None,
                         'total': assignment['total_marks'],
                         'grade': None,
-                        'remarks': None
+                        'remarks': None,
+                        'version': 0
                     }
                 
                 student_data['total_possible'] += assignment['total_marks']
@@ -734,7 +774,7 @@ def marks_roster():
             # Calculate overall percentage and grade
             if student_data['total_possible'] > 0:
                 student_data['percentage'] = round((student_data['total_obtained'] / student_data['total_possible']) * 100, 2)
-                student_data['grade'] = calculate_grade(student_data['percentage'])
+                student_data['grade'] = letter_grade(student_data['percentage'])
             
             students_data.append(student_data)
     
@@ -746,31 +786,17 @@ def marks_roster():
                              selected_class_id=selected_class_id,
                              assignments=assignments,
                              students_data=students_data,
-                             view_type=view_type)
+                             view_type=view_type,
+                             category_weights=category_weights)
     else:
         return render_template('teacher/marks_roster.html',
                              classes=classes,
                              selected_class_id=selected_class_id,
                              assignments=assignments,
                              students_data=students_data,
-                             view_type=view_type)
-
-def calculate_grade(percentage):
-    """Calculate letter grade based on percentage"""
-    if percentage >= 90:
-        return 'A+'
-    elif percentage >= 80:
-        return 'A'
-    elif percentage >= 70:
-        return 'B+'
-    elif percentage >= 60:
-        return 'B'
-    elif percentage >= 50:
-        return 'C'
-    elif percentage >= 40:
-        return 'D'
-    else:
-        return 'F'
+                             view_type=view_type,
+                             edit_mode=edit_mode,
+                             category_weights=category_weights)
 
 @teacher_bp.route('/my_announcements', methods=['GET', 'POST'])
 def my_announcements():
@@ -877,6 +903,7 @@ def my_announcements():
         conn.close()
 
 @teacher_bp.route('/my_attendance')
+@teacher_owns_class(redirect_to='teacher.my_attendance')
 def my_attendance():
     """Teacher attendance reports page"""
     if 'role' not in session or session['role'] != 'teacher':
@@ -904,86 +931,81 @@ def my_attendance():
         attendance_summary = {}
         
         if selected_class_id:
-            # Verify teacher has access to this class
-            class_ids = [cls[0] for cls in teacher_classes]
-            if selected_class_id in class_ids:
-                # Get class details
-                selected_class = next((cls for cls in teacher_classes if cls[0] == selected_class_id), None)
-                
-                # Get date filters
-                start_date = request.args.get('start_date', '')
-                end_date = request.args.get('end_date', '')
-                status_filter = request.args.get('status', '')
-                
-                # Build attendance query
-                attendance_query = '''
-                    SELECT 
-                        a.id,
-                        a.attendance_date,
-                        a.status,
-                        a.notes,
-                        u.name as student_name,
-                        u.id as student_id
-                    FROM attendance a
-                    JOIN users u ON a.student_id = u.id
-                    WHERE a.class_id = ? AND a.marked_by = ?
-                '''
-                params = [selected_class_id, teacher_id]
-                
-                if start_date:
-                    attendance_query += ' AND a.attendance_date >= ?'
-                    params.append(start_date)
-                
-                if end_date:
-                    attendance_query += ' AND a.attendance_date <= ?'
-                    params.append(end_date)
-                
-                if status_filter:
-                    attendance_query += ' AND a.status = ?'
-                    params.append(status_filter)
-                
-                attendance_query += ' ORDER BY a.attendance_date DESC, u.first_name, u.last_name'
-                
-                cur.execute(attendance_query, params)
-                attendance_records = cur.fetchall()
-                
-                # Organize data by date for better display
-                attendance_by_date = {}
-                for record in attendance_records:
-                    date = record[1]
-                    if date not in attendance_by_date:
-                        attendance_by_date[date] = []
-                    attendance_by_date[date].append({
-                        'id': record[0],
-                        'student_name': record[4],
-                        'student_id': record[5],
-                        'status': record[2],
-                        'notes': record[3] or ''
+            # Access was verified by @teacher_owns_class
+            selected_class = next((cls for cls in teacher_classes if cls[0] == selected_class_id), None)
+            
+            # Get date filters
+            start_date = request.args.get('start_date', '')
+            end_date = request.args.get('end_date', '')
+            status_filter = request.args.get('status', '')
+            
+            # Records are read per class whoever marked them, through the
+            # (class_id, attendance_date, status, student_id) covering index
+            conditions = ['a.class_id = ?']
+            params = [selected_class_id]
+            
+            if start_date:
+                conditions.append('a.attendance_date >= ?')
+                params.append(start_date)
+            
+            if end_date:
+                conditions.append('a.attendance_date <= ?')
+                params.append(end_date)
+            
+            if status_filter:
+                conditions.append('a.status = ?')
+                params.append(status_filter)
+            
+            # Rows come back grouped by date with each day's counts attached
+            cur.execute(f'''
+                SELECT 
+                    a.id,
+                    a.attendance_date,
+                    a.status,
+                    a.notes,
+                    u.name as student_name,
+                    u.id as student_id,
+                    COUNT(*) OVER day as day_total,
+                    SUM(a.status = 'present') OVER day as day_present
+                FROM {table_source(conn, 'attendance', start_date)} a
+                JOIN users u ON a.student_id = u.id
+                WHERE {' AND '.join(conditions)}
+                WINDOW day AS (PARTITION BY a.attendance_date)
+                ORDER BY a.attendance_date DESC, u.name
+            ''', params)
+            
+            for record in cur.fetchall():
+                if not attendance_data or attendance_data[-1]['date'] != record[1]:
+                    attendance_data.append({
+                        'date': record[1],
+                        'total': record[6],
+                        'present': record[7],
+                        'records': []
                     })
-                
-                attendance_data = attendance_by_date
-                
-                # Calculate attendance summary
-                cur.execute('''
-                    SELECT 
-                        status,
-                        COUNT(*) as count
-                    FROM attendance
-                    WHERE class_id = ? AND marked_by = ?
-                    GROUP BY status
-                ''', (selected_class_id, teacher_id))
-                
-                status_counts = dict(cur.fetchall())
-                total_records = sum(status_counts.values())
-                
-                attendance_summary = {
-                    'total_records': total_records,
-                    'present': status_counts.get('present', 0),
-                    'absent': status_counts.get('absent', 0),
-                    'late': status_counts.get('late', 0),
-                    'excused': status_counts.get('excused', 0),
-                    'present_percentage': round((status_counts.get('present', 0) / total_records * 100), 1) if total_records > 0 else 0
-                }
+                attendance_data[-1]['records'].append({
+                    'id': record[0],
+                    'student_name': record[4],
+                    'student_id': record[5],
+                    'status': record[2],
+                    'notes': record[3] or ''
+                })
+            
+            # Class-wide summary from the monthly rollups
+            source, params = summary_source(selected_class_id)
+            cur.execute(f'''
+                SELECT SUM(total), SUM(present), SUM(absent), SUM(late), SUM(excused)
+                FROM ({source})
+            ''', params)
+            total_records, present, absent, late, excused = [value or 0 for value in cur.fetchone()]
+            
+            attendance_summary = {
+                'total_records': total_records,
+                'present': present,
+                'absent': absent,
+                'late': late,
+                'excused': excused,
+                'present_percentage': round((present / total_records * 100), 1) if total_records > 0 else 0
+            }
         
         conn.close()
         
@@ -1005,6 +1027,53 @@ def my_attendance():
         conn.close()
         return render_template('teacher/my_attendance.html', teacher_classes=[], error=str(e))
 
+@teacher_bp.route('/attendance_heatmap')
+@teacher_owns_class(as_json=True, required=True)
+def attendance_heatmap():
+    """Per-day attendance summary for a class calendar heatmap"""
+    class_id = request.args.get('class_id', type=int)
+    try:
+        end = datetime.strptime(request.args.get('end_date') or datetime.now().strftime('%Y-%m-%d'), '%Y-%m-%d')
+        start = (datetime.strptime(request.args['start_date'], '%Y-%m-%d') if request.args.get('start_date')
+                 else end - timedelta(days=364))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Dates must be in YYYY-MM-DD format'}), 400
+    start_date = start.strftime('%Y-%m-%d')
+    end_date = end.strftime('%Y-%m-%d')
+
+    conn = get_db()
+    cur = conn.cursor()
+    
+    try:
+        # Answered from the covering index alone
+        cur.execute(f'''
+            SELECT attendance_date,
+                   COUNT(*),
+                   SUM(status = 'present'),
+                   SUM(status = 'absent'),
+                   SUM(status = 'late'),
+                   SUM(status = 'excused')
+            FROM {table_source(conn, 'attendance', start_date)}
+            WHERE class_id = ? AND attendance_date >= ? AND attendance_date <= ?
+            GROUP BY attendance_date
+            ORDER BY attendance_date
+        ''', (class_id, start_date, end_date))
+        
+        # Compact rows: [date, total, present, absent, late, excused]
+        days = [list(row) for row in cur.fetchall()]
+        return jsonify({
+            'success': True,
+            'start_date': start_date,
+            'end_date': end_date,
+            'columns': ['date', 'total', 'present', 'absent', 'late', 'excused'],
+            'days': days
+        })
+    
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+    finally:
+        conn.close()
+
 @teacher_bp.route('/edit_assignment', methods=['POST'])
 def edit_assignment():
     """Edit assignment details"""
@@ -1021,15 +1090,13 @@ def edit_assignment():
         if not assignment_id or not title:
             return jsonify({'success': False, 'message': 'Missing required fields'})
         
-        conn = get_db()
-        cur = conn.cursor()
-        
         # Verify assignment belongs to teacher
-        cur.execute('SELECT id FROM assignments WHERE id = ? AND teacher_id = ?', 
-                   (assignment_id, teacher_id))
-        if not cur.fetchone():
+        if not can_access_assignment(assignment_id):
             return jsonify({'success': False, 'message': 'Assignment not found'})
         
+        conn = get_db()
+        cur = conn.cursor()
+        
         # Update assignment
         cur.execute('''UPDATE assignments 
                       SET title = ?, description = ?, due_date = ? 
@@ -1037,7 +1104,11 @@ def edit_assignment():
                    (title, description, due_date, assignment_id, teacher_id))
         
         conn.commit()
+        cur.execute('SELECT class_id FROM assignments WHERE id = ?', (assignment_id,))
+        updated = cur.fetchone()
         conn.close()
+        if updated:
+            student_progress.invalidate(class_id=updated[0])
         
         return jsonify({'success': True, 'message': 'Assignment updated successfully'})
         
@@ -1055,22 +1126,22 @@ def download_submission(submission_id):
     cur = conn.cursor()
     
     try:
-        # Verify teacher has access to this submission
         cur.execute('''
-            SELECT s.file_path, s.original_filename, a.title, u.name as student_name
+            SELECT s.file_path, s.original_filename, a.title, u.name as student_name, s.assignment_id
             FROM submissions s
             JOIN assignments a ON s.assignment_id = a.id
             JOIN users u ON s.student_id = u.id
-            WHERE s.id = ? AND a.teacher_id = ?
-        ''', (submission_id, teacher_id))
+            WHERE s.id = ?
+        ''', (submission_id,))
         
         result = cur.fetchone()
         
-        if not result:
+        # Verify teacher has access to this submission
+        if not result or not can_access_assignment(result[4]):
             flash('Submission not found or access denied', 'error')
             return redirect(url_for('teacher.submissions'))
         
-        file_path, original_filename, assignment_title, student_name = result
+        file_path, original_filename, assignment_title, student_name, _ = result
         
         if not file_path or not original_filename:
             flash('No file attached to this submission', 'warning')
@@ -1201,6 +1272,7 @@ def create_assessment():
     return redirect(url_for('teacher.marks_roster'))
 
 @teacher_bp.route('/save_marks', methods=['POST'])
+@teacher_owns_class(required=True)
 def save_marks():
     """Save student marks"""
     if 'role' not in session or session['role'] != 'teacher':
@@ -1227,6 +1299,11 @@ def save_marks():
         conn.close()
         return redirect(url_for('teacher.marks_roster'))
     
+    if assignment_archived(conn, assignment_id):
+        flash('Marks of archived terms are read-only', 'error')
+        conn.close()
+        return redirect(url_for('teacher.marks_roster'))
+    
     total_marks = assignment[0] or 100
     marks_saved = 0
     
@@ -1248,7 +1325,7 @@ def save_marks():
                     
                     # Calculate percentage and grade
                     percentage = (marks_obtained / total_marks) * 100
-                    grade = calculate_grade(percentage)
+                    grade = letter_grade(percentage)
                     
                     # Check if marks already exist for this student and assignment
                     cur.execute('''
@@ -1280,6 +1357,7 @@ def save_marks():
                     marks_saved += 1
         
         conn.commit()
+        student_progress.invalidate(class_id=class_id)
         flash(f'Successfully saved marks for {marks_saved} students', 'success')
         
     except Exception as e:
@@ -1291,6 +1369,7 @@ def save_marks():
     return redirect(url_for('teacher.marks_roster', class_id=class_id))
 
 @teacher_bp.route('/generate_report/<int:class_id>')
+@teacher_owns_class()
 def generate_report(class_id):
     """Generate class report"""
     if 'role' not in session or session['role'] != 'teacher':
@@ -1300,27 +1379,26 @@ def generate_report(class_id):
     conn = get_db()
     cur = conn.cursor()
     
-    # Verify teacher has access to this class
-    cur.execute('''
-        SELECT c.name, c.subject, c.grade_level
-        FROM classes c
-        JOIN teacher_class_map tcm ON c.id = tcm.class_id
-        WHERE c.id = ? AND tcm.teacher_id = ?
-    ''', (class_id, teacher_id))
+    # Access was verified by @teacher_owns_class
+    cur.execute('SELECT name, subject, grade_level FROM classes WHERE id = ?', (class_id,))
     
     class_info = cur.fetchone()
     if not class_info:
-        flash('Class not found or unauthorized access', 'error')
+        flash('Class not found', 'error')
         conn.close()
         return redirect(url_for('teacher.marks_roster'))
     
+    # Weighted averages across all assignments and assessments of the class
+    weighted = compute_class_grades(cur, class_id)
+    
     # Get comprehensive report data
     cur.execute('''
         SELECT u.name, u.username, 
                AVG(sm.percentage) as avg_percentage,
                COUNT(sm.id) as total_assessments,
                MIN(sm.percentage) as min_percentage,
-               MAX(sm.percentage) as max_percentage
+               MAX(sm.percentage) as max_percentage,
+               u.id
         FROM users u
         JOIN student_class_map scm ON u.id = scm.student_id
         LEFT JOIN student_marks sm ON u.id = sm.student_id AND sm.class_id = ?
@@ -1330,18 +1408,27 @@ def generate_report(class_id):
     ''', (class_id, class_id))
     
     students_report = []
-    for i, row in enumerate(cur.fetchall()):
+    for row in cur.fetchall():
+        student_weighted = weighted['students'].get(row[6], {})
         students_report.append({
-            'rank': i + 1,
             'name': row[0],
             'username': row[1],
             'avg_percentage': round(row[2] or 0, 2),
-            'grade': calculate_grade(row[2] or 0),
+            'grade': letter_grade(row[2] or 0),
             'total_assessments': row[3],
             'min_percentage': round(row[4] or 0, 2),
-            'max_percentage': round(row[5] or 0, 2)
+            'max_percentage': round(row[5] or 0, 2),
+            'weighted_percentage': student_weighted.get('weighted_percentage'),
+            'weighted_grade': student_weighted.get('weighted_grade', 'N/A'),
+            'category_scores': student_weighted.get('categories', {})
         })
     
+    # Rank by the weighted average; unmarked students go last
+    students_report.sort(key=lambda student: (student['weighted_percentage'] is None,
+                                              -(student['weighted_percentage'] or 0)))
+    for i, student in enumerate(students_report):
+        student['rank'] = i + 1
+    
     # Get assignment statistics
     cur.execute('''
         SELECT a.title, a.points, 
@@ -1375,8 +1462,98 @@ def generate_report(class_id):
                          class_info={'name': class_info[0], 'subject': class_info[1], 'grade': class_info[2]},
                          students_report=students_report,
                          assignment_stats=assignment_stats,
+                         category_weights=weighted['categories'],
                          class_id=class_id)
 
+@teacher_bp.route('/grade_weights', methods=['POST'])
+@teacher_owns_class(as_json=True, required=True)
+def save_grade_weights():
+    """Save the category weights used for a class's weighted grades"""
+    class_id = request.form.get('class_id', type=int)
+    
+    weights = {}
+    for key, value in request.form.items():
+        if not key.startswith('weight_') or not value.strip():
+            continue
+        try:
+            weight = float(value)
+        except ValueError:
+            return jsonify({'success': False, 'message': f'Invalid weight for {key[7:]}'}), 400
+        if weight < 0:
+            return jsonify({'success': False, 'message': 'Weights cannot be negative'}), 400
+        weights[key[7:]] = weight
+    
+    conn = get_db()
+    try:
+        set_category_weights(conn, class_id, weights)
+        conn.commit()
+        return jsonify({'success': True, 'message': 'Grade weights saved', 'weights': weights})
+    except Exception as e:
+        conn.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 500
+    finally:
+        conn.close()
+
+@teacher_bp.route('/gradebook/cell', methods=['POST'])
+@teacher_owns_class(as_json=True, required=True)
+def save_gradebook_cell():
+    """Save one edited gradebook cell and return the student's new row totals"""
+    data = request.get_json(silent=True) or {}
+    assignment_id = data.get('assignment_id')
+    
+    if not can_access_assignment(assignment_id):
+        return jsonify({'success': False, 'message': 'Assignment not found or unauthorized access'}), 403
+    
+    conn = get_db()
+    try:
+        status, body = save_cell(conn, session['user_id'], int(assignment_id),
+                                 data.get('student_id'), data.get('value'), data.get('version'))
+        return jsonify(body), status
+    except sqlite3.Error as e:
+        return jsonify({'success': False, 'message': f'Error saving mark: {e}'}), 500
+    finally:
+        conn.close()
+
+def _save_marks_batch(kind, item_id):
+    """Shared body of the JSON batch marks endpoints"""
+    if 'role' not in session or session['role'] != 'teacher':
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+    
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'success': False, 'message': 'Expected a JSON object with an items list'}), 400
+    idempotency_key = request.headers.get('Idempotency-Key') or payload.get('idempotency_key')
+    
+    conn = get_db()
+    try:
+        item = get_item(conn.cursor(), kind, item_id)
+        if not item:
+            return jsonify({'success': False, 'message': f'{kind.capitalize()} not found'}), 404
+        allowed = can_access_assignment(item_id) if kind == 'assignment' else can_access_class(item[0])
+        if not allowed:
+            return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+        
+        status, body = save_batch(conn, kind, item_id, session['user_id'], payload.get('items'),
+                                  idempotency_key=str(idempotency_key) if idempotency_key else None)
+        if body['success'] and not body.get('replayed'):
+            invalidate_grades(item[0])
+            student_progress.invalidate(class_id=item[0])
+        return jsonify(body), status
+    except sqlite3.Error as e:
+        return jsonify({'success': False, 'message': f'Error saving marks: {e}'}), 500
+    finally:
+        conn.close()
+
+@teacher_bp.route('/api/assessments/<int:assessment_id>/marks', methods=['POST'])
+def save_assessment_marks_batch(assessment_id):
+    """Save many students' marks for an assessment from a JSON batch"""
+    return _save_marks_batch('assessment', assessment_id)
+
+@teacher_bp.route('/api/assignments/<int:assignment_id>/marks', methods=['POST'])
+def save_assignment_marks_batch(assignment_id):
+    """Save many students' marks for an assignment from a JSON batch"""
+    return _save_marks_batch('assignment', assignment_id)
+
 @teacher_bp.route('/resolve_doubt', methods=['POST'])
 def resolve_doubt():
     """Resolve a student doubt"""
@@ -1487,6 +1664,7 @@ def reply_doubt():
         return redirect(url_for('teacher.doubts'))
 
 @teacher_bp.route('/mark_student/<int:student_id>')
+@teacher_owns_class(required=True)
 def mark_student(student_id):
     """Individual student marking page"""
     if 'role' not in session or session['role'] != 'teacher':
@@ -1502,17 +1680,12 @@ def mark_student(student_id):
     conn = get_db()
     cur = conn.cursor()
     
-    # Verify teacher has access to this class
-    cur.execute('''
-        SELECT c.id, c.name, c.subject, c.grade_level
-        FROM classes c
-        JOIN teacher_class_map tcm ON c.id = tcm.class_id
-        WHERE c.id = ? AND tcm.teacher_id = ?
-    ''', (class_id, teacher_id))
+    # Access was verified by @teacher_owns_class
+    cur.execute('SELECT id, name, subject, grade_level FROM classes WHERE id = ?', (class_id,))
     
     class_info = cur.fetchone()
     if not class_info:
-        flash('Class not found or unauthorized access', 'error')
+        flash('Class not found', 'error')
         conn.close()
         return redirect(url_for('teacher.marks_roster'))
     
@@ -1536,29 +1709,9 @@ def mark_student(student_id):
         'username': student[2]
     }
     
-    # Get all assignments for this class with this student's marks
-    cur.execute('''
-        SELECT a.id, a.title, a.points, a.assignment_type, a.due_date,
-               sm.marks_obtained, sm.total_marks, sm.grade, sm.remarks
-        FROM assignments a
-        LEFT JOIN student_marks sm ON a.id = sm.assignment_id AND sm.student_id = ?
-        WHERE a.class_id = ? AND a.teacher_id = ?
-        ORDER BY a.due_date DESC
-    ''', (student_id, class_id, teacher_id))
-    
-    assignments = []
-    for row in cur.fetchall():
-        assignments.append({
-            'id': row[0],
-            'title': row[1],
-            'total_marks': row[2] or 100,
-            'type': row[3],
-            'due_date': row[4],
-            'marks_obtained': row[5],
-            'student_total_marks': row[6],
-            'grade': row[7],
-            'remarks': row[8]
-        })
+    # Cached mark history of the student; this teacher marks their own assignments
+    progress = student_progress.get_history(cur, student_id, class_id)
+    assignments = [item for item in reversed(progress['items']) if item['teacher_id'] == teacher_id]
     
     class_data = {
         'id': class_info[0],
@@ -1572,9 +1725,11 @@ def mark_student(student_id):
     return render_template('teacher/mark_individual_student.html',
                          student=student_info,
                          class_data=class_data,
-                         assignments=assignments)
+                         assignments=assignments,
+                         progress=progress)
 
 @teacher_bp.route('/save_individual_marks', methods=['POST'])
+@teacher_owns_class(required=True)
 def save_individual_marks():
     """Save marks for individual student"""
     if 'role' not in session or session['role'] != 'teacher':
@@ -1611,6 +1766,10 @@ def save_individual_marks():
                 if not assignment:
                     continue
                 
+                if assignment_archived(conn, assignment_id):
+                    flash(f'Marks of archived assignment ID {assignment_id} are read-only', 'error')
+                    continue
+                
                 total_marks = assignment[0] or 100
                 
                 if marks_obtained and marks_obtained.strip():
@@ -1623,7 +1782,7 @@ def save_individual_marks():
                     
                     # Calculate percentage and grade
                     percentage = (marks_obtained / total_marks) * 100
-                    grade = calculate_grade(percentage)
+                    grade = letter_grade(percentage)
                     
                     # Check if marks already exist
                     cur.execute('''
@@ -1661,6 +1820,7 @@ def save_individual_marks():
                     ''', (student_id, assignment_id))
         
         conn.commit()
+        student_progress.invalidate(student_id=student_id, class_id=class_id)
         if marks_saved > 0:
             flash(f'Successfully saved marks for {marks_saved} assignments', 'success')
         else:
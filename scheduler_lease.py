@@ -0,0 +1,49 @@
+"""
+Leader election for background jobs across worker processes
+A job name has one lease row holding the current leader and an expiry
+time. acquire() is a single upsert that only succeeds when the row is
+free, expired or already ours, so at most one process holds a lease at a
+time. The leader renews it on every tick (the heartbeat); when a leader
+dies its lease runs out and the next process to try takes over.
+"""
+import os
+import socket
+import time
+import uuid
+
+
+def make_holder_id():
+    """Identity of this process (host, pid and a random suffix against pid reuse)"""
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+class Lease:
+    """A named lease that one process at a time can hold for ttl seconds"""
+
+    def __init__(self, name, ttl, holder=None):
+        self.name = name
+        self.ttl = ttl
+        self.holder = holder or make_holder_id()
+
+    def acquire(self, conn, now=None):
+        """Take or renew the lease; True if this process is the leader"""
+        now = now if now is not None else time.time()
+        conn.execute('''
+            INSERT INTO scheduler_leases (name, holder, acquired_at, heartbeat_at, expires_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (name) DO UPDATE SET
+                acquired_at = CASE WHEN holder = excluded.holder THEN acquired_at ELSE excluded.acquired_at END,
+                holder = excluded.holder,
+                heartbeat_at = excluded.heartbeat_at,
+                expires_at = excluded.expires_at
+            WHERE holder = excluded.holder OR expires_at < excluded.heartbeat_at
+        ''', (self.name, self.holder, now, now, now + self.ttl))
+        row = conn.execute('SELECT holder FROM scheduler_leases WHERE name = ?', (self.name,)).fetchone()
+        conn.commit()
+        return bool(row) and row[0] == self.holder
+
+    def release(self, conn):
+        """Give the lease up so another process can take over at once"""
+        conn.execute('DELETE FROM scheduler_leases WHERE name = ? AND holder = ?', (self.name, self.holder))
+        conn.commit()
+
@@ -0,0 +1,189 @@
+"""
+Versioned schema migrations for users.db
+Forward-only migrations live in migrations/NNNN_name.sql and are applied
+in order; schema_version records each applied version with a checksum of
+its file, so an edited migration is reported instead of silently skipped.
+
+Migrations are written to be safe on a database that is in use:
+- ALTER TABLE ... ADD COLUMN is skipped when the column already exists,
+  so databases that gained a column by hand (or from schema.sql) agree
+- a file marked "-- transaction: per-statement" commits after every
+  statement, so an index build holds the write lock for one index only
+  and an interrupted run resumes where it stopped (use IF NOT EXISTS)
+- other files run in one transaction and roll back as a whole on error
+The runner waits on busy_timeout for app writers instead of failing, and
+app connections wait on their own timeout (5 s by default) while one
+statement holds the lock.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import time
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+BUSY_TIMEOUT_MS = 30000
+
+FILE_PATTERN = re.compile(r'^(\d{4})_(\w+)\.sql$')
+ADD_COLUMN_PATTERN = re.compile(r'^\s*ALTER\s+TABLE\s+(\w+)\s+ADD\s+(?:COLUMN\s+)?(\w+)', re.IGNORECASE)
+PER_STATEMENT_MARKER = '-- transaction: per-statement'
+
+VERSION_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        checksum TEXT NOT NULL,
+        applied_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        duration_ms INTEGER
+    )
+'''
+
+
+class Migration:
+    """One migrations/NNNN_name.sql file"""
+
+    def __init__(self, path):
+        match = FILE_PATTERN.match(os.path.basename(path))
+        self.version = int(match.group(1))
+        self.name = match.group(2)
+        with open(path, 'r', encoding='utf-8') as f:
+            self.sql = f.read()
+        self.checksum = hashlib.sha256(self.sql.encode('utf-8')).hexdigest()
+        self.per_statement = PER_STATEMENT_MARKER in self.sql
+
+    def statements(self):
+        """Complete SQL statements of the file, in order"""
+        statements = []
+        pending = ''
+        for line in self.sql.splitlines(keepends=True):
+            if not pending and (not line.strip() or line.lstrip().startswith('--')):
+                continue
+            pending += line
+            if sqlite3.complete_statement(pending):
+                statements.append(pending.strip())
+                pending = ''
+        if pending.strip():
+            raise ValueError(f'Migration {self.version:04d}_{self.name} ends with an incomplete statement')
+        return statements
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    """Every migration file, ordered by version"""
+    migrations = [Migration(os.path.join(directory, filename))
+                  for filename in sorted(os.listdir(directory)) if FILE_PATTERN.match(filename)]
+    versions = [migration.version for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError('Two migration files share a version number')
+    return migrations
+
+
+def ensure_version_table(conn):
+    conn.execute(VERSION_TABLE_SQL)
+    conn.commit()
+
+
+def applied_versions(conn):
+    """version -> checksum of every applied migration"""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'").fetchone()
+    if not exists:
+        return {}
+    return dict(conn.execute('SELECT version, checksum FROM schema_version'))
+
+
+def _column_exists(conn, table, column):
+    return any(row[1].lower() == column.lower() for row in conn.execute(f'PRAGMA table_info({table})'))
+
+
+def _run_statement(conn, statement):
+    """Execute one statement; False when it was skipped as already applied"""
+    match = ADD_COLUMN_PATTERN.match(statement)
+    if match and _column_exists(conn, match.group(1), match.group(2)):
+        return False
+    conn.execute(statement)
+    return True
+
+
+def apply_migration(conn, migration):
+    """Apply one migration and record it
+
+    Returns:
+        tuple: (statements executed, statements skipped)
+    """
+    started = time.perf_counter()
+    executed = skipped = 0
+    # Statements are run one by one, so transactions are managed by hand
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        if not migration.per_statement:
+            conn.execute('BEGIN IMMEDIATE')
+        for statement in migration.statements():
+            if migration.per_statement:
+                conn.execute('BEGIN IMMEDIATE')
+            if _run_statement(conn, statement):
+                executed += 1
+            else:
+                skipped += 1
+            if migration.per_statement:
+                conn.execute('COMMIT')
+
+        if migration.per_statement:
+            conn.execute('BEGIN IMMEDIATE')
+        conn.execute('''
+            INSERT INTO schema_version (version, name, checksum, duration_ms)
+            VALUES (?, ?, ?, ?)
+        ''', (migration.version, migration.name, migration.checksum,
+              round((time.perf_counter() - started) * 1000)))
+        conn.execute('COMMIT')
+    except Exception:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.isolation_level = isolation_level
+    return executed, skipped
+
+
+def check(conn, directory=MIGRATIONS_DIR):
+    """Compare the database with the migration files without changing it
+
+    Returns:
+        dict: 'current' (highest applied version), 'pending' (migrations not
+        applied yet), 'modified' (applied files whose contents changed since)
+        and 'unknown' (applied versions with no file)
+    """
+    migrations = load_migrations(directory)
+    applied = applied_versions(conn)
+    by_version = {migration.version: migration for migration in migrations}
+    return {
+        'current': max(applied) if applied else 0,
+        'pending': [migration for migration in migrations if migration.version not in applied],
+        'modified': [migration for migration in migrations
+                     if migration.version in applied and applied[migration.version] != migration.checksum],
+        'unknown': sorted(version for version in applied if version not in by_version)
+    }
+
+
+def migrate(conn, directory=MIGRATIONS_DIR, log=print):
+    """Apply every pending migration in order
+
+    Returns:
+        int: number of migrations applied
+    """
+    conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+    ensure_version_table(conn)
+    status = check(conn, directory)
+    for migration in status['modified']:
+        log(f"⚠ Migration {migration.version:04d}_{migration.name} changed after it was applied")
+
+    for migration in status['pending']:
+        started = time.perf_counter()
+        executed, skipped = apply_migration(conn, migration)
+        note = f", {skipped} already present" if skipped else ''
+        log(f"✓ Applied {migration.version:04d}_{migration.name}: {executed} statements{note} "
+            f"({(time.perf_counter() - started) * 1000:.0f} ms)")
+
+    if status['pending']:
+        # Refresh planner statistics for the new indexes
+        conn.execute('PRAGMA optimize')
+    return len(status['pending'])
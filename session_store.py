@@ -0,0 +1,290 @@
+"""
+Server-side session store for logged-in users
+The cookie only carries a random session id. The user principal (id, role,
+name and class memberships) is loaded once at login, kept in the
+user_sessions table and fronted by an in-memory LRU so views can read it
+without re-querying users and the class maps on every request.
+Each request still reads the session row and users.session_version, which
+triggers bump whenever the user's identity, role, class maps or class
+assignments change (migration 0008); a principal built from an older
+version is rebuilt, so changes made by any worker process apply at once.
+Sessions end after idle_timeout seconds without a request or
+absolute_timeout seconds after login; expired rows are purged
+periodically when new sessions are created.
+"""
+import json
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import session
+
+
+class Principal:
+    def __init__(self, id, username, role, name=None, email=None, class_ids=None):
+        self.id = id
+        self.username = username
+        self.role = role
+        self.name = name or username
+        self.email = email
+        self.class_ids = list(class_ids or [])
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'username': self.username,
+            'role': self.role,
+            'name': self.name,
+            'email': self.email,
+            'class_ids': self.class_ids
+        }
+
+    @staticmethod
+    def from_dict(data):
+        return Principal(data['id'], data['username'], data['role'], data.get('name'),
+                         data.get('email'), data.get('class_ids'))
+
+
+class SessionStore:
+    def __init__(self, db_path='users.db', capacity=1000, touch_interval=60,
+                 idle_timeout=2 * 3600, absolute_timeout=12 * 3600, purge_interval=600):
+        self.db_path = db_path
+        self.capacity = capacity
+        # last_seen is written at most this often per session
+        self.touch_interval = touch_interval
+        self.idle_timeout = idle_timeout
+        self.absolute_timeout = absolute_timeout
+        self.purge_interval = purge_interval
+        self._last_purge = 0
+
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path)
+
+    def load_principal(self, cur, user_id):
+        """Build a principal from the users table and the role's class map
+
+        Returns:
+            tuple: (principal, session_version it was built from), or
+            (None, None) for an unknown user
+        """
+        cur.execute('SELECT id, username, role, name, email, session_version FROM users WHERE id = ?', (user_id,))
+        user = cur.fetchone()
+        if not user:
+            return None, None
+
+        role = user[2]
+        if role == 'student':
+            cur.execute('''
+                SELECT class_id FROM student_class_map
+                WHERE student_id = ? AND status = 'active'
+                ORDER BY class_id
+            ''', (user_id,))
+        elif role == 'teacher':
+            cur.execute('''
+                SELECT class_id FROM teacher_class_map
+                WHERE teacher_id = ?
+                ORDER BY class_id
+            ''', (user_id,))
+        class_ids = [row[0] for row in cur.fetchall()] if role in ('student', 'teacher') else []
+
+        return Principal(user[0], user[1], role, user[3], user[4], class_ids), user[5]
+
+    def _remember(self, session_id, principal, version, touched):
+        with self._lock:
+            self._cache[session_id] = (principal, version, touched)
+            self._cache.move_to_end(session_id)
+            while len(self._cache) > self.capacity:
+                self._cache.popitem(last=False)
+
+    def _expiry_params(self):
+        return (f'-{int(self.idle_timeout)} seconds', f'-{int(self.absolute_timeout)} seconds')
+
+    def purge_expired(self, conn):
+        """Delete sessions past their idle or absolute timeout"""
+        cur = conn.execute('''
+            DELETE FROM user_sessions
+            WHERE last_seen < datetime('now', ?) OR created_at < datetime('now', ?)
+        ''', self._expiry_params())
+        conn.commit()
+        return cur.rowcount
+
+    def create(self, user_id):
+        """Start a server-side session for a user and return its id"""
+        session_id = secrets.token_urlsafe(32)
+        conn = self._connect()
+        try:
+            if time.time() - self._last_purge >= self.purge_interval:
+                self._last_purge = time.time()
+                self.purge_expired(conn)
+            principal, version = self.load_principal(conn.cursor(), user_id)
+            if not principal:
+                return None
+            conn.execute('''
+                INSERT INTO user_sessions (session_id, user_id, principal, principal_version)
+                VALUES (?, ?, ?, ?)
+            ''', (session_id, user_id, json.dumps(principal.to_dict()), version))
+            conn.commit()
+        finally:
+            conn.close()
+
+        self._remember(session_id, principal, version, time.time())
+        return session_id
+
+    def get(self, session_id):
+        """Return the principal for a session id, or None if it has ended
+
+        One primary key read of the session and its user per call: an ended
+        session or a deleted user is noticed at once, and the cached
+        principal is reused only while users.session_version is unchanged.
+        """
+        if not session_id:
+            return None
+
+        with self._lock:
+            cached = self._cache.get(session_id)
+
+        now = time.time()
+        conn = self._connect()
+        try:
+            cur = conn.cursor()
+            idle_cutoff, absolute_cutoff = self._expiry_params()
+            cur.execute('''
+                SELECT s.user_id, u.session_version, s.principal, s.principal_version,
+                       s.last_seen < datetime('now', ?) OR s.created_at < datetime('now', ?)
+                FROM user_sessions s
+                LEFT JOIN users u ON u.id = s.user_id
+                WHERE s.session_id = ?
+            ''', (idle_cutoff, absolute_cutoff, session_id))
+            row = cur.fetchone()
+            if not row or row[4] or row[1] is None:
+                with self._lock:
+                    self._cache.pop(session_id, None)
+                if row:
+                    cur.execute('DELETE FROM user_sessions WHERE session_id = ?', (session_id,))
+                    conn.commit()
+                return None
+
+            user_id, version, principal_json, principal_version, _ = row
+            if cached and cached[1] == version:
+                principal = cached[0]
+                if now - cached[2] < self.touch_interval:
+                    with self._lock:
+                        if session_id in self._cache:
+                            self._cache.move_to_end(session_id)
+                    return principal
+            elif principal_json and principal_version == version:
+                principal = Principal.from_dict(json.loads(principal_json))
+            else:
+                # Built from an older version: reload it once
+                principal, version = self.load_principal(cur, user_id)
+                if not principal:
+                    return None
+                cur.execute('''
+                    UPDATE user_sessions SET principal = ?, principal_version = ?
+                    WHERE session_id = ?
+                ''', (json.dumps(principal.to_dict()), version, session_id))
+
+            # last_seen is refreshed at most once per touch_interval
+            cur.execute('UPDATE user_sessions SET last_seen = CURRENT_TIMESTAMP WHERE session_id = ?',
+                        (session_id,))
+            conn.commit()
+        finally:
+            conn.close()
+
+        self._remember(session_id, principal, version, now)
+        return principal
+
+    def delete(self, session_id):
+        """End a single session (logout)"""
+        if not session_id:
+            return
+        with self._lock:
+            self._cache.pop(session_id, None)
+        conn = self._connect()
+        try:
+            conn.execute('DELETE FROM user_sessions WHERE session_id = ?', (session_id,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _forget_users(self, user_ids):
+        with self._lock:
+            stale = [sid for sid, (principal, _, _) in self._cache.items() if principal.id in user_ids]
+            for sid in stale:
+                del self._cache[sid]
+
+    def invalidate_users(self, user_ids):
+        """Make every process reload these users' principals on their next request
+
+        Writes to users, the class maps and assignments bump the version by
+        trigger already; this covers changes the triggers cannot see.
+        """
+        user_ids = {int(user_id) for user_id in user_ids}
+        if not user_ids:
+            return
+        self._forget_users(user_ids)
+
+        conn = self._connect()
+        try:
+            conn.executemany('UPDATE users SET session_version = session_version + 1 WHERE id = ?',
+                             [(user_id,) for user_id in user_ids])
+            conn.commit()
+        finally:
+            conn.close()
+
+    def invalidate_user(self, user_id):
+        self.invalidate_users([user_id])
+
+    def remove_user(self, user_id):
+        """End every session of a deleted user"""
+        self._forget_users({int(user_id)})
+
+        conn = self._connect()
+        try:
+            conn.execute('DELETE FROM user_sessions WHERE user_id = ?', (user_id,))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+# Shared instance used by the blueprints
+session_store = SessionStore()
+
+
+def get_current_principal():
+    """Get the cached principal for the logged-in user
+
+    The session id is the only thing trusted from the cookie. A cookie
+    without a live session (logged out, expired, revoked, or from before
+    the store existed) is cleared so the user has to log in again.
+    """
+    principal = session_store.get(session.get('sid'))
+    if principal is None:
+        session.clear()
+    return principal
+
+
+def sync_session():
+    """Refresh the identity keys of the cookie session from the principal
+
+    Views read session['user_id'] / ['username'] / ['role']; they are
+    overwritten here on every request, so a stale cookie cannot keep a
+    role or identity the server no longer holds.
+
+    Returns:
+        bool: False when the cookie claims a login that has no live session
+    """
+    if 'sid' not in session and 'user_id' not in session:
+        return True
+    principal = get_current_principal()
+    if principal is None:
+        return False
+    for key, value in (('user_id', principal.id), ('username', principal.username), ('role', principal.role)):
+        if session.get(key) != value:
+            session[key] = value
+    return True
@@ -0,0 +1,145 @@
+"""
+Per-student mark history for a class
+The history lists every assignment of the class in due-date order with
+the student's mark, the running percentage up to that point and a trend
+sparkline, all built in one pass over a single query. Histories are cached
+per (student, class) under a cheap fingerprint of the row versions of the
+student's marks and the class's assignments, so a mark or assignment
+saved by another worker process (or removed by an archive run or a
+cascade delete) is picked up on the next read. invalidate() still drops
+entries at once in the saving process.
+"""
+import threading
+from collections import OrderedDict
+
+from grading import letter_grade
+
+CACHE_SIZE = 1024
+SPARKLINE_WIDTH = 120
+SPARKLINE_HEIGHT = 32
+
+_cache_lock = threading.Lock()
+_cache = OrderedDict()
+
+
+def _build(cur, student_id, class_id):
+    cur.execute('''
+        SELECT a.id, a.title, COALESCE(a.points, 100), a.assignment_type, a.due_date, a.teacher_id,
+               sm.marks_obtained, sm.total_marks, sm.grade, sm.remarks, sm.marked_at
+        FROM assignments a
+        LEFT JOIN student_marks sm ON a.id = sm.assignment_id AND sm.student_id = ?
+        WHERE a.class_id = ?
+        ORDER BY a.due_date, a.id
+    ''', (student_id, class_id))
+    rows = cur.fetchall()
+
+    step = SPARKLINE_WIDTH / (len(rows) - 1) if len(rows) > 1 else 0
+    items = []
+    mark_points = []
+    running_points = []
+    obtained_sum = 0.0
+    possible_sum = 0.0
+    for i, row in enumerate(rows):
+        item = {
+            'id': row[0],
+            'title': row[1],
+            'total_marks': row[2],
+            'type': row[3],
+            'due_date': row[4],
+            'teacher_id': row[5],
+            'marks_obtained': row[6],
+            'student_total_marks': row[7],
+            'grade': row[8],
+            'remarks': row[9],
+            'marked_at': row[10],
+            'percentage': None,
+            'running_percentage': None
+        }
+        if row[6] is not None:
+            total = row[7] or row[2]
+            obtained_sum += row[6]
+            possible_sum += total
+            item['percentage'] = round(row[6] * 100.0 / total, 2) if total else 0
+            item['running_percentage'] = round(obtained_sum * 100.0 / possible_sum, 2) if possible_sum else 0
+
+            x = round(i * step, 1)
+            mark_points.append(f"{x},{round(SPARKLINE_HEIGHT * (1 - item['percentage'] / 100), 1)}")
+            running_points.append(f"{x},{round(SPARKLINE_HEIGHT * (1 - item['running_percentage'] / 100), 1)}")
+        items.append(item)
+
+    marked = [item for item in items if item['percentage'] is not None]
+    percentage = round(obtained_sum * 100.0 / possible_sum, 2) if possible_sum else None
+    trend = 0
+    if len(marked) > 1:
+        trend = round(marked[-1]['running_percentage'] - marked[-2]['running_percentage'], 2)
+
+    return {
+        'items': items,
+        'summary': {
+            'assignments': len(items),
+            'marked': len(marked),
+            'obtained': obtained_sum,
+            'possible': possible_sum,
+            'percentage': percentage,
+            'grade': letter_grade(percentage) if percentage is not None else 'N/A',
+            'trend': trend
+        },
+        'sparkline': {
+            'width': SPARKLINE_WIDTH,
+            'height': SPARKLINE_HEIGHT,
+            'marks': ' '.join(mark_points),
+            'running': ' '.join(running_points)
+        }
+    }
+
+
+def _fingerprint(cur, student_id, class_id):
+    """Summary that changes with any mark of the student or assignment of the class
+
+    Both tables carry a row version that a trigger bumps on every change
+    (migrations 0006 and 0010), so inserts and deletes move COUNT or
+    MAX(id) and edits move TOTAL(version).
+    """
+    cur.execute('''
+        SELECT
+            (SELECT COUNT(*) || '/' || IFNULL(MAX(id), 0) || '/' || TOTAL(version) || '/' || IFNULL(MAX(marked_at), '')
+             FROM student_marks WHERE student_id = :student_id AND class_id = :class_id),
+            (SELECT COUNT(*) || '/' || IFNULL(MAX(id), 0) || '/' || TOTAL(version)
+             FROM assignments WHERE class_id = :class_id)
+    ''', {'student_id': student_id, 'class_id': class_id})
+    return cur.fetchone()
+
+
+def get_history(cur, student_id, class_id):
+    """Cached mark history of a student in a class
+
+    Returns:
+        dict: 'items' (every assignment, oldest due first, with the mark,
+        percentage and running percentage), 'summary' and 'sparkline'
+        (SVG polyline points for the marks and the running percentage)
+    """
+    db_file = cur.connection.execute('PRAGMA database_list').fetchone()[2]
+    key = (db_file, student_id, class_id)
+    fingerprint = _fingerprint(cur, student_id, class_id)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == fingerprint:
+            _cache.move_to_end(key)
+            return cached[1]
+
+    history = _build(cur, student_id, class_id)
+
+    with _cache_lock:
+        _cache[key] = (fingerprint, history)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return history
+
+
+def invalidate(student_id=None, class_id=None):
+    """Drop cached histories of a student, a class, or one student in a class"""
+    with _cache_lock:
+        for key in [key for key in _cache
+                    if (student_id is None or key[1] == student_id) and (class_id is None or key[2] == class_id)]:
+            del _cache[key]
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Term archival into a separate SQLite file
+Rows of closed terms (attendance, student marks, submissions and
+notifications older than the cutoff) are moved into archive.db through
+ATTACH DATABASE, in one transaction. The live database keeps a compact
+summary: the monthly attendance rollups stay as they are and one
+grade_reports row per (student, class) is written for the archived term
+(grade_snapshots.py).
+Reports attach the archive only when asked for a range that starts
+before the latest cutoff; default views (no start date) read the live
+tables and the summaries only.
+
+Usage: python term_archive.py --term "2024-25 Term 1" --before 2025-01-01
+"""
+import os
+import sqlite3
+import sys
+
+from grade_snapshots import write_snapshot
+
+DATABASE = 'users.db'
+ARCHIVE_DATABASE = 'archive.db'
+ARCHIVE_SCHEMA = 'archive'
+
+# Closed-term predicate for each archived table (? is the cutoff date)
+ARCHIVED_TABLES = {
+    'attendance': 'attendance_date < ?',
+    'student_marks': 'assignment_id IN (SELECT id FROM assignments WHERE due_date < ?)',
+    'submissions': 'assignment_id IN (SELECT id FROM assignments WHERE due_date < ?)',
+    'notifications': 'created_at < ?',
+}
+
+
+def archive_cutoff(conn):
+    """Latest cutoff date archived so far, or None"""
+    return conn.execute('SELECT MAX(cutoff_date) FROM archive_runs').fetchone()[0]
+
+
+def assignment_archived(conn, assignment_id):
+    """True when the assignment's marks and submissions belong to an archived term
+
+    Those marks are read-only: a new live row would sit next to the
+    archived one and show up twice in historical reports.
+    """
+    cutoff = archive_cutoff(conn)
+    if cutoff is None:
+        return False
+    row = conn.execute('SELECT due_date < ? FROM assignments WHERE id = ?', (cutoff, assignment_id)).fetchone()
+    return bool(row and row[0])
+
+
+def _attached(conn):
+    return {row[1] for row in conn.execute('PRAGMA database_list')}
+
+
+def latest_archive_path(conn):
+    """File written by the latest archive run, or None before the first run"""
+    row = conn.execute('SELECT archive_path FROM archive_runs ORDER BY id DESC LIMIT 1').fetchone()
+    return row[0] if row else None
+
+
+def attach_archive(conn, archive_path=None):
+    """Attach the archive database to this connection (once)"""
+    if ARCHIVE_SCHEMA in _attached(conn):
+        return
+    if archive_path is None:
+        archive_path = latest_archive_path(conn) or ARCHIVE_DATABASE
+    conn.execute(f'ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}', (archive_path,))
+
+
+def attach_existing_archive(conn):
+    """Attach the archive if an archive run wrote one
+
+    Returns:
+        set: archived tables present in it (empty when nothing was attached)
+    """
+    if ARCHIVE_SCHEMA not in _attached(conn):
+        archive_path = latest_archive_path(conn)
+        if not archive_path or not os.path.exists(archive_path):
+            return set()
+        attach_archive(conn, archive_path)
+    rows = conn.execute(f"SELECT name FROM {ARCHIVE_SCHEMA}.sqlite_master WHERE type = 'table'")
+    return {row[0] for row in rows} & set(ARCHIVED_TABLES)
+
+
+def _columns(conn, schema, table):
+    return [row[1] for row in conn.execute(f'PRAGMA {schema}.table_info({table})')]
+
+
+def needs_archive(conn, start_date):
+    """True when a report starting at start_date reaches into archived terms"""
+    if not start_date:
+        return False
+    cutoff = archive_cutoff(conn)
+    return cutoff is not None and start_date < cutoff
+
+
+def table_source(conn, table, start_date=None):
+    """Table expression for reading a possibly archived table
+
+    Returns the plain table name for current and default (no start date)
+    ranges, or a UNION ALL of the live and archived rows (attaching the
+    archive) for historical ones. Columns added after the last archive run read as NULL
+    for archived rows. Call it before any write of the request: ATTACH is
+    not allowed inside a transaction.
+    """
+    if not needs_archive(conn, start_date):
+        return table
+    attach_archive(conn)
+    archived = set(_columns(conn, ARCHIVE_SCHEMA, table))
+    if not archived:
+        return table
+    columns = _columns(conn, 'main', table)
+    archived_columns = [c if c in archived else f'NULL AS {c}' for c in columns]
+    return (f"(SELECT {', '.join(columns)} FROM main.{table} "
+            f"UNION ALL SELECT {', '.join(archived_columns)} FROM {ARCHIVE_SCHEMA}.{table})")
+
+
+def _prepare_archive_table(conn, table):
+    """Create the archive copy of a table and add columns added since"""
+    conn.execute(f'CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.{table} AS SELECT * FROM main.{table} WHERE 0')
+    archived = set(_columns(conn, ARCHIVE_SCHEMA, table))
+    for column in _columns(conn, 'main', table):
+        if column not in archived:
+            conn.execute(f'ALTER TABLE {ARCHIVE_SCHEMA}.{table} ADD COLUMN {column}')
+    return _columns(conn, 'main', table)
+
+
+def archive_term(conn, term, cutoff, archive_path=ARCHIVE_DATABASE, archived_by=None, dry_run=False):
+    """Move rows older than cutoff (first day of a month) into the archive
+
+    Returns:
+        dict: rows moved per table plus 'grade_reports' written
+    """
+    if not cutoff.endswith('-01'):
+        raise ValueError('The cutoff must be the first day of a month so rollups stay whole')
+
+    counts = {}
+    for table, predicate in ARCHIVED_TABLES.items():
+        counts[table] = conn.execute(f'SELECT COUNT(*) FROM {table} WHERE {predicate}', (cutoff,)).fetchone()[0]
+    if dry_run:
+        return counts
+
+    # ATTACH is not allowed inside a transaction
+    if conn.in_transaction:
+        conn.commit()
+    attach_archive(conn, archive_path)
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        counts['grade_reports'] = write_snapshot(conn, term, due_before=cutoff,
+                                                 generated_by=archived_by, replace=False)
+
+        # Archived attendance keeps its monthly rollups
+        rollup_trigger = conn.execute(
+            "SELECT sql FROM main.sqlite_master WHERE type = 'trigger' AND name = 'trg_attendance_monthly_delete'"
+        ).fetchone()
+        conn.execute('DROP TRIGGER IF EXISTS main.trg_attendance_monthly_delete')
+
+        for table, predicate in ARCHIVED_TABLES.items():
+            column_list = ', '.join(_prepare_archive_table(conn, table))
+            conn.execute(f'''
+                INSERT INTO {ARCHIVE_SCHEMA}.{table} ({column_list})
+                SELECT {column_list} FROM main.{table} WHERE {predicate}
+            ''', (cutoff,))
+            conn.execute(f'DELETE FROM main.{table} WHERE {predicate}', (cutoff,))
+
+        if rollup_trigger:
+            conn.execute(rollup_trigger[0])
+        conn.execute('''
+            INSERT INTO archive_runs (term, cutoff_date, archive_path, rows_moved, archived_by)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (term, cutoff, archive_path, sum(counts[t] for t in ARCHIVED_TABLES), archived_by))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute(f'DETACH DATABASE {ARCHIVE_SCHEMA}')
+
+    return counts
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Move closed-term rows into the archive database')
+    parser.add_argument('--term', required=True, help='Term name recorded on the grade_reports summary')
+    parser.add_argument('--before', required=True, help='Cutoff date (YYYY-MM-01); older rows are archived')
+    parser.add_argument('--archive', default=ARCHIVE_DATABASE, help='Archive database file')
+    parser.add_argument('--dry-run', action='store_true', help='Only count the rows that would move')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(DATABASE)
+    try:
+        counts = archive_term(conn, args.term, args.before, args.archive, dry_run=args.dry_run)
+    except ValueError as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+    mode = 'Would archive' if args.dry_run else 'Archived'
+    print(f"✓ {mode}: " + ', '.join(f'{count} {table}' for table, count in counts.items()))
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from query_plan_check import build_database  # noqa: E402
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    """Fresh migrated users.db in a temporary working directory
+
+    Seeded with one teacher (id 1), one student (id 2) enrolled in one
+    class (id 1) and one assignment (id 1) of that class.
+    """
+    monkeypatch.chdir(tmp_path)
+    conn = build_database(str(tmp_path / 'users.db'))
+    conn.execute("INSERT INTO users (id, username, password, role, name) VALUES (1, 'teacher', 'x', 'teacher', 'Teacher')")
+    conn.execute("INSERT INTO users (id, username, password, role, name) VALUES (2, 'student', 'x', 'student', 'Student')")
+    conn.execute("INSERT INTO classes (id, name, teacher_id) VALUES (1, 'Maths', 1)")
+    conn.execute("INSERT INTO student_class_map (student_id, class_id) VALUES (2, 1)")
+    conn.execute('''
+        INSERT INTO assignments (id, title, class_id, teacher_id, due_date, points)
+        VALUES (1, 'Homework', 1, 1, '2026-03-15', 20)
+    ''')
+    conn.commit()
+    yield conn
+    conn.close()
@@ -0,0 +1,41 @@
+from login_throttle import LoginThrottle
+
+
+def make_throttle(tmp_path):
+    return LoginThrottle(db_path=str(tmp_path / 'users.db'), persist_interval=3600)
+
+
+def test_good_logins_from_one_address_are_not_throttled(conn, tmp_path):
+    throttle = make_throttle(tmp_path)
+    # A whole school behind one NAT address
+    for i in range(200):
+        assert throttle.check(f'student{i}', '10.0.0.1') == 0
+        throttle.record_success(f'student{i}', '10.0.0.1')
+
+
+def test_repeated_failures_back_off_the_username(conn, tmp_path):
+    throttle = make_throttle(tmp_path)
+    for _ in range(throttle.user_failure_threshold):
+        assert throttle.check('student', '10.0.0.1') == 0
+        throttle.record_failure('student', '10.0.0.1')
+
+    assert throttle.check('student', '10.0.0.1') > 0
+    # Other users on the same address still get in
+    assert throttle.check('teacher', '10.0.0.1') == 0
+
+
+def test_success_clears_the_lockout(conn, tmp_path):
+    throttle = make_throttle(tmp_path)
+    for _ in range(throttle.user_failure_threshold):
+        throttle.record_failure('student', '10.0.0.1')
+    throttle.record_success('student', '10.0.0.1')
+    assert throttle.check('student', '10.0.0.1') == 0
+
+
+def test_lockout_survives_a_restart(conn, tmp_path):
+    throttle = make_throttle(tmp_path)
+    for _ in range(throttle.user_failure_threshold):
+        throttle.record_failure('student', '10.0.0.1')
+    throttle.persist()
+
+    assert make_throttle(tmp_path).check('student', '10.0.0.2') > 0
@@ -0,0 +1,46 @@
+import marks_batch
+
+
+def saved_marks(conn):
+    return conn.execute('SELECT student_id, marks_obtained, grade FROM student_marks WHERE assignment_id = 1').fetchall()
+
+
+def test_batch_creates_then_updates(conn):
+    status, response = marks_batch.save_batch(conn, 'assignment', 1, 1, [{'student_id': 2, 'score': 18}])
+    assert status == 200
+    assert (response['created'], response['updated']) == (1, 0)
+
+    status, response = marks_batch.save_batch(conn, 'assignment', 1, 1, [{'student_id': 2, 'score': 10}])
+    assert status == 200
+    assert (response['created'], response['updated']) == (0, 1)
+    assert [row[:2] for row in saved_marks(conn)] == [(2, 10)]
+
+
+def test_invalid_item_rejects_the_whole_batch(conn):
+    conn.execute("INSERT INTO users (id, username, password, role) VALUES (3, 'other', 'x', 'student')")
+    conn.commit()
+    items = [{'student_id': 2, 'score': 18}, {'student_id': 3, 'score': 15}, {'student_id': 2, 'score': 99}]
+
+    status, response = marks_batch.save_batch(conn, 'assignment', 1, 1, items)
+    assert status == 400
+    assert [r['status'] for r in response['results']] == ['valid', 'error', 'error']
+    assert saved_marks(conn) == []
+
+
+def test_idempotency_key_replays_the_stored_response(conn):
+    items = [{'student_id': 2, 'score': 18}]
+    status, first = marks_batch.save_batch(conn, 'assignment', 1, 1, items, idempotency_key='k1')
+    assert status == 200 and not first['replayed']
+
+    status, replay = marks_batch.save_batch(conn, 'assignment', 1, 1, items, idempotency_key='k1')
+    assert status == 200 and replay['replayed']
+    assert replay['created'] == first['created'] == 1
+    assert len(saved_marks(conn)) == 1
+
+
+def test_idempotency_key_reused_for_another_payload_conflicts(conn):
+    marks_batch.save_batch(conn, 'assignment', 1, 1, [{'student_id': 2, 'score': 18}], idempotency_key='k1')
+    status, response = marks_batch.save_batch(conn, 'assignment', 1, 1, [{'student_id': 2, 'score': 5}],
+                                              idempotency_key='k1')
+    assert status == 409
+    assert [row[:2] for row in saved_marks(conn)] == [(2, 18)]
@@ -0,0 +1,13 @@
+import query_plan_check
+import schema_migrations
+
+
+def test_fresh_database_is_fully_migrated(conn):
+    status = schema_migrations.check(conn)
+    assert status['current'] == max(m.version for m in schema_migrations.load_migrations())
+    assert not status['pending'] and not status['modified'] and not status['unknown']
+
+
+def test_no_unexpected_full_scans():
+    """Every SQL statement of the app is planned against a fresh migrated database"""
+    assert query_plan_check.run()
@@ -0,0 +1,12 @@
+from reminder_scheduler import ReminderScheduler
+
+
+def test_reminder_is_sent_once_per_day(conn):
+    scheduler = ReminderScheduler()
+    assert scheduler.send_reminder(conn, 1, 2, 'student', 'student_reminder', 'Class soon')
+    assert not scheduler.send_reminder(conn, 1, 2, 'student', 'student_reminder', 'Class soon')
+    # Another reminder type or user is a different reminder
+    assert scheduler.send_reminder(conn, 1, 1, 'teacher', 'teacher_reminder', 'Class soon')
+
+    assert conn.execute('SELECT COUNT(*) FROM reminders').fetchone()[0] == 2
+    assert conn.execute('SELECT COUNT(*) FROM notifications WHERE user_id = 2').fetchone()[0] == 1
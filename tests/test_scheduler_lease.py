@@ -0,0 +1,25 @@
+from scheduler_lease import Lease
+
+
+def test_second_holder_waits_for_expiry_then_takes_over(conn):
+    leader = Lease('reminders', ttl=60, holder='a')
+    standby = Lease('reminders', ttl=60, holder='b')
+
+    assert leader.acquire(conn, now=1000)
+    assert not standby.acquire(conn, now=1030)
+    # The heartbeat keeps the lease alive past its first expiry
+    assert leader.acquire(conn, now=1050)
+    assert not standby.acquire(conn, now=1100)
+
+    # The leader stops renewing
+    assert standby.acquire(conn, now=1111)
+    assert not leader.acquire(conn, now=1112)
+
+
+def test_release_hands_over_at_once(conn):
+    leader = Lease('reminders', ttl=60, holder='a')
+    standby = Lease('reminders', ttl=60, holder='b')
+
+    assert leader.acquire(conn, now=1000)
+    leader.release(conn)
+    assert standby.acquire(conn, now=1001)
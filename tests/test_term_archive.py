@@ -0,0 +1,64 @@
+import term_archive
+
+
+def add_attendance(conn, date):
+    conn.execute('''
+        INSERT INTO attendance (student_id, class_id, attendance_date, status, marked_by)
+        VALUES (2, 1, ?, 'present', 1)
+    ''', (date,))
+
+
+def archive(conn, tmp_path):
+    return term_archive.archive_term(conn, 'Spring', '2026-04-01',
+                                     archive_path=str(tmp_path / 'archive.db'), archived_by=1)
+
+
+def test_table_source_without_archive_is_the_table(conn):
+    assert not term_archive.needs_archive(conn, '2020-01-01')
+    assert term_archive.table_source(conn, 'attendance', '2020-01-01') == 'attendance'
+
+
+def test_archive_term_moves_rows_and_keeps_rollups(conn, tmp_path):
+    add_attendance(conn, '2026-03-10')
+    add_attendance(conn, '2026-05-10')
+    conn.commit()
+
+    counts = archive(conn, tmp_path)
+    assert counts['attendance'] == 1
+    assert conn.execute('SELECT COUNT(*) FROM attendance').fetchone()[0] == 1
+    # Monthly rollups of archived attendance stay in place
+    assert conn.execute('SELECT COUNT(*) FROM attendance_monthly').fetchone()[0] == 2
+    assert conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_attendance_monthly_delete'"
+    ).fetchone()[0] == 1
+
+
+def test_table_source_reads_archived_rows_for_early_ranges(conn, tmp_path):
+    add_attendance(conn, '2026-03-10')
+    add_attendance(conn, '2026-05-10')
+    conn.commit()
+    archive(conn, tmp_path)
+
+    assert term_archive.needs_archive(conn, '2026-03-01')
+    assert not term_archive.needs_archive(conn, '2026-04-01')
+    assert not term_archive.needs_archive(conn, None)
+    assert term_archive.table_source(conn, 'attendance') == 'attendance'
+
+    source = term_archive.table_source(conn, 'attendance', '2026-03-01')
+    assert 'UNION ALL' in source
+    dates = [row[0] for row in conn.execute(f'SELECT attendance_date FROM {source} ORDER BY attendance_date')]
+    assert dates == ['2026-03-10', '2026-05-10']
+
+
+def test_archived_assignment_is_read_only(conn, tmp_path):
+    assert not term_archive.assignment_archived(conn, 1)
+    archive(conn, tmp_path)
+    assert term_archive.assignment_archived(conn, 1)
+
+
+def test_cutoff_must_start_a_month(conn, tmp_path):
+    try:
+        term_archive.archive_term(conn, 'Spring', '2026-04-15', archive_path=str(tmp_path / 'archive.db'))
+    except ValueError:
+        return
+    raise AssertionError('archive_term accepted a mid-month cutoff')
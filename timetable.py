@@ -0,0 +1,359 @@
+"""
+Timetable engine for schedule conflicts
+Every teacher and student gets one interval index per weekday: their
+active classes' [start, end) minutes sorted by start, with a prefix
+maximum of the end times. An overlap query bisects for the last interval
+starting before the new end and walks back only while the prefix maximum
+still reaches past the new start, so checking a class or an enrollment is
+O(log n) plus the conflicts found. The indexes are built in bulk from two
+queries and cached until the trigger-maintained schedule_version changes.
+The whole-school report sweeps each index once instead of comparing pairs.
+"""
+import heapq
+import json
+import threading
+from bisect import bisect_left
+from datetime import date, timedelta
+
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+# role -> mapping table, user column
+MEMBER_TABLES = {
+    'teacher': ('teacher_class_map', 'teacher_id'),
+    'student': ('student_class_map', 'student_id'),
+}
+
+_cache_lock = threading.Lock()
+_cache = {}
+
+
+def get_version(cur):
+    """Current schedule version and the UTC time it last changed
+
+    The version moves on any schedule or membership write, so it can key
+    caches of anything derived from the timetable.
+    """
+    cur.execute('SELECT version, updated_at FROM schedule_version WHERE id = 1')
+    return cur.fetchone()
+
+
+def parse_days(value):
+    """Weekday names from a stored schedule_days value (JSON list or text)"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            value = value.split(',')
+    if isinstance(value, str):
+        value = [value]
+    days = []
+    for day in value:
+        day = str(day).strip().strip('"').capitalize()
+        if day in WEEKDAYS and day not in days:
+            days.append(day)
+    return days
+
+
+def parse_time(value):
+    """Minutes since midnight of 'HH:MM', or None"""
+    try:
+        hours, minutes = str(value).strip().split(':')[:2]
+        hours, minutes = int(hours), int(minutes)
+    except (AttributeError, ValueError):
+        return None
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        return None
+    return hours * 60 + minutes
+
+
+def format_time(minutes):
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+def format_days(value):
+    """Readable weekday list of a stored schedule_days value"""
+    return ', '.join(parse_days(value))
+
+
+def class_slots(schedule_days, start, end):
+    """(day, start, end) slots of a class; empty when it has no usable schedule"""
+    start, end = parse_time(start), parse_time(end)
+    if start is None or end is None or end <= start:
+        return []
+    return [(day, start, end) for day in parse_days(schedule_days)]
+
+
+def validate_schedule(schedule_days, start, end):
+    """Error message for an unusable schedule, or None"""
+    if not parse_days(schedule_days):
+        return None
+    if parse_time(start) is None or parse_time(end) is None:
+        return 'Schedule times must be given as HH:MM'
+    if parse_time(end) <= parse_time(start):
+        return 'Class end time must be after its start time'
+    return None
+
+
+class IntervalIndex:
+    """One person's classes on one weekday"""
+
+    __slots__ = ('starts', 'ends', 'class_ids', 'max_end')
+
+    def __init__(self, intervals):
+        intervals = sorted(intervals)
+        self.starts = [start for start, _, _ in intervals]
+        self.ends = [end for _, end, _ in intervals]
+        self.class_ids = [class_id for _, _, class_id in intervals]
+        self.max_end = []
+        running = -1
+        for end in self.ends:
+            running = max(running, end)
+            self.max_end.append(running)
+
+    def overlapping(self, start, end, ignore=()):
+        """Class ids whose interval overlaps [start, end)"""
+        found = []
+        j = bisect_left(self.starts, end) - 1
+        while j >= 0 and self.max_end[j] > start:
+            if self.ends[j] > start and self.class_ids[j] not in ignore:
+                found.append(self.class_ids[j])
+            j -= 1
+        return found
+
+    def overlaps(self):
+        """Every overlapping pair as (class_id, other_class_id, start, end), in one sweep"""
+        active = []
+        pairs = []
+        for start, end, class_id in zip(self.starts, self.ends, self.class_ids):
+            while active and active[0][0] <= start:
+                heapq.heappop(active)
+            for other_end, other_id in active:
+                pairs.append((other_id, class_id, start, min(end, other_end)))
+            heapq.heappush(active, (end, class_id))
+        return pairs
+
+
+class Timetable:
+    """Interval indexes of every teacher and student, by weekday"""
+
+    def __init__(self, classes, members, version=0, updated_at=None):
+        # classes: class_id -> dict with 'name' and 'slots'; members: (role, user_id, class_id)
+        self.classes = classes
+        self.version = version
+        self.updated_at = updated_at
+        self.members = {}
+        grouped = {}
+        for role, user_id, class_id in members:
+            self.members.setdefault((role, user_id), set()).add(class_id)
+            for day, start, end in self.slots(class_id):
+                grouped.setdefault((role, user_id, day), []).append((start, end, class_id))
+        self.indexes = {key: IntervalIndex(intervals) for key, intervals in grouped.items()}
+
+    def class_name(self, class_id):
+        return self.classes[class_id]['name'] if class_id in self.classes else f'Class {class_id}'
+
+    def slots(self, class_id):
+        return self.classes[class_id]['slots'] if class_id in self.classes else []
+
+    def user_classes(self, role, user_id):
+        """Scheduled active classes of one person, by id"""
+        return {class_id: self.classes[class_id]
+                for class_id in self.members.get((role, int(user_id)), ())
+                if self.slots(class_id)}
+
+    def conflicts(self, role, user_id, slots, ignore=()):
+        """Classes of one person that overlap the given slots"""
+        found = []
+        for day, start, end in slots:
+            index = self.indexes.get((role, user_id, day))
+            if index:
+                for other_id in index.overlapping(start, end, ignore):
+                    found.append({'day': day, 'class_id': other_id,
+                                  'start': format_time(start), 'end': format_time(end)})
+        return found
+
+
+def _load(cur, version, updated_at):
+    cur.execute('''
+        SELECT id, name, subject, section, meeting_link, created_at,
+               schedule_days, schedule_time_start, schedule_time_end
+        FROM classes
+        WHERE status = 'active'
+    ''')
+    classes = {row[0]: {
+        'name': row[1],
+        'subject': row[2],
+        'section': row[3],
+        'meeting_link': row[4],
+        'created_at': row[5],
+        'slots': class_slots(row[6], row[7], row[8])
+    } for row in cur.fetchall()}
+
+    scheduled = [class_id for class_id, info in classes.items() if info['slots']]
+    members = []
+    if scheduled:
+        cur.execute('SELECT teacher_id, class_id FROM teacher_class_map')
+        members += [('teacher', user_id, class_id) for user_id, class_id in cur.fetchall()]
+        cur.execute("SELECT student_id, class_id FROM student_class_map WHERE status = 'active'")
+        members += [('student', user_id, class_id) for user_id, class_id in cur.fetchall()]
+    return Timetable(classes, members, version, updated_at)
+
+
+def get_timetable(cur):
+    """Cached Timetable, rebuilt when the schedule version moves"""
+    db_file = cur.connection.execute('PRAGMA database_list').fetchone()[2]
+    version, updated_at = get_version(cur)
+    with _cache_lock:
+        cached = _cache.get(db_file)
+        if cached and cached.version == version:
+            return cached
+    timetable = _load(cur, version, updated_at)
+    with _cache_lock:
+        _cache[db_file] = timetable
+    return timetable
+
+
+def week_view(cur, role, user_id, today=None):
+    """One person's classes laid out on a weekly grid
+
+    Monday to Friday are always shown, weekends only when a class meets.
+    Entries carry 'top' and 'height' as percentages of the grid's hours.
+
+    Returns:
+        dict: 'days' (name, date, is_today, entries), 'hours' and 'empty'
+    """
+    timetable = get_timetable(cur)
+    today = today or date.today()
+    monday = today - timedelta(days=today.weekday())
+
+    by_day = {}
+    for class_id, info in timetable.user_classes(role, user_id).items():
+        for day, start, end in info['slots']:
+            by_day.setdefault(day, []).append((start, end, class_id))
+
+    starts = [start for slots in by_day.values() for start, _, _ in slots]
+    ends = [end for slots in by_day.values() for _, end, _ in slots]
+    first = min(starts) // 60 * 60 if starts else 8 * 60
+    last = -(-max(ends) // 60) * 60 if ends else 17 * 60
+    span = last - first
+
+    days = []
+    for offset, name in enumerate(WEEKDAYS):
+        if offset >= 5 and name not in by_day:
+            continue
+        entries = []
+        for start, end, class_id in sorted(by_day.get(name, [])):
+            info = timetable.classes[class_id]
+            entries.append({
+                'class_id': class_id,
+                'name': info['name'],
+                'subject': info['subject'],
+                'meeting_link': info['meeting_link'],
+                'start': format_time(start),
+                'end': format_time(end),
+                'top': round((start - first) * 100 / span, 2),
+                'height': round((end - start) * 100 / span, 2)
+            })
+        day_date = monday + timedelta(days=offset)
+        days.append({'name': name, 'date': day_date, 'is_today': day_date == today, 'entries': entries})
+
+    hours = [{'label': format_time(minute), 'top': round((minute - first) * 100 / span, 2)}
+             for minute in range(first, last, 60)]
+    return {'days': days, 'hours': hours, 'empty': not by_day}
+
+
+def check_enrollment(cur, role, user_id, class_ids, replacing=False):
+    """Conflicts a user would get by attending class_ids
+
+    With replacing, class_ids is the user's complete new set of classes
+    (as in the edit pages); otherwise they are added to the current ones.
+
+    Returns:
+        list: human-readable conflict messages, empty when the change is fine
+    """
+    timetable = get_timetable(cur)
+    user_id = int(user_id)
+    requested = [int(class_id) for class_id in class_ids if str(class_id).strip()]
+    current = timetable.members.get((role, user_id), set())
+    # Classes being dropped in the same change cannot clash any more
+    ignore = current - set(requested) if replacing else set()
+
+    messages = []
+    added = []
+    for class_id in dict.fromkeys(requested):
+        if class_id in current:
+            continue
+        slots = timetable.slots(class_id)
+        clashes = timetable.conflicts(role, user_id, slots, ignore)
+        # Classes added together must not overlap each other either
+        for other_id in added:
+            clashes += [{'day': day, 'class_id': other_id, 'start': format_time(start), 'end': format_time(end)}
+                        for day, start, end in slots
+                        for other_day, other_start, other_end in timetable.slots(other_id)
+                        if day == other_day and start < other_end and other_start < end]
+        for clash in clashes:
+            messages.append(f"{timetable.class_name(class_id)} overlaps {timetable.class_name(clash['class_id'])} "
+                            f"on {clash['day']} ({clash['start']}-{clash['end']})")
+        added.append(class_id)
+    return messages
+
+
+def check_class(cur, class_id, schedule_days, start, end):
+    """Conflicts the members of a class would get with the given schedule
+
+    Returns:
+        list: human-readable conflict messages
+    """
+    timetable = get_timetable(cur)
+    slots = class_slots(schedule_days, start, end)
+    clashes = []
+    for role, (table, column) in MEMBER_TABLES.items():
+        status_filter = "AND status = 'active'" if role == 'student' else ''
+        cur.execute(f'SELECT {column} FROM {table} WHERE class_id = ? {status_filter}', (class_id,))
+        for (user_id,) in cur.fetchall():
+            clashes += [(role, user_id, clash) for clash in timetable.conflicts(role, user_id, slots, ignore={class_id})]
+    if not clashes:
+        return []
+
+    names = _user_names(cur, {user_id for _, user_id, _ in clashes})
+    return [f"{role.capitalize()} {names.get(user_id, user_id)} already has {timetable.class_name(clash['class_id'])} "
+            f"on {clash['day']} ({clash['start']}-{clash['end']})"
+            for role, user_id, clash in clashes]
+
+
+def _user_names(cur, user_ids):
+    user_ids = sorted(user_ids)
+    cur.execute(f"SELECT id, name, username FROM users WHERE id IN ({','.join('?' * len(user_ids))})", user_ids)
+    return {user_id: name or username for user_id, name, username in cur.fetchall()}
+
+
+def conflict_report(cur):
+    """Every double booking in the school
+
+    Returns:
+        list: dicts with role, user, day, both classes and the overlap
+    """
+    timetable = get_timetable(cur)
+    rows = []
+    for (role, user_id, day), index in timetable.indexes.items():
+        for class_id, other_id, start, end in index.overlaps():
+            rows.append((role, user_id, day, class_id, other_id, start, end))
+    if not rows:
+        return []
+
+    names = _user_names(cur, {row[1] for row in rows})
+
+    rows.sort(key=lambda row: (row[0], names.get(row[1], ''), WEEKDAYS.index(row[2]), row[5]))
+    return [{
+        'role': role,
+        'user_id': user_id,
+        'user_name': names.get(user_id, f'User {user_id}'),
+        'day': day,
+        'class_id': class_id,
+        'class_name': timetable.class_name(class_id),
+        'other_class_id': other_id,
+        'other_class_name': timetable.class_name(other_id),
+        'overlap': f'{format_time(start)}-{format_time(end)}'
+    } for role, user_id, day, class_id, other_id, start, end in rows]
@@ -0,0 +1,175 @@
+"""
+Weighted gradebook for a class
+Every assignment (grouped by assignment_type) and every assessment (in the
+'assessment' category, weighted by assessments.weight) becomes a column of
+a students x items percentage matrix. Category averages and the overall
+weighted average are computed for all students at once with NumPy, using
+the per-class category weights in grade_category_weights (1.0 for any
+category without a configured weight). Results are cached per class and
+reused until the class's trigger-maintained gradebook_version moves, which
+any marks, item, enrollment or weight write does.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from grading import letter_grade
+
+ASSESSMENT_CATEGORY = 'assessment'
+DEFAULT_CATEGORY = 'assignment'
+DEFAULT_WEIGHT = 1.0
+CACHE_SIZE = 256
+
+_cache_lock = threading.Lock()
+_cache = OrderedDict()
+
+
+def get_category_weights(cur, class_id):
+    """Configured category weights of a class"""
+    cur.execute('SELECT category, weight FROM grade_category_weights WHERE class_id = ?', (class_id,))
+    return dict(cur.fetchall())
+
+
+def set_category_weights(conn, class_id, weights):
+    """Replace the category weights of a class (does not commit)"""
+    conn.execute('DELETE FROM grade_category_weights WHERE class_id = ?', (class_id,))
+    conn.executemany('''
+        INSERT INTO grade_category_weights (class_id, category, weight)
+        VALUES (?, ?, ?)
+    ''', [(class_id, category, float(weight)) for category, weight in weights.items()])
+    invalidate(class_id)
+
+
+def get_version(cur, class_id):
+    """Gradebook version of a class (0 until its first change)
+
+    Triggers bump it on any write to the class's enrollments, assignments,
+    assessments, marks or category weights (migration 0009).
+    """
+    cur.execute('SELECT version FROM gradebook_version WHERE class_id = ?', (class_id,))
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+def _load(cur, class_id):
+    """Load students, items and the percentage matrix of a class"""
+    cur.execute('''
+        SELECT DISTINCT u.id
+        FROM users u
+        JOIN student_class_map scm ON u.id = scm.student_id
+        WHERE scm.class_id = ? AND u.role = 'student'
+        ORDER BY u.id
+    ''', (class_id,))
+    student_ids = [row[0] for row in cur.fetchall()]
+
+    # Items: (key, category, weight within category)
+    cur.execute('SELECT id, assignment_type FROM assignments WHERE class_id = ? ORDER BY id', (class_id,))
+    items = [(('assignment', item_id), category or DEFAULT_CATEGORY, 1.0) for item_id, category in cur.fetchall()]
+    cur.execute('SELECT id, weight FROM assessments WHERE class_id = ? ORDER BY id', (class_id,))
+    items += [(('assessment', item_id), ASSESSMENT_CATEGORY, weight if weight is not None else DEFAULT_WEIGHT)
+              for item_id, weight in cur.fetchall()]
+
+    rows = {student_id: i for i, student_id in enumerate(student_ids)}
+    columns = {key: j for j, (key, _, _) in enumerate(items)}
+    percentages = np.full((len(student_ids), len(items)), np.nan)
+
+    cur.execute('''
+        SELECT sm.student_id, sm.assignment_id, sm.marks_obtained, COALESCE(sm.total_marks, a.points, 100)
+        FROM student_marks sm
+        JOIN assignments a ON sm.assignment_id = a.id
+        WHERE a.class_id = ? AND sm.marks_obtained IS NOT NULL
+    ''', (class_id,))
+    cells = [(student_id, ('assignment', item_id), obtained, total) for student_id, item_id, obtained, total in cur.fetchall()]
+
+    cur.execute('''
+        SELECT m.student_id, m.assessment_id, m.score, s.max_score
+        FROM marks m
+        JOIN assessments s ON m.assessment_id = s.id
+        WHERE s.class_id = ?
+    ''', (class_id,))
+    cells += [(student_id, ('assessment', item_id), score, max_score) for student_id, item_id, score, max_score in cur.fetchall()]
+
+    for student_id, key, obtained, total in cells:
+        i = rows.get(student_id)
+        if i is not None and total:
+            percentages[i, columns[key]] = obtained * 100.0 / total
+
+    return student_ids, items, percentages
+
+
+def _compute(student_ids, items, percentages, category_weights):
+    """Category and overall weighted averages for every student in one pass"""
+    categories = sorted({category for _, category, _ in items})
+    if not student_ids or not categories:
+        return {'categories': {c: category_weights.get(c, DEFAULT_WEIGHT) for c in categories}, 'students': {}}
+
+    # items x categories membership, scaled by each item's weight
+    membership = np.zeros((len(items), len(categories)))
+    index = {category: k for k, category in enumerate(categories)}
+    for j, (_, category, weight) in enumerate(items):
+        membership[j, index[category]] = weight
+
+    marked = ~np.isnan(percentages)
+    weighted_sum = np.where(marked, percentages, 0.0) @ membership
+    weight_sum = marked.astype(float) @ membership
+    with np.errstate(invalid='ignore', divide='ignore'):
+        category_scores = np.where(weight_sum > 0, weighted_sum / weight_sum, np.nan)
+
+    weights = np.array([category_weights.get(c, DEFAULT_WEIGHT) for c in categories])
+    has_score = ~np.isnan(category_scores)
+    overall_weight = has_score.astype(float) @ weights
+    with np.errstate(invalid='ignore', divide='ignore'):
+        overall = np.where(overall_weight > 0,
+                           np.where(has_score, category_scores, 0.0) @ weights / overall_weight,
+                           np.nan)
+
+    students = {}
+    for i, student_id in enumerate(student_ids):
+        percentage = None if np.isnan(overall[i]) else round(float(overall[i]), 2)
+        students[student_id] = {
+            'weighted_percentage': percentage,
+            'weighted_grade': letter_grade(percentage) if percentage is not None else 'N/A',
+            'categories': {
+                category: None if np.isnan(category_scores[i, k]) else round(float(category_scores[i, k]), 2)
+                for k, category in enumerate(categories)
+            }
+        }
+    return {'categories': dict(zip(categories, weights.tolist())), 'students': students}
+
+
+def compute_class_grades(cur, class_id):
+    """Weighted grades of every student in a class, cached per class
+
+    Returns:
+        dict: 'categories' maps category -> weight in use and 'students'
+        maps student_id -> weighted_percentage, weighted_grade and
+        per-category percentages (None where nothing is marked)
+    """
+    db_file = cur.connection.execute('PRAGMA database_list').fetchone()[2]
+    key = (db_file, class_id)
+    # Read before the data, so a write in between only costs a recompute
+    version = get_version(cur, class_id)
+
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == version:
+            _cache.move_to_end(key)
+            return cached[1]
+
+    student_ids, items, percentages = _load(cur, class_id)
+    result = _compute(student_ids, items, percentages, get_category_weights(cur, class_id))
+
+    with _cache_lock:
+        _cache[key] = (version, result)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def invalidate(class_id):
+    """Drop cached grades of a class (any database)"""
+    with _cache_lock:
+        for key in [key for key in _cache if key[1] == class_id]:
+            del _cache[key]